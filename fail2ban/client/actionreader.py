@@ -49,6 +49,10 @@ class ActionReader(DefinitionInitConfigReader):
 		"actionprolong": ["string", None],
 		"actionreban": ["string", None],
 		"actionunban": ["string", None],
+		"actionban_batch": ["string", None],
+		"actionban_batch_item": ["string", None],
+		"actionunban_batch": ["string", None],
+		"actionunban_batch_item": ["string", None],
 		"norestored": ["bool", None],
 	}
 
@@ -179,6 +179,29 @@ class Beautifier:
 				else:
 					msg = "Current database purge age is:\n"
 					msg += "`- %iseconds" % response
+			elif inC[1] == "dbqueue":
+				if response is None:
+					msg = "Database currently disabled"
+				else:
+					msg = "Database write queue:\n"
+					msg += "\n".join(("`- " if i == len(response)-1 else "|- ") + "%s:\t%s" % r
+						for i, r in enumerate(response))
+			elif inC[1] == "observer":
+				if response is None:
+					msg = "Observer currently disabled"
+				else:
+					msg = "Observer event queue:\n"
+					msg += "\n".join(("`- " if i == len(response)-1 else "|- ") + "%s:\t%s" % r
+						for i, r in enumerate(response))
+			elif inC[1] == "cache-stats" or inC[2:3] == ["cache-stats"]:
+				msg = ["Cache statistic:"]
+				for n, (name, stats) in enumerate(response):
+					last = n == len(response) - 1
+					msg.append(("`- " if last else "|- ") + name)
+					prefix = "   " if last else "|  "
+					for m, st in enumerate(stats):
+						msg.append(prefix + ("`- " if m == len(stats) - 1 else "|- ") + "%s:\t%s" % st)
+				msg = "\n".join(msg)
 			elif len(inC) < 3:
 				pass # to few cmd args for below
 			elif inC[2] in ("logpath", "addlogpath", "dellogpath"):
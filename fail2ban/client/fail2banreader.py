@@ -56,7 +56,8 @@ class Fail2banReader(ConfigReader):
 				["string", "allowipv6", "auto"],
 				["string", "dbfile", "/var/lib/fail2ban/fail2ban.sqlite3"],
 				["int",    "dbmaxmatches", None],
-				["string", "dbpurgeage", "1d"]]
+				["string", "dbpurgeage", "1d"],
+				["string", "dbflushinterval", None]]
 		self.__opts = ConfigReader.getOptions(self, "Definition", opts)
 		if updateMainOpt:
 			self.__opts.update(updateMainOpt)
@@ -64,19 +65,34 @@ class Fail2banReader(ConfigReader):
 		str2LogLevel(self.__opts.get('loglevel', 0))
 		# thread options:
 		opts = [["int", "stacksize", ],
+			["int", "actionthreads", ],
+			["int", "dnsthreads", ],
+			["string", "dnstimeout", ],
+			["int", "filterprocesses", ],
 		]
 		if self.has_section("Thread"):
 			thopt = ConfigReader.getOptions(self, "Thread", opts)
 			if thopt:
 				self.__opts['thread'] = thopt
+		# cache options (max count and max time of entries):
+		opts = [["string", "ip", ],
+			["string", "nametoip", ],
+			["string", "iptoname", ],
+			["string", "filetoip", ],
+			["string", "datepattern", ],
+		]
+		if self.has_section("Cache"):
+			cacheopt = ConfigReader.getOptions(self, "Cache", opts)
+			if cacheopt:
+				self.__opts['cache'] = cacheopt
 
 	def convert(self):
 		# Ensure logtarget/level set first so any db errors are captured
 		# Also dbfile should be set before all other database options.
 		# So adding order indices into items, to be stripped after sorting, upon return
-		order = {"thread":0, "syslogsocket":11, "loglevel":12, "logtarget":13,
+		order = {"thread":0, "cache":1, "syslogsocket":11, "loglevel":12, "logtarget":13,
 			"allowipv6": 14,
-			"dbfile":50, "dbmaxmatches":51, "dbpurgeage":51}
+			"dbfile":50, "dbmaxmatches":51, "dbpurgeage":51, "dbflushinterval":51}
 		stream = list()
 		for opt in self.__opts:
 			if opt in order:
@@ -493,10 +493,8 @@ class Fail2banRegex(object):
 		self._ignoreregex[idx].inc()
 
 	def testRegex(self, line, date=None):
-		orgLineBuffer = self._filter._Filter__lineBuffer
-		# duplicate line buffer (list can be changed inplace during processLine):
-		if self._filter.getMaxLines() > 1:
-			orgLineBuffer = orgLineBuffer[:]
+		# lines of buffer (list is never changed inplace during processLine):
+		orgLineBuffer = self._filter._Filter__lineBuffer.lines
 		fullBuffer = len(orgLineBuffer) >= self._filter.getMaxLines()
 		is_ignored = self._lineIgnored = False
 		try:
@@ -533,7 +531,7 @@ class Fail2banRegex(object):
 			return None, 0, None
 		if self._filter.getMaxLines() > 1 and not self._opts.out:
 			for bufLine in orgLineBuffer[int(fullBuffer):]:
-				if bufLine not in self._filter._Filter__lineBuffer:
+				if bufLine not in self._filter._Filter__lineBuffer.lines:
 					try:
 						self._line_stats.missed_lines.pop(
 							self._line_stats.missed_lines.index("".join(bufLine)))
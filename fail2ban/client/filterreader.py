@@ -42,6 +42,7 @@ class FilterReader(DefinitionInitConfigReader):
 		"ignoreregex": ["string", None],
 		"failregex": ["string", None],
 		"maxlines": ["int", None],
+		"regexset": ["bool", None],
 		"datepattern": ["string", None],
 		"journalmatch": ["string", None],
 	}
@@ -59,7 +60,7 @@ class FilterReader(DefinitionInitConfigReader):
 		if (not self._initOpts.get('logtype') and 
 		    not self.has_option('Definition', 'logtype', False)
 		  ):
-			self._initOpts['logtype'] = ['file','journal'][int(backend.startswith("systemd"))]
+			self._initOpts['logtype'] = ['file','journal'][int(backend.startswith(("systemd", "syslog")))]
 
 	def convert(self):
 		stream = list()
@@ -89,7 +90,7 @@ class FilterReader(DefinitionInitConfigReader):
 				stream.insert(0 if opt == 'usedns' else prio0idx,
 					["set", jailName, opt, value])
 				prio0idx += 1
-			elif opt == 'datepattern':
+			elif opt in ('datepattern', 'regexset'):
 				stream.append(["set", jailName, opt, value])
 			elif opt == 'journalmatch':
 				for match in value.split("\n"):
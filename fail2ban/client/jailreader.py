@@ -108,6 +108,8 @@ class JailReader(ConfigReader):
 		"bantime.maxtime": ["string", None],
 		"bantime.rndtime": ["string", None],
 		"bantime.overalljails": ["bool", None],
+		"actionthreads": ["int", None],
+		"filterprocess": ["bool", None],
 		"ignorecommand": ["string", None],
 		"ignoreself": ["bool", None],
 		"ignoreip": ["string", None],
@@ -264,7 +266,7 @@ class JailReader(ConfigReader):
 		backend = self.__opts.get('backend', 'auto')
 		for opt, value in self.__opts.items():
 			if opt == "logpath":
-				if backend.startswith("systemd"): continue
+				if backend.startswith(("systemd", "syslog")): continue
 				found_files = 0
 				for path in value.split("\n"):
 					path = path.rsplit(" ", 1)
@@ -78,7 +78,12 @@ protocol = [
 ["set dbmaxmatches <INT>", "sets the max number of matches stored in database per ticket"], 
 ["get dbmaxmatches", "gets the max number of matches stored in database per ticket"], 
 ["set dbpurgeage <SECONDS>", "sets the max age in <SECONDS> that history of bans will be kept"], 
-["get dbpurgeage", "gets the max age in seconds that history of bans will be kept"], 
+["get dbpurgeage", "gets the max age in seconds that history of bans will be kept"],
+["set dbflushinterval <SECONDS>", "sets the max interval in <SECONDS> the writes (bans, log positions) are queued to be written together (0 - immediately)"], 
+["get dbflushinterval", "gets the max interval in seconds the writes are queued to be written together"],
+["get dbqueue", "gets the statistic of database write queue (depth, flushes, latency)"], 
+["get observer", "gets the statistic of observer event queue (depth, processed events, latency) and timers (pending, lateness)"], 
+["get cache-stats", "gets the statistic of global caches (size, hits, misses, evictions)"], 
 ['', "JAIL CONTROL", ""],
 ["add <JAIL> <BACKEND>", "creates <JAIL> using <BACKEND>"], 
 ["start <JAIL>", "starts the jail <JAIL>"], 
@@ -110,8 +115,11 @@ protocol = [
 ["set <JAIL> maxretry <RETRY>", "sets the number of failures <RETRY> before banning the host for <JAIL>"], 
 ["set <JAIL> maxmatches <INT>", "sets the max number of matches stored in memory per ticket in <JAIL>"], 
 ["set <JAIL> maxlines <LINES>", "sets the number of <LINES> to buffer for regex search for <JAIL>"], 
+["set <JAIL> regexset true|false", "enables or disables the combined single-pass failregex search for <JAIL>"], 
+["set <JAIL> filterprocess true|false", "enables or disables matching of log lines of <JAIL> in worker process"], 
 ["set <JAIL> addaction <ACT>[ <PYTHONFILE> <JSONKWARGS>]", "adds a new action named <ACT> for <JAIL>. Optionally for a Python based action, a <PYTHONFILE> and <JSONKWARGS> can be specified, else will be a Command Action"], 
 ["set <JAIL> delaction <ACT>", "removes the action <ACT> from <JAIL>"], 
+["set <JAIL> actionthreads <INT>", "sets the number of threads executing the actions of <JAIL> concurrently (1 - sequentially)"], 
 ["", "COMMAND ACTION CONFIGURATION", ""],
 ["set <JAIL> action <ACT> actionstart <CMD>", "sets the start command <CMD> of the action <ACT> for <JAIL>"], 
 ["set <JAIL> action <ACT> actionstop <CMD>", "sets the stop command <CMD> of the action <ACT> for <JAIL>"], 
@@ -141,7 +149,11 @@ protocol = [
 ["get <JAIL> maxretry", "gets the number of failures allowed for <JAIL>"],
 ["get <JAIL> maxmatches", "gets the max number of matches stored in memory per ticket in <JAIL>"], 
 ["get <JAIL> maxlines", "gets the number of lines to buffer for <JAIL>"],
+["get <JAIL> regexset", "gets the current value of the combined single-pass failregex search for <JAIL>"],
+["get <JAIL> filterprocess", "gets whether the log lines of <JAIL> are matched in worker process"],
 ["get <JAIL> actions", "gets a list of actions for <JAIL>"],
+["get <JAIL> actionthreads", "gets the number of threads executing the actions of <JAIL> concurrently"],
+["get <JAIL> cache-stats", "gets the statistic of caches of <JAIL> (size, hits, misses, evictions)"],
 ["", "COMMAND ACTION INFORMATION",""],
 ["get <JAIL> action <ACT> actionstart", "gets the start command for the action <ACT> for <JAIL>"],
 ["get <JAIL> action <ACT> actionstop", "gets the stop command for the action <ACT> for <JAIL>"],
@@ -30,6 +30,7 @@ import tempfile
 import threading
 import time
 from abc import ABCMeta
+from collections import OrderedDict
 try:
 	from collections.abc import MutableMapping
 except ImportError:
@@ -45,8 +46,24 @@ from ..helpers import getLogger, _merge_copy_dicts, \
 # Gets the instance of the logger.
 logSys = getLogger(__name__)
 
-# Create a lock for running system commands
-_cmd_lock = threading.Lock()
+# Create a lock for running system commands (bounded semaphore, allows to execute
+# up to N commands concurrently, server-wide; default 1 - serialized):
+_cmd_lock = threading.BoundedSemaphore(1)
+_cmd_lock_max = 1
+
+def setMaxCmdConcurrency(value):
+	"""Sets max count of external commands executed concurrently (server-wide)."""
+	global _cmd_lock, _cmd_lock_max
+	value = int(value)
+	if value < 1:
+		raise ValueError("max count of concurrent commands must be positive, got %r" % value)
+	if value != _cmd_lock_max:
+		# commands in progress release the previous semaphore:
+		_cmd_lock = threading.BoundedSemaphore(value)
+		_cmd_lock_max = value
+
+def getMaxCmdConcurrency():
+	return _cmd_lock_max
 
 # Specifies whether IPv6 subsystem is available:
 allowed_ipv6 = DNSUtils.IPv6IsAllowed
@@ -182,6 +199,56 @@ class CallingMap(MutableMapping, object):
 		return self.__class__(_merge_copy_dicts(self.data, self.storage))
 
 
+class CommandTemplate(object):
+	"""Command with static text separated from the dynamic tags (slots).
+
+	Compiled once from the command (with already replaced action properties),
+	so the rendering for a ticket is a single join of static parts and values
+	of tags (no regex substitution of the whole command).
+
+	Parameters
+	----------
+	cmd : str
+		Command with dynamic tags (like `<ip>`, `<bantime>`, `<F-USER>`).
+	"""
+
+	__slots__ = ('cmd', 'parts', 'slots')
+
+	def __init__(self, cmd):
+		self.cmd = cmd
+		parts = []
+		slots = []
+		pos = 0
+		for m in TAG_CRE.finditer(cmd):
+			parts.append(cmd[pos:m.start()])
+			# slot: index of part, tag name, original text (used if no replacement):
+			slots.append((len(parts), m.group(1), m.group()))
+			parts.append(m.group())
+			pos = m.end()
+		parts.append(cmd[pos:])
+		self.parts = parts
+		self.slots = slots
+
+	def render(self, aInfo, escapeVal):
+		"""Returns command with values of tags from `aInfo` (escaped using `escapeVal`)."""
+		if not self.slots:
+			return self.cmd
+		parts = self.parts[:]
+		addRepl = None
+		for i, tag, org in self.slots:
+			try:
+				value = aInfo[tag]
+			except KeyError:
+				# fallback (no or default replacement)
+				if tag in ADD_REPL_TAGS:
+					if addRepl is None:
+						addRepl = CallingMap(ADD_REPL_TAGS)
+					parts[i] = addRepl[tag]
+				continue
+			parts[i] = escapeVal(tag, uni_string(value))
+		return "".join(parts)
+
+
 class ActionBase(object, metaclass=ABCMeta):
 	"""An abstract base class for actions in Fail2Ban.
 
@@ -279,6 +346,41 @@ class ActionBase(object, metaclass=ABCMeta):
 		"""
 		pass
 
+	def ban_many(self, aInfos):
+		"""Executed when several tickets get banned at once (optional).
+
+		Can be implemented to ban all tickets of single pass (e. g. with one
+		request or bulk update of firewall), instead of `ban` for each ticket.
+
+		Parameters
+		----------
+		aInfos : list
+			List of dictionaries which includes information in relation to
+			each ban.
+
+		Raises
+		------
+		NotImplementedError
+			If not supported, so `ban` will be invoked for each ticket.
+		"""
+		raise NotImplementedError()
+
+	def unban_many(self, aInfos):
+		"""Executed when several bans expire at once (optional).
+
+		Parameters
+		----------
+		aInfos : list
+			List of dictionaries which includes information in relation to
+			each ban.
+
+		Raises
+		------
+		NotImplementedError
+			If not supported, so `unban` will be invoked for each ticket.
+		"""
+		raise NotImplementedError()
+
 
 WRAP_CMD_PARAMS = {
 	'timeout': 'str2seconds',
@@ -303,6 +405,8 @@ class CommandAction(ActionBase):
 	Attributes
 	----------
 	actionban
+	actionban_batch
+	actionban_batch_item
 	actioncheck
 	actionreban
 	actionreload
@@ -310,6 +414,8 @@ class CommandAction(ActionBase):
 	actionstart
 	actionstop
 	actionunban
+	actionunban_batch
+	actionunban_batch_item
 	timeout
 	"""
 
@@ -328,6 +434,12 @@ class CommandAction(ActionBase):
 			self.actionreban = ''
 			## Command executed when ticket gets removed.
 			self.actionunban = ''
+			## Commands executed once for several tickets gets banned/removed at once (optional),
+			## tag <batch> contains the items (lines of action*_batch_item, default <ip>):
+			self.actionban_batch = ''
+			self.actionban_batch_item = ''
+			self.actionunban_batch = ''
+			self.actionunban_batch_item = ''
 			## Command executed in order to check requirements.
 			self.actioncheck = ''
 			## Command executed in order to restore sane environment in error case.
@@ -414,6 +526,21 @@ class CommandAction(ActionBase):
 		cmd = self.replaceDynamicTags(cmd, {'family':family})
 		return cmd
 
+	def _getCmdTemplate(self, cmd, family):
+		"""Returns compiled template of command with replaced static tags (action properties).
+
+		Compiled once per command and family (cache is cleared if parameters changed),
+		so per ticket only the dynamic tags are rendered.
+		"""
+		key = ('__cmdTmpl', cmd, family)
+		try:
+			return self.__substCache[key]
+		except KeyError:
+			pass
+		tmpl = self.__substCache[key] = CommandTemplate(self.replaceTag(cmd, self._properties,
+			conditional=('family='+family if family else ''), cache=self.__substCache))
+		return tmpl
+
 	def _operationExecuted(self, tag, family, *args):
 		""" Get, set or delete command of operation considering family.
 		"""
@@ -605,6 +732,56 @@ class CommandAction(ActionBase):
 			if not self._processCmd('<actionunban>', aInfo):
 				raise RuntimeError("Error unbanning %(ip)s" % aInfo)
 
+	BATCH_ITEM_NL_CRE = re.compile(r'[\r\n]+')
+
+	def _processBatch(self, oper, aInfos):
+		"""Executes the batch command ("actionban_batch" or "actionunban_batch") for several tickets.
+
+		Each ticket gets replaced in the item command ("actionban_batch_item" or
+		"actionunban_batch_item", default `<ip>`), the items are joined with new line
+		and supplied as tag `<batch>` (and its count as `<batch-count>`) to the batch command.
+		The command is executed once per family.
+		"""
+		cmd = '<action%s_batch>' % oper
+		if not self._properties.get('action%s_batch' % oper):
+			raise NotImplementedError()
+		# group by family (retaining the order):
+		families = OrderedDict()
+		for aInfo in aInfos:
+			families.setdefault(aInfo.get('family', ''), []).append(aInfo)
+		# new lines can't be a part of item (would break the structure of batch):
+		itemVal = lambda tag, value: self.BATCH_ITEM_NL_CRE.sub(' ', value)
+		for family, aInfos in families.items():
+			if oper == 'ban':
+				# if we should start the action on demand (conditional by family):
+				if self._startOnDemand and not self.__started.get(family):
+					self._start(family, forceStart=True)
+			elif not self.__started.get(family, 0) & 2: # doesn't contain items
+				continue
+			itemCmd = self._getCmdTemplate('<action%s_batch_item>' % oper, family)
+			if not itemCmd.cmd:
+				itemCmd = self._getCmdTemplate('<ip>', family)
+			batch = '\n'.join(self.replaceDynamicTags(itemCmd, aInfo, escapeVal=itemVal)
+				for aInfo in aInfos)
+			if not self._processCmd(cmd, {'family': family, 'batch': batch, 'batch-count': len(aInfos)}):
+				raise RuntimeError("Error %sning %d tickets" % (oper, len(aInfos)))
+			if oper == 'ban':
+				self.__started[family] = self.__started.get(family, 0) | 3; # started and contains items
+
+	def ban_many(self, aInfos):
+		"""Executes the "actionban_batch" command for several tickets at once.
+
+		Raises NotImplementedError if the action has no "actionban_batch".
+		"""
+		return self._processBatch('ban', aInfos)
+
+	def unban_many(self, aInfos):
+		"""Executes the "actionunban_batch" command for several tickets at once.
+
+		Raises NotImplementedError if the action has no "actionunban_batch".
+		"""
+		return self._processBatch('unban', aInfos)
+
 	def reban(self, aInfo):
 		"""Executes the "actionreban" command if available, otherwise simply repeat "actionban".
 
@@ -834,8 +1011,8 @@ class CommandAction(ActionBase):
 
 		Parameters
 		----------
-		query : str
-			String with tags.
+		query : str or CommandTemplate
+			String with tags (or already compiled template of it).
 		aInfo : dict
 			Tags(keys) and associated values for substitution in query.
 
@@ -859,22 +1036,10 @@ class CommandAction(ActionBase):
 				# replacement for tag:
 				return value
 
-		# additional replacement as calling map:
-		ADD_REPL_TAGS_CM = CallingMap(ADD_REPL_TAGS)
-		# substitution callable, used by interpolation of each tag
-		def substVal(m):
-			tag = m.group(1)			# tagname from match
-			try:
-				value = aInfo[tag]
-			except KeyError:
-				# fallback (no or default replacement)
-				return ADD_REPL_TAGS_CM.get(tag, m.group())
-			value = uni_string(value)		# assure string
-			# replacement for tag:
-			return escapeVal(tag, value)
-		
-		# Replace normally properties of aInfo non-recursive:
-		realCmd = TAG_CRE.sub(substVal, realCmd)
+		# Replace normally properties of aInfo non-recursive (command compiled to template):
+		if not isinstance(realCmd, CommandTemplate):
+			realCmd = CommandTemplate(realCmd)
+		realCmd = realCmd.render(aInfo, escapeVal)
 
 		# Replace ticket options (filter capture groups) non-recursive:
 		if '<' in realCmd:
@@ -983,23 +1148,20 @@ class CommandAction(ActionBase):
 			if repcnt and self.actioncheck:
 				# don't repair/restore if unban (no matter):
 				def _beforeRepair():
-					if cmd == '<actionunban>' and not self._properties.get('actionrepair_on_unban'):
+					if cmd in ('<actionunban>', '<actionunban_batch>') and not self._properties.get('actionrepair_on_unban'):
 						self._logSys.error("Invariant check failed. Unban is impossible.")
 						return False
 					return True
 				# check and repair if broken:
-				ret = self._invariantCheck(family, _beforeRepair, forceStart=(cmd != '<actionunban>'))
+				ret = self._invariantCheck(family, _beforeRepair, forceStart=(cmd not in ('<actionunban>', '<actionunban_batch>')))
 				# if not sane (and not restored) return:
 				if ret != 1:
 					return False
 
-			# Replace static fields
-			realCmd = self.replaceTag(cmd, self._properties, 
-				conditional=('family='+family if family else ''), cache=self.__substCache)
-
-			# Replace dynamical tags, important - don't cache, no recursion and auto-escape here
+			# Replace dynamical tags in template (static fields already replaced),
+			# important - don't cache, no recursion and auto-escape here
 			if aInfo is not None:
-				realCmd = self.replaceDynamicTags(realCmd, aInfo)
+				realCmd = self.replaceDynamicTags(self._getCmdTemplate(cmd, family), aInfo)
 			else:
 				realCmd = cmd
 
@@ -33,6 +33,8 @@ try:
 except ImportError:
 	from collections import Mapping
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
 from .banmanager import BanManager, BanTicket
 from .ipdns import IPAddr
@@ -88,6 +90,13 @@ class Actions(JailThread, Mapping):
 		self.banPrecedence = 10
 		## Max count of outdated tickets to unban per each __checkUnBan operation:
 		self.unbanMaxCount = self.banPrecedence * 2
+		## Count of worker threads executing the actions concurrently (1 - sequential):
+		self.__actionThreads = 1
+		self.__pool = None
+		self.__poolLock = Lock()
+		## Pending restore of bans (iterator of ticket pages) and its progress (restored, total):
+		self.__restore = None
+		self.__restoreStats = (0, 0)
 
 	@staticmethod
 	def _load_python_module(pythonModule):
@@ -211,6 +220,88 @@ class Actions(JailThread, Mapping):
 	def getBanTime(self):
 		return self.banManager.getBanTime()
 
+	@property
+	def actionThreads(self):
+		"""Count of worker threads executing the actions of jail concurrently.
+
+		If greater than 1, the operations (ban/unban) of different actions are executed
+		in parallel, but each action processes its tickets sequentially (in order).
+		"""
+		return self.__actionThreads
+
+	@actionThreads.setter
+	def actionThreads(self, value):
+		value = int(value)
+		if value < 1:
+			raise ValueError("actionthreads must be integer greater than zero")
+		# pool will be created by first usage (the operations already submitted are
+		# finished by old pool, the lock prevents submit to it after shutdown):
+		with self.__poolLock:
+			self.__actionThreads = value
+			pool, self.__pool = self.__pool, None
+		if pool:
+			pool.shutdown(wait=False)
+
+	def __getPool(self):
+		# called under pool lock:
+		pool = self.__pool
+		if pool is None:
+			pool = self.__pool = ThreadPoolExecutor(max_workers=self.__actionThreads,
+				thread_name_prefix=self.name + "/w")
+		return pool
+
+	def __execLane(self, name, action, op, aInfos):
+		# the action supporting batches gets all tickets at once:
+		if len(aInfos) > 1:
+			many = getattr(action, op + '_many', None)
+			if many is not None:
+				try:
+					for aInfo in aInfos:
+						if not aInfo.immutable: aInfo.reset()
+					many(aInfos)
+					return
+				except NotImplementedError: # not supported - execute for each ticket
+					pass
+				except Exception as e:
+					logSys.warning(
+						"Failed to execute %s jail '%s' action '%s' for %d tickets at once: %s, "
+						"fallback to single %s for each ticket",
+						op, self._jail.name, name, len(aInfos), e, op,
+						exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+		for aInfo in aInfos:
+			try:
+				logSys.debug("[%s] action %r: %s %s", self._jail.name, name, op, aInfo['ip'])
+				if not aInfo.immutable: aInfo.reset()
+				getattr(action, op)(aInfo)
+			except Exception as e:
+				logSys.error(
+					"Failed to execute %s jail '%s' action '%s' "
+					"info '%r': %s",
+					op, self._jail.name, name, aInfo, e,
+					exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+
+	def __execLanes(self, lanes, op):
+		"""Executes queued operations of all actions and waits for completion.
+
+		Each action is processed in its own lane (sequentially, in order of queue, resp. as
+		a batch if supported by action), so the order of operations is preserved per action
+		and per ticket. The lanes are executed concurrently if `actionThreads` > 1.
+		"""
+		if not lanes:
+			return
+		if len(lanes) == 1 or self.__actionThreads <= 1:
+			for name, (action, aInfos) in lanes.items():
+				self.__execLane(name, action, op, aInfos)
+		else:
+			with self.__poolLock:
+				pool = self.__getPool()
+				futures = [pool.submit(self.__execLane, name, action, op, aInfos)
+					for name, (action, aInfos) in lanes.items()
+				]
+			for f in futures:
+				f.result()
+		lanes.clear()
+
 	def getBanned(self, ids):
 		lst = self.banManager.getBanList()
 		if not ids:
@@ -339,16 +430,22 @@ class Actions(JailThread, Mapping):
 			try:
 				if self.idle:
 					logSys.debug("Actions: enter idle mode")
-					Utils.wait_for(lambda: not self.active or not self.idle,
-						lambda: False, self.sleeptime)
+					self.wait_for(lambda: not self.active or not self.idle)
 					logSys.debug("Actions: leave idle mode")
 					continue
 				# wait for ban (stop if gets inactive, pending ban or unban):
 				bancnt = 0
 				wt = min(self.sleeptime, self.banManager._nextUnbanTime - MyTime.time())
 				logSys.log(5, "Actions: wait for pending tickets %s (default %s)", wt, self.sleeptime)
-				if Utils.wait_for(lambda: not self.active or self._jail.hasFailTickets, wt):
-					bancnt = self.__checkBan()
+				if self.wait_for(lambda: not self.active or self.idle or self._jail.hasFailTickets
+					or self.__restore is not None, wt
+				):
+					if not self.active or self.idle:
+						continue
+					# restore bans page by page (interleaved with new bans and unbans):
+					if self.__restore is not None:
+						bancnt = self.__restoreBans()
+					bancnt += self.__checkBan()
 					cnt += bancnt
 				# unban if nothing is banned not later than banned tickets >= banPrecedence
 				if not bancnt or cnt >= self.banPrecedence:
@@ -365,6 +462,10 @@ class Actions(JailThread, Mapping):
 
 		self.__flushBan(stop=True)
 		self.stopActions()
+		with self.__poolLock:
+			pool, self.__pool = self.__pool, None
+		if pool:
+			pool.shutdown()
 		return True
 
 	class ActionInfo(CallingMap):
@@ -477,6 +578,42 @@ class Actions(JailThread, Mapping):
 			yield ticket
 			cnt += 1
 
+	def restoreBans(self, pages, total=0):
+		"""Restores bans (e.g. from database) in actions thread.
+
+		The pages (lists of tickets) are pulled lazily by actions thread, all tickets
+		of a page are banned at once, so an action supporting batches (`ban_many`)
+		gets the whole page in single operation (e.g. one `ipset restore` or `nft -f`),
+		otherwise the ticket is banned by each action separately.
+
+		Parameters
+		----------
+		pages : iterable
+			Pages (lists) of tickets to restore.
+		total : int
+			Expected count of tickets (to report progress in status).
+		"""
+		self.__restoreStats = (0, total)
+		self.__restore = iter(pages)
+		self.wakeup()
+
+	def __restoreBans(self):
+		"""Bans next page of tickets to restore, returns count of banned tickets.
+		"""
+		try:
+			tickets = next(self.__restore, None)
+		except Exception as e: # pragma: no cover
+			logSys.error("[%s] Restore bans failed: %s", self._jail.name, e,
+				exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+			tickets = None
+		if tickets is None:
+			self.__restore = None
+			logSys.info("[%s] Restored %s ban(s)", self._jail.name, self.__restoreStats[0])
+			return 0
+		cnt = self.__checkBan(tickets) if tickets else 0
+		self.__restoreStats = (self.__restoreStats[0] + cnt, self.__restoreStats[1])
+		return cnt
+
 	def __checkBan(self, tickets=None):
 		"""Check for IP address to ban.
 
@@ -492,12 +629,14 @@ class Actions(JailThread, Mapping):
 		if not tickets:
 			tickets = self.__getFailTickets(self.banPrecedence)
 		rebanacts = None
+		# bans are queued per action and executed at end of pass (as batch or concurrently):
+		lanes = OrderedDict()
+		pending = []
 		for ticket in tickets:
 
 			bTicket = BanTicket.wrap(ticket)
 			btime = ticket.getBanTime(self.banManager.getBanTime())
 			ip = bTicket.getID()
-			aInfo = self._getActionInfo(bTicket)
 			reason = {}
 			if self.banManager.addBanTicket(bTicket, reason=reason):
 				cnt += 1
@@ -507,22 +646,18 @@ class Actions(JailThread, Mapping):
 				logSys.notice("[%s] %sBan %s", self._jail.name, ('' if not bTicket.restored else 'Restore '), ip)
 				# do actions :
 				for name, action in self._actions.items():
-					try:
-						if bTicket.restored and getattr(action, 'norestored', False):
-							continue
-						if not aInfo.immutable: aInfo.reset()
-						action.ban(aInfo)
-					except Exception as e:
-						logSys.error(
-							"Failed to execute ban jail '%s' action '%s' "
-							"info '%r': %s",
-							self._jail.name, name, aInfo, e,
-							exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
-				# after all actions are processed set banned flag:
-				bTicket.banned = True
-				if self.banEpoch: # be sure tickets always have the same ban epoch (default 0):
-					bTicket.banEpoch = self.banEpoch
+					if bTicket.restored and getattr(action, 'norestored', False):
+						continue
+					# own info for each action (could be executed in parallel):
+					lanes.setdefault(name, (action, []))[1].append(self._getActionInfo(bTicket))
+				# banned flag will be set after all actions are processed:
+				pending.append(bTicket)
 			else:
+				# execute queued bans before, to preserve order of operations for the ticket:
+				if pending:
+					self.__execLanes(lanes, 'ban')
+					for bTicket2 in pending: self.__setBanned(bTicket2)
+					pending = []
 				if reason.get('expired', 0):
 					logSys.info('[%s] Ignore %s, expired bantime', self._jail.name, ip)
 					continue
@@ -557,11 +692,20 @@ class Actions(JailThread, Mapping):
 					cnt += self.__reBan(bTicket)
 			# add ban to database moved to observer (should previously check not already banned 
 			# and increase ticket time if "bantime.increment" set)
+		if pending:
+			self.__execLanes(lanes, 'ban')
+			for bTicket in pending: self.__setBanned(bTicket)
 		if cnt:
 			logSys.debug("Banned %s / %s, %s ticket(s) in %r", cnt, 
 				self.banManager.getBanTotal(), self.banManager.size(), self._jail.name)
 		return cnt
 
+	def __setBanned(self, ticket):
+		# after all actions are processed set banned flag:
+		ticket.banned = True
+		if self.banEpoch: # be sure tickets always have the same ban epoch (default 0):
+			ticket.banEpoch = self.banEpoch
+
 	def __reBan(self, ticket, actions=None, log=True):
 		"""Repeat bans for the ticket.
 
@@ -625,8 +769,10 @@ class Actions(JailThread, Mapping):
 		Unban IP addresses which are outdated.
 		"""
 		lst = self.banManager.unBanList(MyTime.time(), maxCount)
+		lanes = OrderedDict()
 		for ticket in lst:
-			self.__unBan(ticket)
+			self.__unBan(ticket, lanes=lanes)
+		self.__execLanes(lanes, 'unban')
 		cnt = len(lst)
 		if cnt:
 			logSys.debug("Unbanned %s, %s ticket(s) in %r", 
@@ -679,15 +825,17 @@ class Actions(JailThread, Mapping):
 			logSys.debug("  Flush jail in database")
 			self._jail.database.delBan(self._jail)
 		# unban each ticket with non-flusheable actions:
+		lanes = OrderedDict()
 		for ticket in lst:
 			# unban ip:
-			self.__unBan(ticket, actions=actions, log=log)
+			self.__unBan(ticket, actions=actions, log=log, lanes=lanes)
 			cnt += 1
+		self.__execLanes(lanes, 'unban')
 		logSys.debug("  Unbanned %s, %s ticket(s) in %r", 
 			cnt, self.banManager.size(), self._jail.name)
 		return cnt
 
-	def __unBan(self, ticket, actions=None, log="Unban"):
+	def __unBan(self, ticket, actions=None, log="Unban", lanes=None):
 		"""Unbans host corresponding to the ticket.
 
 		Executes the actions in order to unban the host given in the
@@ -697,6 +845,9 @@ class Actions(JailThread, Mapping):
 		----------
 		ticket : FailTicket
 			Ticket of failures of which to unban
+		lanes : OrderedDict, optional
+			If specified, the unban operations are queued there per action
+			(executed later as batch or concurrently).
 		"""
 		if actions is None:
 			unbactions = self._actions
@@ -707,6 +858,10 @@ class Actions(JailThread, Mapping):
 		if log:
 			logSys.notice("[%s] %s %s", self._jail.name, log, ip)
 		for name, action in unbactions.items():
+			if lanes is not None:
+				lanes.setdefault(name, (action, []))[1].append(
+					aInfo if len(unbactions) == 1 else self._getActionInfo(ticket))
+				continue
 			try:
 				logSys.debug("[%s] action %r: unban %s", self._jail.name, name, ip)
 				if not aInfo.immutable: aInfo.reset()
@@ -735,6 +890,8 @@ class Actions(JailThread, Mapping):
 			cnt = self.banManager.size()
 		ret = [("Currently banned", cnt),
 			   ("Total banned", self.banManager.getBanTotal())]
+		if self.__restore is not None:
+			ret += [("Restoring bans", "%d/%d" % self.__restoreStats)]
 		if flavor != "short":
 			ret += [("Banned IP list", banned)]
 		if flavor == "cymru":
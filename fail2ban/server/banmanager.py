@@ -24,6 +24,8 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+import heapq
+from itertools import count
 from threading import Lock
 
 from .ticket import BanTicket
@@ -52,6 +54,10 @@ class BanManager:
 		self.__lock = Lock()
 		## The ban list.
 		self.__banList = dict()
+		## The expiry index (heap of (end of ban, seq, id, ticket), invalidated lazy by unban),
+		## the top item is always the nearest end of ban (or an obsolete entry):
+		self.__banHeap = []
+		self.__banSeq = count()
 		## The amount of time an IP address gets banned.
 		self.__banTime = 600
 		## Total number of banned IP address
@@ -66,7 +72,10 @@ class BanManager:
 	# @param value the time
 	
 	def setBanTime(self, value):
+		with self.__lock:
 			self.__banTime = int(value)
+			# end of ban of tickets with default ban time changed - rebuild expiry index:
+			self.__rebuildHeap()
 	
 	##
 	# Get the ban time.
@@ -124,6 +133,23 @@ class BanManager:
 		# ensure iterator is safe - traverse over the list in snapshot created within lock (GIL):
 			return iter(list(self.__banList.values()))
 
+	##
+	# Add a ticket to the expiry index (lock should be acquired).
+
+	def __pushHeap(self, ticket, eob):
+		heapq.heappush(self.__banHeap, (eob, next(self.__banSeq), ticket.getID(), ticket))
+
+	##
+	# Rebuild the expiry index from the ban list (lock should be acquired).
+
+	def __rebuildHeap(self):
+		banTime = self.__banTime
+		seq = self.__banSeq
+		self.__banHeap = heap = [(ticket.getEndOfBanTime(banTime), next(seq), fid, ticket)
+			for fid, ticket in self.__banList.items()]
+		heapq.heapify(heap)
+		self._nextUnbanTime = heap[0][0] if heap else BanTicket.MAX_TIME
+
 	##
 	# Returns normalized value
 	#
@@ -290,6 +316,7 @@ class BanManager:
 				return False
 			# not yet banned - add new one:
 			self.__banList[fid] = ticket
+			self.__pushHeap(ticket, eob)
 			self.__banTotal += 1
 			ticket.incrBanCount()
 			# correct next unban time:
@@ -330,34 +357,32 @@ class BanManager:
 			if nextUnbanTime > time:
 				return list()
 
-			# Gets the list of ticket to remove (thereby correct next unban time).
-			unBanList = {}
-			nextUnbanTime = BanTicket.MAX_TIME
-			for fid,ticket in self.__banList.items():
+			# Pops timed out tickets from expiry index (in order of end of ban):
+			unBanList = []
+			heap = self.__banHeap
+			banList = self.__banList
+			while heap and time > heap[0][0] and len(unBanList) < maxCount:
+				eob, _, fid, ticket = heapq.heappop(heap)
+				# obsolete entry (ticket already removed):
+				if banList.get(fid) is not ticket:
+					continue
+				# ban time was prolonged meantime - reinsert with new end of ban:
+				neob = ticket.getEndOfBanTime(self.__banTime)
+				if neob != eob:
+					self.__pushHeap(ticket, neob)
+					continue
 				# current time greater as end of ban - timed out:
-				eob = ticket.getEndOfBanTime(self.__banTime)
-				if time > eob:
-					unBanList[fid] = ticket
-					if len(unBanList) >= maxCount: # stop search cycle, so reset back the next check time
-						nextUnbanTime = self._nextUnbanTime
-						break
-				elif nextUnbanTime > eob:
-					nextUnbanTime = eob
-
-			self._nextUnbanTime = nextUnbanTime
-			# Removes tickets.
-			if len(unBanList):
-				if len(unBanList) / 2.0 <= len(self.__banList) / 3.0:
-					# few as 2/3 should be removed - remove particular items:
-					for fid in unBanList.keys():
-						del self.__banList[fid]
-				else:
-					# create new dictionary without items to be deleted:
-					self.__banList = dict((fid,ticket) for fid,ticket in self.__banList.items() \
-						if fid not in unBanList)
-						
+				del banList[fid]
+				unBanList.append(ticket)
+
+			# next unban time is the top of the heap (may be an obsolete entry, that would be
+			# skipped by next check):
+			self._nextUnbanTime = heap[0][0] if heap else BanTicket.MAX_TIME
+			# avoid growing of index by many obsolete entries:
+			if len(heap) > 2 * len(banList) + 100:
+				self.__rebuildHeap()
 			# return list of tickets:
-			return list(unBanList.values())
+			return unBanList
 
 	##
 	# Flush the ban list.
@@ -369,6 +394,8 @@ class BanManager:
 		with self.__lock:
 			uBList = list(self.__banList.values())
 			self.__banList = dict()
+			self.__banHeap = []
+			self._nextUnbanTime = BanTicket.MAX_TIME
 			return uBList
 
 	##
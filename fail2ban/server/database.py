@@ -27,13 +27,14 @@ import shutil
 import sqlite3
 import sys
 import time
+from collections import OrderedDict
 from functools import wraps
-from threading import RLock
+from threading import Lock, RLock, Timer
 
 from .mytime import MyTime
 from .ticket import FailTicket
 from .utils import Utils
-from ..helpers import getLogger, uni_string, PREFER_ENC
+from ..helpers import getLogger, logging, uni_string, PREFER_ENC
 
 # Gets the instance of the logger.
 logSys = getLogger(__name__)
@@ -72,6 +73,9 @@ def commitandrollback(f):
 	@wraps(f)
 	def wrapper(self, *args, **kwargs):
 		with self._lock: # Threading lock
+			# write pending changes (queued) beforehand, so the operation sees them:
+			if self._pendCount:
+				self._flushPending()
 			with self._db: # Auto commit and rollback on exception
 				cur = self._db.cursor()
 				try:
@@ -110,6 +114,7 @@ class Fail2BanDb(object):
 	----------
 	filename
 	purgeage
+	flushinterval
 	"""
 	__version__ = 4
 	# Note all SCRIPTS strings must end in ';' for py26 compatibility
@@ -163,12 +168,36 @@ class Fail2BanDb(object):
 	_CREATE_TABS = dict(_CREATE_SCRIPTS)
 
 
-	def __init__(self, filename, purgeAge=24*60*60, outDatedFactor=3):
+	## Max count of pending (queued) write operations, causes flush if reached:
+	maxPending = 100
+	## Max count of bans kept in queue for retry if writing fails (the oldest are dropped):
+	maxRetryPending = 10000
+	## Max delay in seconds between retries of failed flush (doubled after each failure):
+	maxRetryDelay = 60
+	## Max count of IPs whose bips rows are cached in memory (LRU):
+	maxBipsCache = 1000
+	## Max count of bans read at once by restore of current bans (page size):
+	restorePageSize = 1000
+
+	def __init__(self, filename, purgeAge=24*60*60, outDatedFactor=3, flushInterval=1):
 		self.maxMatches = 10
 		self._lock = RLock()
 		self._dbFilename = filename
 		self._purgeAge = purgeAge
 		self._outDatedFactor = outDatedFactor;
+		# write-behind queue (bans and bips rows, log positions coalesced by jail and path):
+		self._flushInterval = flushInterval
+		self._pendLock = Lock()
+		self._pendBans = []
+		self._pendLogs = {}
+		self._pendCount = 0
+		self._pendTimer = None
+		# delay and time of next retry after failed flush (back off):
+		self._retryDelay = 0
+		self._retryTime = 0
+		self._flushStats = {'flushes': 0, 'operations': 0, 'latency': 0.0, 'maxlatency': 0.0}
+		# LRU-cache of bips rows, ip -> {jail: (bancount, timeofban, bantime)}:
+		self._bipsLock = Lock()
 		self._connectDB()
 
 	def _connectDB(self, checkIntegrity=False):
@@ -181,6 +210,7 @@ class Fail2BanDb(object):
 			# self._db.text_factory = str
 
 			self._bansMergedCache = {}
+			self._bipsCache = OrderedDict()
 
 			logSys.info(
 				"Connected to fail2ban persistent database '%s'", filename)
@@ -254,6 +284,9 @@ class Fail2BanDb(object):
 
 	def close(self):
 		logSys.debug("Close connection to database ...")
+		# write pending changes:
+		with self._lock:
+			self.flush()
 		self._db.close()
 		logSys.info("Connection to database closed.")
 
@@ -316,6 +349,119 @@ class Fail2BanDb(object):
 	def purgeage(self, value):
 		self._purgeAge = MyTime.str2seconds(value)
 
+	@property
+	def flushinterval(self):
+		"""Max interval in seconds the write operations (bans, log positions) get delayed
+		to be written together in single transaction (0 - write immediately).
+		"""
+		return self._flushInterval
+
+	@flushinterval.setter
+	def flushinterval(self, value):
+		self._flushInterval = MyTime.str2seconds(value)
+		if not self._flushInterval:
+			self.flush()
+
+	@property
+	def queueStats(self):
+		"""Statistic of write-behind queue (depth, flushes, count of written operations,
+		latency of last and the slowest flush in seconds).
+		"""
+		st = self._flushStats
+		return [
+			("Queue depth", self._pendCount),
+			("Flushes", st['flushes']),
+			("Written operations", st['operations']),
+			("Last flush latency", round(st['latency'], 6)),
+			("Max flush latency", round(st['maxlatency'], 6)),
+		]
+
+	def _enqueue(self, bans=None, log=None):
+		"""Adds write operation to queue (and flushes it if interval is 0 or queue is full)."""
+		with self._pendLock:
+			if bans is not None:
+				self._pendBans.append(bans)
+			if log is not None:
+				self._pendLogs[log[:2]] = log
+			self._pendCount += 1
+			# don't flush on each operation if the last flush failed (retry is scheduled):
+			flush = (not self._flushInterval or self._pendCount >= self.maxPending) \
+				and time.time() >= self._retryTime
+			if not flush:
+				self._startPendTimer()
+		if flush:
+			self.flush()
+
+	def _startPendTimer(self):
+		# delayed flush (if not yet scheduled), called under pending lock:
+		if self._pendTimer is None:
+			delay = max(self._flushInterval, self._retryTime - time.time())
+			self._pendTimer = t = Timer(delay, self.flush)
+			t.daemon = True
+			t.start()
+
+	def flush(self):
+		"""Writes pending (queued) operations to the database within single transaction.
+		"""
+		with self._lock:
+			self._flushPending()
+
+	def _flushPending(self):
+		# get pending operations:
+		with self._pendLock:
+			if self._pendTimer is not None:
+				self._pendTimer.cancel()
+				self._pendTimer = None
+			if not self._pendCount:
+				return
+			bans, logs, cnt = self._pendBans, self._pendLogs, self._pendCount
+			self._pendBans, self._pendLogs, self._pendCount = [], {}, 0
+		stime = time.time()
+		try:
+			with self._db:
+				cur = self._db.cursor()
+				try:
+					if bans:
+						cur.executemany(
+							"INSERT INTO bans(jail, ip, timeofban, bantime, bancount, data) VALUES(?, ?, ?, ?, ?, ?)",
+							bans)
+						cur.executemany(
+							"INSERT OR REPLACE INTO bips(ip, jail, timeofban, bantime, bancount, data) VALUES(?, ?, ?, ?, ?, ?)",
+							((b[1], b[0]) + b[2:] for b in bans))
+					for args in logs.values():
+						self._updateLog(cur, *args)
+				finally:
+					cur.close()
+		except Exception as e:
+			logSys.error("Failed to write %d pending operations to database (retry later): %s", cnt, e,
+				exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+			# don't discard them (e. g. database is locked), put back to queue before operations queued in-between:
+			with self._pendLock:
+				bans.extend(self._pendBans)
+				drop = len(bans) - self.maxRetryPending
+				if drop > 0:
+					logSys.error("Too many pending operations to retry, dropped %d oldest bans", drop)
+					del bans[:drop]
+					cnt -= drop
+				self._pendBans = bans
+				logs.update(self._pendLogs)
+				self._pendLogs = logs
+				self._pendCount += cnt
+				# back off - retry later (doubled delay after each failure):
+				self._retryDelay = min(self._retryDelay * 2, self.maxRetryDelay) if self._retryDelay \
+					else min(max(self._flushInterval, 1), self.maxRetryDelay)
+				self._retryTime = time.time() + self._retryDelay
+				self._startPendTimer()
+			return
+		self._retryDelay = self._retryTime = 0
+		stime = time.time() - stime
+		st = self._flushStats
+		st['flushes'] += 1
+		st['operations'] += cnt
+		st['latency'] = stime
+		if st['maxlatency'] < stime:
+			st['maxlatency'] = stime
+
 	def _createDb(self, cur, incremental=False):
 		"""Creates a new database, called during initialisation.
 		"""
@@ -509,10 +655,11 @@ class Fail2BanDb(object):
 		cur.execute(query, queryArgs)
 		return set(row[0] for row in cur.fetchmany())
 
-	@commitandrollback
-	def updateLog(self, cur, jail, container):
+	def updateLog(self, jail, container):
 		"""Updates hash and last position in log file.
 
+		The update is queued and written later (see `flush`).
+
 		Parameters
 		----------
 		jail : Jail
@@ -520,17 +667,17 @@ class Fail2BanDb(object):
 		container : FileContainer
 			File container of the log file being updated.
 		"""
-		self._updateLog(cur, jail, container.getFileName(), container.getPos(), container.getHash())
+		self._enqueue(log=(jail.name, container.getFileName(), container.getPos(), container.getHash()))
 
-	def _updateLog(self, cur, jail, name, pos, md5):
+	def _updateLog(self, cur, jailName, name, pos, md5):
 		cur.execute(
 			"UPDATE logs SET firstlinemd5=?, lastfilepos=? "
-				"WHERE jail=? AND path=?", (md5, pos, jail.name, name))
+				"WHERE jail=? AND path=?", (md5, pos, jailName, name))
 		# be sure it is set (if not available):
 		if not cur.rowcount:
 			cur.execute(
 					"INSERT OR REPLACE INTO logs(jail, path, firstlinemd5, lastfilepos) "
-						"VALUES(?, ?, ?, ?)", (jail.name, name, md5, pos))
+						"VALUES(?, ?, ?, ?)", (jailName, name, md5, pos))
 
 	@commitandrollback
 	def getJournalPos(self, cur, jail, name, time=0, iso=None):
@@ -550,10 +697,11 @@ class Fail2BanDb(object):
 		"""
 		return self._addLog(cur, jail, name, time, iso); # no hash, just time as iso
 
-	@commitandrollback
-	def updateJournal(self, cur, jail, name, time, iso):
+	def updateJournal(self, jail, name, time, iso):
 		"""Updates last position (as time) of journal.
 
+		The update is queued and written later (see `flush`).
+
 		Parameters
 		----------
 		jail : Jail
@@ -561,12 +709,13 @@ class Fail2BanDb(object):
 		name, time, iso :
 			Journal name (typically systemd-journal) and last known time.
 		"""
-		self._updateLog(cur, jail, name, time, iso); # no hash, just time as iso
+		self._enqueue(log=(jail.name, name, time, iso)); # no hash, just time as iso
 
-	@commitandrollback
-	def addBan(self, cur, jail, ticket):
+	def addBan(self, jail, ticket):
 		"""Add a ban to the database.
 
+		The ban is queued and written later (see `flush`).
+
 		Parameters
 		----------
 		jail : Jail
@@ -593,14 +742,17 @@ class Fail2BanDb(object):
 		elif matches:
 			data = data.copy()
 			del data['matches']
-		cur.execute(
-			"INSERT INTO bans(jail, ip, timeofban, bantime, bancount, data) VALUES(?, ?, ?, ?, ?, ?)",
-			(jail.name, ip, int(round(ticket.getTime())), ticket.getBanTime(jail.actions.getBanTime()), ticket.getBanCount(),
-				data))
-		cur.execute(
-			"INSERT OR REPLACE INTO bips(ip, jail, timeofban, bantime, bancount, data) VALUES(?, ?, ?, ?, ?, ?)",
-			(ip, jail.name, int(round(ticket.getTime())), ticket.getBanTime(jail.actions.getBanTime()), ticket.getBanCount(),
-				data))
+		# serialize now (snapshot), the ticket may be modified until the queue gets flushed:
+		ban = (jail.name, ip, int(round(ticket.getTime())),
+			ticket.getBanTime(jail.actions.getBanTime()), ticket.getBanCount(), _json_dumps_safe(data))
+		self._enqueue(bans=ban)
+		# actualize cached bips rows of this ip (copy on write):
+		with self._bipsLock:
+			rows = self._bipsCache.get(ip)
+			if rows is not None:
+				rows = rows.copy()
+				rows[jail.name] = (ban[4], ban[2], ban[3])
+				self._bipsCache[ip] = rows
 
 	@commitandrollback
 	def delBan(self, cur, jail, *args):
@@ -619,6 +771,7 @@ class Fail2BanDb(object):
 		if not len(args):
 			cur.execute(query1, queryArgs);
 			cur.execute(query2, queryArgs);
+			self._uncacheBips(jail)
 			return
 		query1 += " AND ip = ?"
 		query2 += " AND ip = ?"
@@ -627,6 +780,80 @@ class Fail2BanDb(object):
 			queryArgs[1] = str(ip);
 			cur.execute(query1, queryArgs);
 			cur.execute(query2, queryArgs);
+		self._uncacheBips(jail, [str(ip) for ip in args])
+
+	def _uncacheBips(self, jail, ips=None):
+		"""Removes rows of jail from cached bips (of given or all IPs)."""
+		with self._bipsLock:
+			cache = self._bipsCache
+			for ip in (ips if ips is not None else list(cache.keys())):
+				rows = cache.get(ip)
+				if rows and jail.name in rows:
+					rows = rows.copy()
+					del rows[jail.name]
+					cache[ip] = rows
+
+	def _getBips(self, ips):
+		"""Returns bips rows of IPs as dict ip -> {jail: (bancount, timeofban, bantime)}.
+
+		Cached IPs are returned from memory, the rest is read from database with single query.
+		"""
+		found = {}
+		missed = []
+		with self._bipsLock:
+			cache = self._bipsCache
+			for ip in ips:
+				rows = cache.get(ip)
+				if rows is None:
+					missed.append(ip)
+					continue
+				cache.move_to_end(ip)
+				found[ip] = rows
+		if missed:
+			found.update(self._loadBips(missed))
+		return found
+
+	@commitandrollback
+	def _loadBips(self, cur, ips):
+		found = dict((ip, {}) for ip in ips)
+		# chunked to avoid reaching of sqlite limit of variables count per query:
+		for i in range(0, len(ips), 500):
+			chunk = ips[i:i+500]
+			for ip, jail, bancount, timeofban, bantime in cur.execute(
+				"SELECT ip, jail, bancount, timeofban, bantime FROM bips WHERE ip IN (%s)"
+				% ",".join("?" * len(chunk)), chunk
+			):
+				found[ip][jail] = (bancount, timeofban, bantime)
+		with self._bipsLock:
+			# consider bans queued in-between (not yet written):
+			with self._pendLock:
+				for ban in self._pendBans:
+					rows = found.get(ban[1])
+					if rows is not None:
+						rows[ban[0]] = (ban[4], ban[2], ban[3])
+			cache = self._bipsCache
+			for ip, rows in found.items():
+				cache[ip] = rows
+				cache.move_to_end(ip)
+			while len(cache) > self.maxBipsCache:
+				cache.popitem(last=False)
+		return found
+
+	@staticmethod
+	def _banInfo(rows, jail=None, overalljails=None, mintime=None):
+		"""Aggregates bips rows of single IP similar to the query of `getBan`."""
+		if not overalljails and jail is not None:
+			rows = rows.get(jail.name)
+			rows = (rows,) if rows else ()
+		else:
+			rows = rows.values()
+		if mintime is not None:
+			rows = [r for r in rows if r[1] > mintime]
+		if not rows:
+			return None
+		if overalljails:
+			return (sum(r[0] for r in rows), max(r[1] for r in rows), sum(r[2] for r in rows))
+		return max(rows, key=lambda r: r[1])
 
 	@commitandrollback
 	def _getBans(self, cur, jail=None, bantime=None, ip=None):
@@ -744,32 +971,55 @@ class Fail2BanDb(object):
 				self._bansMergedCache[cacheKey] = tickets if ip is None else ticket
 			return tickets if ip is None else ticket
 
-	@commitandrollback
-	def getBan(self, cur, ip, jail=None, forbantime=None, overalljails=None, fromtime=None):
+	def getBan(self, ip, jail=None, forbantime=None, overalljails=None, fromtime=None):
+		"""Get ban info (ban count, time of last ban, ban time) of IP (from cached bips).
+
+		Returns
+		-------
+		list
+			Empty list or list with single tuple (bancount, timeofban, bantime).
+		"""
 		ip = str(ip)
-		if not overalljails:
-			query = "SELECT bancount, timeofban, bantime FROM bips"
-		else:
-			query = "SELECT sum(bancount), max(timeofban), sum(bantime) FROM bips"
-		query += " WHERE ip = ?"
-		queryArgs = [ip]
-		if not overalljails and jail is not None:
-			query += " AND jail=?"
-			queryArgs.append(jail.name)
+		mintime = None
 		if forbantime is not None:
-			query += " AND timeofban > ?"
-			queryArgs.append(MyTime.time() - forbantime)
-		if fromtime is not None:
-			query += " AND timeofban > ?"
-			queryArgs.append(fromtime)
-		if overalljails or jail is None:
-			query += " GROUP BY ip ORDER BY timeofban DESC LIMIT 1"
-		# repack iterator as long as in lock:
-		return list(cur.execute(query, queryArgs))
+			mintime = MyTime.time() - forbantime
+		if fromtime is not None and (mintime is None or fromtime > mintime):
+			mintime = fromtime
+		ban = self._banInfo(self._getBips((ip,))[ip], jail, overalljails, mintime)
+		return [ban] if ban is not None else []
+
+	def getBanMany(self, ips, jail=None, overalljails=None):
+		"""Get ban info (ban count, time of last ban, ban time) for several IPs at once.
+
+		Parameters
+		----------
+		ips : iterable of str
+			IP addresses to search in database.
+		jail : Jail
+			Jail that the ban belongs to. Default `None`; all jails.
+		overalljails : bool
+			Sum up ban counts and times of all jails. Default `None`.
 
-	def _getCurrentBans(self, cur, jail = None, ip = None, forbantime=None, fromtime=None):
+		Returns
+		-------
+		dict
+			Mapping of found IP to tuple (bancount, timeofban, bantime).
+		"""
+		bans = {}
+		for ip, rows in self._getBips([str(ip) for ip in ips]).items():
+			ban = self._banInfo(rows, jail, overalljails)
+			if ban is not None:
+				bans[ip] = ban
+		return bans
+
+	def _getCurrentBans(self, cur, jail = None, ip = None, forbantime=None, fromtime=None,
+		afterip=None, limit=None, count=False
+	):
 		queryArgs = []
-		if jail is not None:
+		if count:
+			query = "SELECT count(*) FROM bips WHERE jail=?"
+			queryArgs.append(jail.name)
+		elif jail is not None:
 			query = "SELECT ip, timeofban, bantime, bancount, data FROM bips WHERE jail=?"
 			queryArgs.append(jail.name)
 		else:
@@ -782,12 +1032,71 @@ class Fail2BanDb(object):
 		if forbantime not in (None, -1): # not specified or persistent (all)
 			query += " AND timeofban > ?"
 			queryArgs.append(fromtime - forbantime)
-		if ip is None:
+		if count:
+			pass
+		elif limit is not None:
+			# page of jail bans (keyset pagination using primary key (ip, jail)):
+			if afterip is not None:
+				query += " AND ip > ?"
+				queryArgs.append(afterip)
+			query += " ORDER BY ip LIMIT ?"
+			queryArgs.append(limit)
+		elif ip is None:
 			query += " GROUP BY ip ORDER BY ip, timeofban DESC"
 		else:
 			query += " ORDER BY timeofban DESC LIMIT 1"
 		return cur.execute(query, queryArgs)
 
+	def _getCorrectBanTime(self, jail, correctBanTime):
+		if correctBanTime is True:
+			correctBanTime = jail.getMaxBanTime() if jail is not None else None
+			# don't change if persistent allowed:
+			if correctBanTime == -1: correctBanTime = None
+		return correctBanTime
+
+	def _bansToTickets(self, bans, jail, fromtime, correctBanTime, maxmatches):
+		"""Generates tickets from the rows of bips (skips invalid and too old bans).
+		"""
+		if maxmatches is None:
+			maxmatches = self.maxMatches
+		for ticket in bans:
+			# can produce unpack error (database may return sporadical wrong-empty row):
+			try:
+				banip, timeofban, bantime, bancount, data = ticket
+				# additionally check for empty values:
+				if banip is None or banip == "": # pragma: no cover
+					raise ValueError('unexpected value %r' % (banip,))
+				# if bantime unknown (after upgrade-db from earlier version), just use min known ban-time:
+				if bantime == -2: # todo: remove it in future version
+					bantime = jail.actions.getBanTime() if jail is not None else (
+						correctBanTime if correctBanTime else 600)
+				elif correctBanTime and correctBanTime >= 0:
+					# if persistent ban (or greater as max), use current max-bantime of the jail:
+					if bantime == -1 or bantime > correctBanTime:
+						bantime = correctBanTime
+				# after correction check the end of ban again:
+				if bantime != -1 and timeofban + bantime <= fromtime:
+					# not persistent and too old - ignore it:
+					logSys.debug("ignore ticket (with new max ban-time %r): too old %r <= %r, ticket: %r",
+						bantime, timeofban + bantime, fromtime, ticket)
+					continue
+			except ValueError as e: # pragma: no cover
+				logSys.debug("get current bans: ignore row %r - %s", ticket, e)
+				continue
+			# logSys.debug('restore ticket   %r, %r, %r', banip, timeofban, data)
+			ticket = FailTicket(banip, timeofban, data=data)
+			# filter matches if expected (current count > as maxmatches specified):
+			if maxmatches:
+				matches = ticket.getMatches()
+				if matches and len(matches) > maxmatches:
+					ticket.setMatches(matches[-maxmatches:])
+			else:
+				ticket.setMatches(None)
+			# logSys.debug('restored ticket: %r', ticket)
+			ticket.setBanTime(bantime)
+			ticket.setBanCount(bancount)
+			yield ticket
+
 	def getCurrentBans(self, jail=None, ip=None, forbantime=None, fromtime=None,
 		correctBanTime=True, maxmatches=None
 	):
@@ -804,61 +1113,70 @@ class Fail2BanDb(object):
 		try:
 			if fromtime is None:
 				fromtime = MyTime.time()
-			tickets = []
-			ticket = None
-			if correctBanTime is True:
-				correctBanTime = jail.getMaxBanTime() if jail is not None else None
-				# don't change if persistent allowed:
-				if correctBanTime == -1: correctBanTime = None
-
+			correctBanTime = self._getCorrectBanTime(jail, correctBanTime)
 			with self._lock:
+				if self._pendCount:
+					self._flushPending()
 				bans = self._getCurrentBans(cur, jail=jail, ip=ip, 
 					forbantime=forbantime, fromtime=fromtime
 				)
-			for ticket in bans:
-				# can produce unpack error (database may return sporadical wrong-empty row):
-				try:
-					banip, timeofban, bantime, bancount, data = ticket
-					# additionally check for empty values:
-					if banip is None or banip == "": # pragma: no cover
-						raise ValueError('unexpected value %r' % (banip,))
-					# if bantime unknown (after upgrade-db from earlier version), just use min known ban-time:
-					if bantime == -2: # todo: remove it in future version
-						bantime = jail.actions.getBanTime() if jail is not None else (
-							correctBanTime if correctBanTime else 600)
-					elif correctBanTime and correctBanTime >= 0:
-						# if persistent ban (or greater as max), use current max-bantime of the jail:
-						if bantime == -1 or bantime > correctBanTime:
-							bantime = correctBanTime
-					# after correction check the end of ban again:
-					if bantime != -1 and timeofban + bantime <= fromtime:
-						# not persistent and too old - ignore it:
-						logSys.debug("ignore ticket (with new max ban-time %r): too old %r <= %r, ticket: %r",
-							bantime, timeofban + bantime, fromtime, ticket)
-						continue
-				except ValueError as e: # pragma: no cover
-					logSys.debug("get current bans: ignore row %r - %s", ticket, e)
-					continue
-				# logSys.debug('restore ticket   %r, %r, %r', banip, timeofban, data)
-				ticket = FailTicket(banip, timeofban, data=data)
-				# filter matches if expected (current count > as maxmatches specified):
-				if maxmatches is None:
-					maxmatches = self.maxMatches
-				if maxmatches:
-					matches = ticket.getMatches()
-					if matches and len(matches) > maxmatches:
-						ticket.setMatches(matches[-maxmatches:])
-				else:
-					ticket.setMatches(None)
-				# logSys.debug('restored ticket: %r', ticket)
-				ticket.setBanTime(bantime)
-				ticket.setBanCount(bancount)
-				if ip is not None: return ticket
-				tickets.append(ticket)
+			tickets = self._bansToTickets(bans, jail, fromtime, correctBanTime, maxmatches)
+			if ip is not None:
+				# single ticket (resp. empty list if not found):
+				return next(tickets, [])
+			return list(tickets)
 		finally:
-			cur.close() 
+			cur.close()
 
-		return tickets
+	def getCurrentBansCount(self, jail, forbantime=None, fromtime=None):
+		"""Returns count of bans of the jail currently stored in the database
+		(upper bound of tickets restored by `iterCurrentBans`).
+		"""
+		if fromtime is None:
+			fromtime = MyTime.time()
+		cur = self._db.cursor()
+		try:
+			with self._lock:
+				if self._pendCount:
+					self._flushPending()
+				return self._getCurrentBans(cur, jail=jail,
+					forbantime=forbantime, fromtime=fromtime, count=True
+				).fetchone()[0]
+		finally:
+			cur.close()
+
+	def iterCurrentBans(self, jail, forbantime=None, fromtime=None,
+		correctBanTime=True, maxmatches=None, pageSize=None
+	):
+		"""Generates tickets currently affected from ban of the jail in pages (lists of tickets).
+
+		Same as `getCurrentBans` for the jail, but the bans are read page by page
+		(ordered by IP, at most `pageSize` rows per query), so the database is not locked
+		for the whole restore and not all tickets are held in memory at once.
+		"""
+		if fromtime is None:
+			fromtime = MyTime.time()
+		if pageSize is None:
+			pageSize = self.restorePageSize
+		correctBanTime = self._getCorrectBanTime(jail, correctBanTime)
+		afterip = None
+		while True:
+			cur = self._db.cursor()
+			try:
+				with self._lock:
+					if self._pendCount:
+						self._flushPending()
+					bans = self._getCurrentBans(cur, jail=jail,
+						forbantime=forbantime, fromtime=fromtime, afterip=afterip, limit=pageSize
+					).fetchall()
+			finally:
+				cur.close()
+			if not bans:
+				break
+			afterip = bans[-1][0]
+			yield list(self._bansToTickets(bans, jail, fromtime, correctBanTime, maxmatches))
+			if len(bans) < pageSize:
+				break
 
 	def _cleanjails(self, cur):
 		"""Remove empty jails jails and log files from database.
@@ -882,6 +1200,8 @@ class Fail2BanDb(object):
 		"""Purge old bans, jails and log files from database.
 		"""
 		self._bansMergedCache = {}
+		with self._bipsLock:
+			self._bipsCache.clear()
 		cur.execute(
 			"DELETE FROM bans WHERE timeofban < ?",
 			(MyTime.time() - self._purgeAge, ))
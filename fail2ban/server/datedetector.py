@@ -28,6 +28,7 @@ from threading import Lock
 
 from .datetemplate import re, DateTemplate, DatePatternRegex, DateTai64n, DateEpoch, \
 	RE_EPOCH_PATTERN
+from .failregex import sre_parse, sre_const, R_REPEAT_OPS
 from .strptime import validateTimeZone
 from .utils import Utils
 from ..helpers import getLogger
@@ -38,7 +39,98 @@ logSys = getLogger(__name__)
 logLevel = 5
 
 RE_DATE_PREMATCH = re.compile(r"(?<!\\)\{DATE\}", re.IGNORECASE)
-DD_patternCache = Utils.Cache(maxCount=1000, maxTime=60*60)
+DD_patternCache = Utils.Cache(maxCount=1000, maxTime=60*60, name='datepattern')
+
+# to combine regex of templates (named groups and its references, leading global flags and not
+# combinable constructs, like numbered back-references or conditionals and global flags elsewhere):
+RE_COMBINE_NAMED = re.compile(r'(?<!\\)(\(\?P<|\(\?P=|\(\?\()([a-zA-Z_]\w*)(?=[>)])')
+RE_COMBINE_GLOBFLAGS = re.compile(r'^\(\?([a-zA-Z]+)\)')
+RE_COMBINE_UNSUPP = re.compile(r'(?<!\\)(?:\(\?\(\d|\(\?[a-zA-Z]+\))|(?<!\\)\\\d')
+
+R_CATEGORIES = dict((getattr(sre_const, c), r) for c, r in (
+	('CATEGORY_DIGIT', r'\d'), ('CATEGORY_NOT_DIGIT', r'\D'), ('CATEGORY_SPACE', r'\s'),
+	('CATEGORY_NOT_SPACE', r'\S'), ('CATEGORY_WORD', r'\w'), ('CATEGORY_NOT_WORD', r'\W')))
+
+
+def _getCombinableRegex(regex, prefix):
+	"""Returns regex of template usable as part of combined regex (or None if not possible).
+
+	Named groups (and references to them) get unique names using `prefix`.
+	"""
+	gf = RE_COMBINE_GLOBFLAGS.match(regex)
+	if gf:
+		regex = regex[gf.end():]
+	if RE_COMBINE_UNSUPP.search(regex):
+		return None
+	regex = RE_COMBINE_NAMED.sub(lambda m: m.group(1) + prefix + m.group(2), regex)
+	# global flags are local for the template now:
+	if gf:
+		regex = '(?%s:%s)' % (gf.group(1), regex)
+	return regex
+
+
+def _firstChars(items):
+	"""Returns set of char-class items the match of parsed (sub)expression items may start with.
+
+	The second value is True if the expression can match an empty string (so the first
+	char is defined by the following items). Returns None if any char may be the first one.
+	"""
+	chars = set()
+	for op, av in items:
+		# zero-width assertions don't consume a char:
+		if op in (sre_const.AT, sre_const.ASSERT, sre_const.ASSERT_NOT):
+			continue
+		if op is sre_const.LITERAL:
+			chars.add(re.escape(chr(av)))
+			return chars, False
+		if op is sre_const.IN:
+			for o, a in av:
+				if o is sre_const.LITERAL:
+					chars.add(re.escape(chr(a)))
+				elif o is sre_const.RANGE:
+					chars.add('%s-%s' % (re.escape(chr(a[0])), re.escape(chr(a[1]))))
+				elif o in R_CATEGORIES:
+					chars.add(R_CATEGORIES[o])
+				else: # negate, etc.
+					return None
+			return chars, False
+		if op is sre_const.SUBPATTERN:
+			# local (?i:...) would need case-insensitive char-class:
+			if av[1] & sre_const.SRE_FLAG_IGNORECASE:
+				return None
+			fc = _firstChars(av[-1])
+		elif op is sre_const.BRANCH:
+			fc = set(), False
+			for b in av[1]:
+				bfc = _firstChars(b)
+				if bfc is None:
+					return None
+				fc = fc[0] | bfc[0], fc[1] or bfc[1]
+		elif op in R_REPEAT_OPS:
+			fc = _firstChars(av[2])
+			if fc is not None and not av[0]:
+				fc = fc[0], True
+		else: # any, references, conditionals, etc.
+			return None
+		if fc is None:
+			return None
+		chars |= fc[0]
+		if not fc[1]:
+			return chars, False
+	return chars, True
+
+
+def _getFirstChars(regex):
+	"""Returns char-class items matching the first char of any match of regex and whether it is
+	case-insensitive (or None if any char possible)."""
+	try:
+		parsed = sre_parse.parse(regex)
+		fc = _firstChars(parsed)
+	except Exception: # pragma: no cover - unexpected
+		return None
+	if fc is None or fc[1] or not fc[0]:
+		return None
+	return fc[0], parsed.state.flags & sre_const.SRE_FLAG_IGNORECASE
 
 
 def _getPatternTemplate(pattern, key=None):
@@ -243,6 +335,8 @@ class DateDetector(object):
 		self.__preMatch = None
 		# default TZ (if set, treat log lines without explicit time zone to be in this time zone):
 		self.__default_tz = None
+		# combined regex of templates to prefilter the search (built on demand, rebuilt if templates added):
+		self.__combined = None
 
 	def _appendTemplate(self, template, ignoreDup=False):
 		name = template.name
@@ -324,6 +418,68 @@ class DateDetector(object):
 		"""
 		return self.__templates
 
+	def _getCombined(self):
+		"""Returns combined regex of templates used to prefilter templates by search for date.
+
+		The not anchored templates are grouped by kind of the char the date starts with,
+		the regex of templates in each group are combined to single regex (with the check
+		of first char and word boundary hoisted in front of alternatives). Single search
+		of such regex shows either no template of group matches the line, or the position
+		of earliest possible match, so the templates are searched from this position only.
+
+		Returns tuple of compiled regex list and mapping template to index of its regex
+		(or False if nothing to combine).
+		"""
+		cmb = self.__combined
+		if cmb is not None and cmb[0] == len(self.__templates):
+			return cmb[1]
+		groups = {}
+		for n, ddtempl in enumerate(self.__templates):
+			template = ddtempl.template
+			# anchored at line begin - fails fast without prefilter:
+			if template.flags & DateTemplate.LINE_BEGIN:
+				continue
+			fc = _getFirstChars(template.regex)
+			if fc is None: # any char possible - no prefilter
+				continue
+			regex = _getCombinableRegex(template.regex, '_t%d_' % n)
+			if regex is None:
+				continue
+			# group by kind of first char (digit, alpha, other) and word boundary:
+			cc = re.compile('[%s]' % ''.join(fc[0]), re.I if fc[1] else 0)
+			key = (bool(cc.search('0123456789')), bool(cc.search('abcdefghijklmnopqrstuvwxyz')),
+				bool(template.flags & DateTemplate.WORD_BEGIN))
+			grp = groups.get(key)
+			if grp is None:
+				grp = groups[key] = [[], [], set(), 0]
+			grp[0].append(regex)
+			grp[1].append(template)
+			grp[2] |= fc[0]
+			grp[3] |= fc[1]
+		filters = []
+		tmplFilter = {}
+		for key, (alts, templates, chars, ic) in groups.items():
+			# single template doesn't need a prefilter:
+			if len(alts) < 2:
+				continue
+			# hoist the check of first char and word boundary in front of alternatives:
+			regex = '[%s]' % ''.join(sorted(chars))
+			regex = '(?=%s)' % (regex if not ic else '(?i:' + regex + ')')
+			if key[2]:
+				regex += r'(?=^|\b|\W)'
+			regex += '(?:%s)' % '|'.join(alts)
+			try:
+				cre = re.compile(regex)
+			except re.error as e: # pragma: no cover
+				logSys.debug("Cannot combine date templates: %s", e)
+				continue
+			for template in templates:
+				tmplFilter[template] = len(filters)
+			filters.append(cre)
+		cmb = (filters, tmplFilter) if filters else False
+		self.__combined = len(self.__templates), cmb
+		return cmb
+
 	def matchTime(self, line):
 		"""Attempts to find date on a log line using templates.
 
@@ -402,14 +558,32 @@ class DateDetector(object):
 		# search template and better match:
 		if not match:
 			log(logLevel, " search template (%i) ...", len(self.__templates))
+			# prefilter templates using combined regex (search on demand, position cached per group):
+			cmb = self._getCombined() if len(self.__templates) > 1 else False
+			if cmb:
+				filters, tmplFilter = cmb
+				fltPos = [None] * len(filters)
 			i = 0
 			for ddtempl in self.__templates:
 				if i == ignoreBySearch:
 					i += 1
 					continue
-				log(logLevel-1, "  try template #%02i: %s", i, ddtempl.name)
 				template = ddtempl.template
-				match = template.matchDate(line)
+				pos = 0
+				if cmb:
+					f = tmplFilter.get(template)
+					if f is not None:
+						pos = fltPos[f]
+						if pos is None:
+							m = filters[f].search(line)
+							pos = fltPos[f] = m.start() if m else -1
+						if pos < 0:
+							log(logLevel-1, "  skip template #%02i: %s", i, ddtempl.name)
+							i += 1
+							continue
+				log(logLevel-1, "  try template #%02i: %s", i, ddtempl.name)
+				# no date of this template before pos, so search from there:
+				match = template.matchDate(line, pos)
 				if match:
 					distance = match.start()
 					endpos = match.end()
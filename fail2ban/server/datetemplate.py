@@ -289,6 +289,8 @@ class DatePatternRegex(DateTemplate):
 	def __init__(self, pattern=None, **kwargs):
 		super(DatePatternRegex, self).__init__()
 		self._pattern = None
+		# memo of date part of matched fields (see reGroupDictStrptime):
+		self._strptimeCache = {}
 		if pattern is not None:
 			self.setRegex(pattern, **kwargs)
 
@@ -311,6 +313,7 @@ class DatePatternRegex(DateTemplate):
 	def setRegex(self, pattern, wordBegin=True, wordEnd=True):
 		# original pattern:
 		self._pattern = pattern
+		self._strptimeCache = {}
 		# if unbound signalled - reset boundaries left and right:
 		if RE_EXLINE_NO_BOUNDS.search(pattern):
 			pattern = RE_EXLINE_NO_BOUNDS.sub('', pattern)
@@ -352,7 +355,8 @@ class DatePatternRegex(DateTemplate):
 		if not dateMatch:
 			dateMatch = self.matchDate(line)
 		if dateMatch:
-			return (reGroupDictStrptime(dateMatch.groupdict(), default_tz=default_tz),
+			return (reGroupDictStrptime(dateMatch.groupdict(), default_tz=default_tz,
+					cache=self._strptimeCache),
 				dateMatch)
 
 
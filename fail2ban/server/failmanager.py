@@ -24,7 +24,10 @@ __author__ = "Cyril Jaquier"
 __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
+from collections import OrderedDict
+from itertools import count as _count
 from threading import Lock
+import heapq
 import logging
 
 from .ticket import FailTicket, BanTicket
@@ -40,6 +43,11 @@ class FailManager:
 	def __init__(self):
 		self.__lock = Lock()
 		self.__failList = dict()
+		# index by time of last failure (heap of (time, seq, id, ticket), invalidated lazy by cleanup):
+		self.__timeHeap = []
+		self.__timeSeq = _count()
+		# ids of failures reached maxretry (ready to ban, in order of reaching):
+		self.__toBanList = OrderedDict()
 		self.__maxRetry = 3
 		self.__maxTime = 600
 		self.__failTotal = 0
@@ -58,7 +66,11 @@ class FailManager:
 			return len(self.__failList), sum([f.getRetry() for f in list(self.__failList.values())])
 
 	def setMaxRetry(self, value):
-		self.__maxRetry = value
+		with self.__lock:
+			self.__maxRetry = value
+			# rebuild ready to ban list:
+			self.__toBanList = OrderedDict((fid, None) for fid, item in self.__failList.items()
+				if item.getRetry() >= value)
 	
 	def getMaxRetry(self):
 		return self.__maxRetry
@@ -107,8 +119,11 @@ class FailManager:
 				if count > ticket.getAttempt():
 					fData.setRetry(count)
 				self.__failList[fid] = fData
+				heapq.heappush(self.__timeHeap, (fData.getTime(), next(self.__timeSeq), fid, fData))
 
 			attempts = fData.getRetry()
+			if attempts >= self.__maxRetry:
+				self.__toBanList[fid] = None
 			self.__failTotal += 1
 
 			if logSys.getEffectiveLevel() <= logLevel:
@@ -126,41 +141,59 @@ class FailManager:
 	def size(self):
 		return len(self.__failList)
 	
+	def __rebuildTimeHeap(self):
+		seq = self.__timeSeq
+		self.__timeHeap = heap = [(item.getTime(), next(seq), fid, item)
+			for fid, item in self.__failList.items()]
+		heapq.heapify(heap)
+
 	def cleanup(self, time):
 		time -= self.__maxTime
 		with self.__lock:
-			todelete = [fid for fid,item in self.__failList.items() \
-				if item.getTime() <= time]
-			if len(todelete) == len(self.__failList):
-				# remove all:
-				self.__failList = dict()
-			elif not len(todelete):
-				# nothing:
-				return
-			if len(todelete) / 2.0 <= len(self.__failList) / 3.0:
-				# few as 2/3 should be removed - remove particular items:
-				for fid in todelete:
-					del self.__failList[fid]
-			else:
-				# create new dictionary without items to be deleted:
-				self.__failList = dict((fid,item) for fid,item in self.__failList.items() \
-					if item.getTime() > time)
+			heap = self.__timeHeap
+			failList = self.__failList
+			# pops outdated failures from time index (in order of time):
+			while heap and heap[0][0] <= time:
+				tm, _, fid, item = heapq.heappop(heap)
+				# obsolete entry (already removed):
+				if failList.get(fid) is not item:
+					continue
+				# new failures occurred meantime - reinsert with new time:
+				if item.getTime() != tm:
+					heapq.heappush(heap, (item.getTime(), next(self.__timeSeq), fid, item))
+					continue
+				del failList[fid]
+				self.__toBanList.pop(fid, None)
+			# avoid growing of index by many obsolete entries:
+			if len(heap) > 2 * len(failList) + 100:
+				self.__rebuildTimeHeap()
 		self.__bgSvc.service()
 	
 	def delFailure(self, fid):
 		with self.__lock:
 			try:
 				del self.__failList[fid]
+				self.__toBanList.pop(fid, None)
 			except KeyError:
 				pass
 	
 	def toBan(self, fid=None):
 		with self.__lock:
-			for fid in ([fid] if fid is not None and fid in self.__failList else self.__failList):
-				data = self.__failList[fid]
+			data = self.__failList.get(fid) if fid is not None else None
+			if data is not None:
+				# check given failure only:
 				if data.getRetry() >= self.__maxRetry:
 					del self.__failList[fid]
+					self.__toBanList.pop(fid, None)
 					return data
+			else:
+				# first from the list of failures reached maxretry:
+				while self.__toBanList:
+					fid = self.__toBanList.popitem(last=False)[0]
+					data = self.__failList.get(fid)
+					if data is not None and data.getRetry() >= self.__maxRetry:
+						del self.__failList[fid]
+						return data
 		self.__bgSvc.service()
 		raise FailManagerEmpty
 
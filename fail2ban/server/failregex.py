@@ -23,6 +23,11 @@ __license__ = "GPL"
 
 import re
 import sys
+from bisect import bisect_left, bisect_right
+try:
+	from re import _parser as sre_parse, _constants as sre_const
+except ImportError: # pragma: no cover - python < 3.11
+	import sre_parse, sre_constants as sre_const
 
 from .ipdns import IPAddr
 
@@ -111,6 +116,123 @@ TUPNAME_PRE = 'tuple_'
 COMPLNAME_PRE = (ALTNAME_PRE, TUPNAME_PRE)
 COMPLNAME_CRE = re.compile(r'^(' + '|'.join(COMPLNAME_PRE) + r')(.*?)(?:_\d+)?$')
 
+# minimal length of required literal used to pre-filter the buffer:
+R_LITERAL_MINLEN = 3
+
+R_REPEAT_OPS = tuple(getattr(sre_const, op) for op in (
+	'MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_const, op))
+
+def _requiredLiterals(items, ignoreCase=False):
+	"""Returns list of literal substrings the parsed (sub)expression items require for a match"""
+	lits = []
+	cur = []
+	for op, av in items:
+		if op is sre_const.LITERAL and not ignoreCase:
+			cur.append(chr(av))
+			continue
+		# other op breaks the sequence of literals:
+		if cur:
+			lits.append("".join(cur))
+			cur = []
+		if op is sre_const.SUBPATTERN:
+			# consider local flags (?i:...) and (?-i:...):
+			ic = ignoreCase
+			if av[1] & sre_const.SRE_FLAG_IGNORECASE: ic = True
+			if av[2] & sre_const.SRE_FLAG_IGNORECASE: ic = False
+			lits += _requiredLiterals(av[-1], ic)
+		elif op in R_REPEAT_OPS:
+			# repeated at least once:
+			if av[0] >= 1:
+				lits += _requiredLiterals(av[-1], ignoreCase)
+		elif op is getattr(sre_const, 'ATOMIC_GROUP', None):
+			lits += _requiredLiterals(av, ignoreCase)
+		# all other (branch, in, any, assert, etc) contain nothing required in all cases.
+	if cur:
+		lits.append("".join(cur))
+	return lits
+
+
+##
+# Rolling buffer of tuple lines.
+#
+# Holds the last tuple lines (up to maxLines) together with the string buffer
+# joined from them (see Regex._tupleLinesBuf), which is maintained incrementally
+# by append, and the positions of line ends in it, so the lines of a match are
+# found by bisect (without count of newlines in the buffer).
+
+class TupleLinesBuf(object):
+
+	__slots__ = ('maxLines', 'lines', 'buf', '_ends', '_base')
+
+	def __init__(self, maxLines=1, lines=()):
+		self.maxLines = maxLines
+		self.set(lines)
+
+	##
+	# Replaces the lines of buffer.
+	#
+	# @param lines list of tuple lines
+
+	def set(self, lines):
+		self.lines = lines = list(lines)
+		strs = ["".join(v[::2]) for v in lines]
+		ends = []
+		pos = -1
+		for v in strs:
+			pos += len(v) + 1
+			ends.append(pos)
+		self.buf = "\n".join(strs) + "\n"
+		self._ends = ends
+		# absolute position of buffer start (ends are absolute, buffer is rolling):
+		self._base = 0
+
+	##
+	# Appends a tuple line, removes the first line(s) if more than maxLines.
+	#
+	# The list of lines is never modified in-place (may be referenced in matches).
+
+	def append(self, tupleLine):
+		v = "".join(tupleLine[::2])
+		lines = self.lines
+		cut = len(lines) + 1 - self.maxLines
+		if cut >= len(lines) or not lines:
+			# replace all lines (e. g. single-line or empty buffer):
+			self.lines = [tupleLine]
+			self.buf = v + "\n"
+			self._ends = [len(v)]
+			self._base = 0
+			return
+		ends = self._ends
+		base = self._base
+		if cut > 0:
+			# skip first lines (buffer starts after its last line end):
+			pos = ends[cut-1] + 1
+			self.lines = lines[cut:] + [tupleLine]
+			self._ends = ends = ends[cut:]
+			self.buf = self.buf[pos - base:] + v + "\n"
+			self._base = base = pos
+		else:
+			self.lines = lines + [tupleLine]
+			self.buf += v + "\n"
+		ends.append(base + len(self.buf) - 1)
+
+	##
+	# Returns indices of first and after last line of the match (start and end of match in buffer).
+
+	def matchedLines(self, start, end):
+		ends = self._ends
+		base = self._base
+		# first line - count of line ends before or at start:
+		first = bisect_right(ends, base + start)
+		# last line - contains first line end at or after end-1:
+		end -= 1
+		if end < 0: end += len(self.buf)
+		last = bisect_left(ends, base + end) + 1
+		return first, min(last, len(ends))
+
+	def __len__(self):
+		return len(self.lines)
+
 
 ##
 # Regular expression class.
@@ -128,6 +250,8 @@ class Regex:
 	
 	def __init__(self, regex, multiline=False, **kwargs):
 		self._matchCache = None
+		# original value (to recreate this regex, e. g. in filter worker process):
+		self._orgRegex = regex
 		# Perform shortcuts expansions.
 		# Replace standard f2b-tags (like "<HOST>", etc) using default regular expressions:
 		regex = Regex._resolveHostTag(regex, **kwargs)
@@ -157,6 +281,8 @@ class Regex:
 		except re.error as e:
 			raise RegexException("Unable to compile regular expression '%s':\n%s" %
 								 (regex, e))
+		# longest literal substring required for a match (used as fast pre-filter in search):
+		self._literal = Regex._getRequiredLiteral(self._regexObj)
 		# set fetch handler depending on presence of alternate (or tuple) tags:
 		self.getGroups = self._getGroupsWithAlt if (self._altValues or self._tupleValues) else self._getGroups
 
@@ -218,6 +344,24 @@ class Regex:
 		# substitute tags:
 		return FTAG_CRE.sub(substTag, regex)
 
+	##
+	# Returns longest literal substring required for a match of compiled regex.
+	#
+	# The substring is extracted from the parsed regex, so a simple substring search
+	# (pre-filter) can reject the buffer without to invoke the regex engine.
+	# @return the literal string or None if nothing applicable found
+
+	@staticmethod
+	def _getRequiredLiteral(regexObj):
+		try:
+			parsed = sre_parse.parse(regexObj.pattern, regexObj.flags)
+			lits = _requiredLiterals(parsed,
+				(parsed.state.flags | regexObj.flags) & sre_const.SRE_FLAG_IGNORECASE)
+		except Exception: # pragma: no cover - unexpected
+			return None
+		lit = max(lits, key=len) if lits else None
+		return lit if lit and len(lit) >= R_LITERAL_MINLEN else None
+
 	##
 	# Gets the regular expression.
 	#
@@ -244,8 +388,17 @@ class Regex:
 	
 	def search(self, tupleLines, orgLines=None):
 		buf = tupleLines
-		if not isinstance(tupleLines, str):
+		lineBuf = None
+		if isinstance(tupleLines, TupleLinesBuf):
+			lineBuf = tupleLines
+			buf = lineBuf.buf
+			if orgLines is None: orgLines = lineBuf.lines
+		elif not isinstance(tupleLines, str):
 			buf = Regex._tupleLinesBuf(tupleLines)
+		# pre-filter - required literal is missing, so regex cannot match:
+		if self._literal is not None and self._literal not in buf:
+			self._matchCache = None
+			return
 		self._matchCache = self._regexObj.search(buf)
 		if self._matchCache:
 			if orgLines is None: orgLines = tupleLines
@@ -253,6 +406,10 @@ class Regex:
 			if len(orgLines) <= 1:
 				self._matchedTupleLines = orgLines
 				self._unmatchedTupleLines = []
+			elif lineBuf is not None and orgLines is lineBuf.lines:
+				# lines of the buffer - find first and last line of the match by line ends:
+				lineCount1, lineCount2 = lineBuf.matchedLines(
+					self._matchCache.start(), self._matchCache.end())
 			else:
 				# Find start of the first line where the match was found
 				try:
@@ -271,6 +428,7 @@ class Regex:
 					"\n", 0, matchLineStart)
 				lineCount2 = self._matchCache.string.count(
 					"\n", 0, matchLineEnd)
+			if len(orgLines) > 1:
 				self._matchedTupleLines = orgLines[lineCount1:lineCount2]
 				self._unmatchedTupleLines = orgLines[:lineCount1]
 				n = 0
@@ -464,3 +622,93 @@ class FailRegex(Regex):
 	def getIP(self):
 		fail = self.getGroups()
 		return IPAddr(self.getFailID(("ip4", "ip6")), int(fail.get("cidr") or IPAddr.CIDR_UNSPEC))
+
+
+##
+# Regular expression set class.
+#
+# This class combines a list of regular expressions to a single alternation used
+# as pre-filter, which rejects in one scan the buffer matching no regex of the list.
+
+# named group constructs to rename (definition, back-reference, conditional):
+RS_GRPNAME_CRE = re.compile(r'(?<!\\)\(\?(?:P<(\w+)>|P=(\w+)\)|\((\w+)\))')
+# numbered back-references and conditionals are not movable within the set:
+RS_GRPNUMREF_CRE = re.compile(r'(?<!\\)(?:\\[1-9]|\(\?\(\d+\))')
+# global flags at begin of expression (would be not at start in the set):
+RS_GLOBFLAGS_CRE = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+class RegexSet:
+
+	##
+	# Constructor.
+	#
+	# Creates a new object. This method throws RegexException if some regex of
+	# the list cannot be combined (e. g. uses numbered back-references or flags).
+	# @param regexList the list of Regex objects
+
+	def __init__(self, regexList):
+		if not regexList:
+			raise RegexException("Cannot combine empty regex list")
+		# inline flags are wrapped to local, so compare multi-line flag only:
+		flags = regexList[0]._regexObj.flags & re.MULTILINE
+		alts = []
+		for i, regex in enumerate(regexList):
+			if regex._regexObj.flags & re.MULTILINE != flags:
+				raise RegexException("Cannot combine regex with different flags '%s'" % regex._regex)
+			alts.append(RegexSet._wrap(regex._regex, i))
+		try:
+			self._regexObj = re.compile("|".join(alts), flags)
+		except re.error as e:
+			raise RegexException("Unable to combine regular expressions:\n%s" % (e,))
+		# if each regex requires a literal, the buffer containing none of them is rejected without regex:
+		lits = [regex._literal for regex in regexList]
+		self._literals = tuple(sorted(set(lits), key=len)) if all(lits) else None
+		self._count = len(regexList)
+
+	##
+	# Wraps single expression to an alternative of the set.
+	#
+	# The groups are renamed to be unique in the set, global flags become local.
+
+	@staticmethod
+	def _wrap(regex, idx):
+		if RS_GRPNUMREF_CRE.search(regex):
+			raise RegexException("Cannot combine regex with numbered back-reference '%s'" % regex)
+		# global flags to local flags:
+		m = RS_GLOBFLAGS_CRE.match(regex)
+		if m:
+			regex = "(?%s:%s)" % (m.group(1), regex[m.end():])
+		# rename groups to be unique in the set:
+		pref = "_rs%d_" % idx
+		def substGrp(m):
+			n = m.group(1)
+			if n is not None:
+				return "(?P<%s%s>" % (pref, n)
+			n = m.group(2)
+			if n is not None:
+				return "(?P=%s%s)" % (pref, n)
+			n = m.group(3)
+			if n.isdigit(): # pragma: no cover - already checked in RS_GRPNUMREF_CRE
+				raise RegexException("Cannot combine regex with numbered conditional '%s'" % regex)
+			return "(?(%s%s)" % (pref, n)
+		return "(?:%s)" % RS_GRPNAME_CRE.sub(substGrp, regex)
+
+	def __len__(self):
+		return self._count
+
+	##
+	# Checks some regular expression of the set may match the buffer.
+	#
+	# @param buf the string buffer (see Regex._tupleLinesBuf)
+	# @return False if no regex of the set matches the buffer (so it can be rejected),
+	#         True otherwise (the regexes are searched sequentially hereafter)
+
+	def search(self, buf):
+		lits = self._literals
+		if lits is not None:
+			for lit in lits:
+				if lit in buf:
+					break
+			else:
+				return False
+		return self._regexObj.search(buf) is not None
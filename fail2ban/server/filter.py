@@ -26,19 +26,20 @@ import datetime
 import fcntl
 import logging
 import os
-import re
 import sys
 import time
+from collections import deque
 
 from .actions import Actions
 from .failmanager import FailManagerEmpty, FailManager
-from .ipdns import DNSUtils, IPAddr, FileIPAddrSet
+from .ipdns import DNSUtils, IPAddr, IPAddrTrie, FileIPAddrSet
 from .observer import Observers
 from .ticket import FailTicket
 from .jailthread import JailThread
 from .datedetector import DateDetector, validateTimeZone
 from .mytime import MyTime
-from .failregex import FailRegex, Regex, RegexException
+from .failregex import FailRegex, Regex, RegexException, RegexSet, TupleLinesBuf
+from .logreader import LogReaders, createDateDetector, splitDate
 from .action import CommandAction
 from .utils import Utils
 from ..helpers import getLogger, PREFER_ENC
@@ -72,6 +73,9 @@ class Filter(JailThread):
 		self.__prefRegex = None
 		## The regular expression list matching the failures.
 		self.__failRegex = list()
+		## Combined set of failregex (single-pass search, if enabled):
+		self.__useRegexSet = False
+		self.__failRegexSet = None
 		## The regular expression list with expressions to ignore.
 		self.__ignoreRegex = list()
 		## Use DNS setting
@@ -83,14 +87,20 @@ class Filter(JailThread):
 		## The ignore IP list.
 		self.__ignoreIpSet = set()
 		self.__ignoreIpList = []
+		## Index of ignore list (prefix trie of subnets, rest as list), created on demand:
+		self.__ignoreNetIndex = None
 		## External command
 		self.__ignoreCommand = False
 		## Cache for ignoreip:
 		self.__ignoreCache = None
 		## Size of line buffer
 		self.__lineBufferSize = 1
-		## Line buffer
-		self.__lineBuffer = []
+		## Line buffer (rolling, with joined string of lines)
+		self.__lineBuffer = TupleLinesBuf()
+		## Pool of worker processes matching the lines (process mode, only file based backends):
+		self.procPool = None
+		## Failures deferred until its host resolved by resolver pool (appended by resolver threads):
+		self._dnsDeferred = deque()
 		## Store last time stamp, applicable for multi-line
 		self.__lastTimeText = ""
 		self.__lastDate = None
@@ -98,6 +108,8 @@ class Filter(JailThread):
 		self.__nextSvcTime = -(1<<63)
 		## if set, treat log lines without explicit time zone to be in this time zone
 		self.__logtimezone = None
+		## Date pattern as specified (empty tuple if default detectors):
+		self.__datePattern = ()
 		## Default or preferred encoding (to decode bytes from file or journal):
 		self.__encoding = PREFER_ENC
 		## Cache temporary holds failures info (used by multi-line for wrapping e. g. conn-id to host):
@@ -161,7 +173,7 @@ class Filter(JailThread):
 
 	@property
 	def mlfidCache(self):
-		if self.__mlfidCache:
+		if self.__mlfidCache is not None:
 			return self.__mlfidCache
 		self.__mlfidCache = Utils.Cache(maxCount=100, maxTime=5*60)
 		return self.__mlfidCache
@@ -189,11 +201,13 @@ class Filter(JailThread):
 			regex = FailRegex(value, prefRegex=self.__prefRegex, multiline=multiLine,
 				useDns=self.__useDns)
 			self.__failRegex.append(regex)
+			self.__failRegexSet = None
 		except RegexException as e:
 			logSys.error(e)
 			raise e
 
 	def delFailRegex(self, index=None):
+		self.__failRegexSet = None
 		try:
 			# clear all:
 			if index is None:
@@ -213,6 +227,35 @@ class Filter(JailThread):
 	def getFailRegex(self):
 		return [regex.getRegex() for regex in self.__failRegex]
 
+	##
+	# Enables or disables combined single-pass failregex pre-filter.
+	#
+	# If enabled, all failregex are combined to a single expression (set) that
+	# rejects in one scan the line matching no failregex; the line matching some
+	# failregex is searched by each failregex in turn as usual (not applicable if
+	# checkAllRegex is set).
+
+	@property
+	def regexSet(self):
+		return self.__useRegexSet
+
+	@regexSet.setter
+	def regexSet(self, value):
+		self.__useRegexSet = value
+		self.__failRegexSet = None
+
+	def _getFailRegexSet(self):
+		rs = self.__failRegexSet
+		if rs is None:
+			rs = False
+			if self.__useRegexSet and len(self.__failRegex) > 1:
+				try:
+					rs = RegexSet(self.__failRegex)
+				except RegexException as e:
+					logSys.warning("Cannot combine failregex to set, fallback to sequential search: %s", e)
+			self.__failRegexSet = rs
+		return rs
+
 	##
 	# Add the regular expression which matches the failure.
 	#
@@ -300,17 +343,12 @@ class Filter(JailThread):
 	# @param pattern the date template pattern
 
 	def setDatePattern(self, pattern):
+		self.__datePattern = pattern
 		if pattern is None:
 			self.dateDetector = None
 			return
 		else:
-			dd = DateDetector()
-			dd.default_tz = self.__logtimezone
-			if not isinstance(pattern, (list, tuple)):
-				pattern = list(filter(bool, list(map(str.strip, re.split('\n+', pattern)))))
-			for pattern in pattern:
-				dd.appendTemplate(pattern)
-			self.dateDetector = dd
+			self.dateDetector = createDateDetector(pattern, self.__logtimezone)
 
 	##
 	# Get the date detector pattern, or Default Detectors if not changed
@@ -349,6 +387,13 @@ class Filter(JailThread):
 	def getLogTimeZone(self):
 		return self.__logtimezone
 
+	def _getDateKey(self):
+		"""Returns date pattern and time zone (identify date detection of the filter)"""
+		pattern = self.__datePattern
+		if isinstance(pattern, list):
+			pattern = tuple(pattern)
+		return pattern, self.__logtimezone
+
 	##
 	# Set the maximum retry value.
 	#
@@ -374,7 +419,7 @@ class Filter(JailThread):
 	def setMaxLines(self, value):
 		if int(value) <= 0:
 			raise ValueError("maxlines must be integer greater than zero")
-		self.__lineBufferSize = int(value)
+		self.__lineBufferSize = self.__lineBuffer.maxLines = int(value)
 		logSys.info("  maxLines: %i", self.__lineBufferSize)
 
 	##
@@ -406,6 +451,21 @@ class Filter(JailThread):
 	def getLogEncoding(self):
 		return self.__encoding
 
+	def _getWorkerConfig(self):
+		"""Returns parameters (original values) to recreate this filter in worker process."""
+		return {
+			'usedns': self.__useDns,
+			'maxlines': self.__lineBufferSize,
+			'findtime': self.__findTime,
+			'logtimezone': self.__logtimezone,
+			'datepattern': self.__datePattern,
+			'prefregex': self.__prefRegex._orgRegex if self.__prefRegex else None,
+			'failregex': [regex._orgRegex for regex in self.__failRegex],
+			'ignoreregex': [regex._orgRegex for regex in self.__ignoreRegex],
+			'regexset': self.__useRegexSet,
+			'rawhost': self.returnRawHost,
+		}
+
 	##
 	# Main loop.
 	#
@@ -446,6 +506,15 @@ class Filter(JailThread):
 		else:
 			self.__ignoreCache = None
 
+	def getCacheStats(self):
+		"""Statistic of caches of the filter (multi-line failure-id and ignore cache)."""
+		stats = []
+		if self.__mlfidCache is not None:
+			stats.append(("mlfid", self.__mlfidCache.stats))
+		if self.__ignoreCache:
+			stats.append(("ignore", self.__ignoreCache[1].stats))
+		return stats
+
 	def performBan(self, ip=None):
 		"""Performs a ban for IPs (or given ip) that are reached maxretry of the jail."""
 		while True:
@@ -463,6 +532,9 @@ class Filter(JailThread):
 		# avoid too early clean up:
 		if force or tm >= self.__nextSvcTime:
 			self.__nextSvcTime = tm + 5
+			# add failures deferred by DNS resolution:
+			if self._dnsDeferred:
+				self._processDnsDeferred()
 			# clean up failure list:
 			self.failManager.cleanup(tm)
 
@@ -518,6 +590,7 @@ class Filter(JailThread):
 		if ip:
 			ip = DNSUtils.getIPsFromFile(ip.group(1)) # FileIPAddrSet
 			self.__ignoreIpList.append(ip)
+			self.__ignoreNetIndex = None
 			return
 		# Create IP address object
 		ip = IPAddr(ipstr)
@@ -532,9 +605,11 @@ class Filter(JailThread):
 			self.__ignoreIpSet.add(ip)
 		else:
 			self.__ignoreIpList.append(ip)
+			self.__ignoreNetIndex = None
 
 	def delIgnoreIP(self, ip=None):
 		# clear all:
+		self.__ignoreNetIndex = None
 		if ip is None:
 			self.__ignoreIpSet.clear()
 			del self.__ignoreIpList[:]
@@ -558,6 +633,15 @@ class Filter(JailThread):
 	def getIgnoreIP(self):
 		return self.__ignoreIpList + list(self.__ignoreIpSet)
 
+	def _getIgnoreNetIndex(self):
+		idx = self.__ignoreNetIndex
+		if idx is None:
+			self.__ignoreNetIndex = idx = (
+				IPAddrTrie(n for n in self.__ignoreIpList if isinstance(n, IPAddr) and n.isValid),
+				[n for n in self.__ignoreIpList if not isinstance(n, IPAddr) or not n.isValid]
+			)
+		return idx
+
 	##
 	# Check if IP address/DNS is in the ignore list.
 	#
@@ -600,7 +684,13 @@ class Filter(JailThread):
 		if ip in self.__ignoreIpSet:
 			self.logIgnoreIp(ip, log_ignore, ignore_source="ip")
 			return True
-		for net in self.__ignoreIpList:
+		# subnets (prefix index), DNS and file sets:
+		trie, nets = self._getIgnoreNetIndex()
+		if ip in trie:
+			self.logIgnoreIp(ip, log_ignore, ignore_source="ip")
+			if self.__ignoreCache: c.set(key, True)
+			return True
+		for net in nets:
 			if ip.isInNet(net):
 				self.logIgnoreIp(ip, log_ignore, ignore_source=(net.instanceType))
 				if self.__ignoreCache: c.set(key, True)
@@ -632,8 +722,11 @@ class Filter(JailThread):
 			for args in args:
 				logSys.warning('[%s] ' + args[0], self.jailName, *args[1:])
 
-	def processLine(self, line, date=None):
+	def processLine(self, line, date=None, split=None):
 		"""Split the time portion from log msg and return findFailures on them
+
+		If split is given, the line is already split by date (see splitDate, e. g.
+		by shared log reader).
 		"""
 		logSys.log(7, "Working on line %r", line)
 
@@ -645,22 +738,12 @@ class Filter(JailThread):
 			self.__lastDate = date
 		else:
 			# try to parse date:
-			timeMatch = self.dateDetector.matchTime(line)
-			m = timeMatch[0]
-			if m:
-				s = m.start(1)
-				e = m.end(1)
-				m = line[s:e]
-				tupleLine = (line[:s], m, line[e:])
-				if m: # found and not empty - retrieve date:
-					date = self.dateDetector.getTime(m, timeMatch)
+			tupleLine, date, m = split if split is not None else splitDate(self.dateDetector, line)
+			if m is not None:
+				if m: # found and not empty:
 					if date is not None:
-						# Lets get the time part
-						date = date[0]
 						self.__lastTimeText = m
 						self.__lastDate = date
-					else:
-						logSys.error("findFailure failed to parse timeText: %s", m)
 				# matched empty value - date is optional or not available - set it to last known or now:
 				elif self.__lastDate and self.__lastDate > MyTime.time() - 60:
 					# set it to last known:
@@ -669,8 +752,6 @@ class Filter(JailThread):
 				else:
 					# set it to now:
 					date = MyTime.time()
-			else:
-				tupleLine = ("", "", line)
 			# still no date - try to use last known:
 			if date is None:
 				noDate = True
@@ -715,30 +796,15 @@ class Filter(JailThread):
 		self.processedLine = lambda: "".join(tupleLine[::2])
 		return self.findFailure(tupleLine, date, noDate=noDate)
 
-	def processLineAndAdd(self, line, date=None):
+	def processLineAndAdd(self, line, date=None, split=None):
 		"""Processes the line for failures and populates failManager
 		"""
 		try:
-			for (_, ip, unixTime, fail) in self.processLine(line, date):
-				logSys.debug("Processing line with time:%s and ip:%s", 
-						unixTime, ip)
-				# ensure the time is not in the future, e. g. by some estimated (assumed) time:
-				if self.checkFindTime and unixTime > MyTime.time():
-					unixTime = MyTime.time()
-				tick = FailTicket(ip, unixTime, data=fail)
-				if self._inIgnoreIPList(ip, tick):
-					continue
-				logSys.info(
-					"[%s] Found %s - %s", self.jailName, ip, MyTime.time2str(unixTime)
-				)
-				attempts = self.failManager.addFailure(tick)
-				# avoid RC on busy filter (too many failures) - if attempts for IP/ID reached maxretry,
-				# we can speedup ban, so do it as soon as possible:
-				if attempts >= self.failManager.getMaxRetry():
-					self.performBan(ip)
-				# report to observer - failure was found, for possibly increasing of it retry counter (asynchronous)
-				if Observers.Main is not None:
-					Observers.Main.add('failureFound', self.jail, tick)
+			# add failures deferred by DNS resolution (resolved in meantime):
+			if self._dnsDeferred:
+				self._processDnsDeferred()
+			for (_, ip, unixTime, fail) in self.processLine(line, date, split):
+				self._addFailure(ip, unixTime, fail)
 			self.procLines += 1
 			# every 100 lines check need to perform service tasks:
 			if self.procLines % 100 == 0:
@@ -752,6 +818,79 @@ class Filter(JailThread):
 			# incr common error counter:
 			self.commonError()
 
+	def _addFailure(self, ip, unixTime, fail):
+		logSys.debug("Processing line with time:%s and ip:%s", 
+				unixTime, ip)
+		# ensure the time is not in the future, e. g. by some estimated (assumed) time:
+		if self.checkFindTime and unixTime > MyTime.time():
+			unixTime = MyTime.time()
+		tick = FailTicket(ip, unixTime, data=fail)
+		if self._inIgnoreIPList(ip, tick):
+			return
+		logSys.info(
+			"[%s] Found %s - %s", self.jailName, ip, MyTime.time2str(unixTime)
+		)
+		attempts = self.failManager.addFailure(tick)
+		# avoid RC on busy filter (too many failures) - if attempts for IP/ID reached maxretry,
+		# we can speedup ban, so do it as soon as possible:
+		if attempts >= self.failManager.getMaxRetry():
+			self.performBan(ip)
+		# report to observer - failure was found, for possibly increasing of it retry counter (asynchronous)
+		if Observers.Main is not None:
+			Observers.Main.add('failureFound', self.jail, tick)
+
+	def _deferDns(self, dns, ips, date, fail):
+		# callback of resolver pool (invoked in resolver thread), so only enqueue here:
+		self._dnsDeferred.append((dns, ips, date, fail))
+
+	def _processDnsDeferred(self):
+		"""Adds failures which hosts are resolved asynchronously (in resolver pool)."""
+		while self._dnsDeferred:
+			dns, ips, unixTime, fail = self._dnsDeferred.popleft()
+			if not ips:
+				if ips is None:
+					logSys.warning("[%s] Unable to resolve %r in time, failure ignored",
+						self.jailName, dns)
+				continue
+			if self.__useDns == "warn":
+				logSys.warning("Determined IP using DNS Lookup: %s = %s", dns, ips)
+			for ip in ips:
+				self._addFailure(ip, unixTime, fail)
+
+	def processLinesInWorker(self, lines, inOperation):
+		"""Matches lines in worker process (process mode) and populates failManager
+		"""
+		try:
+			fails, records, errors = self.procPool.process(self.jailName,
+				self._getWorkerConfig(), inOperation, lines)
+		except Exception as e:
+			logSys.error("[%s] %s, processing %d lines in filter thread", self.jailName, e, len(lines))
+			self.commonError("worker", e)
+			# the log position is already moved past the batch, so process it here (don't lose failures):
+			for line in lines:
+				self.processLineAndAdd(line)
+			return
+		# log messages of worker:
+		for lvl, msg in records:
+			logSys.log(lvl, "[%s] %s", self.jailName, msg)
+		try:
+			if self._dnsDeferred:
+				self._processDnsDeferred()
+			for ip, unixTime, fail in fails:
+				self._addFailure(ip, unixTime, fail)
+		except Exception as e:
+			logSys.error("Failed to add failure, caught exception: %r", e,
+				exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+			errors += 1
+		self.procLines += len(lines)
+		self.performSvc()
+		# error counter (go idle after 100th error), reset (halve) if processed successfully:
+		if errors:
+			self.commonError("worker")
+			self._errors += errors - 1
+		elif self._errors:
+			self._errors //= 2
+
 	def commonError(self, reason="common", exc=None):
 		# incr error counter, stop processing (going idle) after 100th error :
 		self._errors += 1
@@ -762,15 +901,15 @@ class Filter(JailThread):
 			self._errors //= 2
 			self.idle = True
 
-	def _ignoreLine(self, buf, orgBuffer, failRegex=None):
+	def _ignoreLine(self, lineBuf, orgBuffer, failRegex=None):
 		# if multi-line buffer - use matched only, otherwise (single line) - original buf:
 		if failRegex and self.__lineBufferSize > 1:
-			orgBuffer = failRegex.getMatchedTupleLines()
-			buf = Regex._tupleLinesBuf(orgBuffer)
+			lineBuf = TupleLinesBuf(lines=failRegex.getMatchedTupleLines())
+			orgBuffer = lineBuf.lines
 		# search ignored:
 		fnd = None
 		for ignoreRegexIndex, ignoreRegex in enumerate(self.__ignoreRegex):
-			ignoreRegex.search(buf, orgBuffer)
+			ignoreRegex.search(lineBuf, orgBuffer)
 			if ignoreRegex.hasMatched():
 				fnd = ignoreRegexIndex
 				logSys.log(7, "  Matched ignoreregex %d and was ignored", fnd)
@@ -779,7 +918,7 @@ class Filter(JailThread):
 				if not self.checkAllRegex or self.__lineBufferSize > 1:
 					# todo: check ignoreRegex.getUnmatchedTupleLines() would be better (fix testGetFailuresMultiLineIgnoreRegex):
 					if failRegex:
-						self.__lineBuffer = failRegex.getUnmatchedTupleLines()
+						self.__lineBuffer.set(failRegex.getUnmatchedTupleLines())
 				if not self.checkAllRegex: break
 		return fnd
 
@@ -861,17 +1000,15 @@ class Filter(JailThread):
 		if self.__useDns == "raw" or self.returnRawHost:
 			defcidr = IPAddr.CIDR_RAW
 
-		if self.__lineBufferSize > 1:
-			self.__lineBuffer.append(tupleLine)
-			orgBuffer = self.__lineBuffer = self.__lineBuffer[-self.__lineBufferSize:]
-		else:
-			orgBuffer = self.__lineBuffer = [tupleLine]
+		# rolling buffer (joined string maintained incrementally, shared by all regex):
+		lineBuf = self.__lineBuffer
+		lineBuf.append(tupleLine)
+		orgBuffer = lineBuf.lines
 		if ll <= 5: logSys.log(5, "Looking for match of %r", orgBuffer)
-		buf = Regex._tupleLinesBuf(orgBuffer)
 
 		# Checks if we must ignore this line (only if fewer ignoreregex than failregex).
 		if self.__ignoreRegex and len(self.__ignoreRegex) < len(self.__failRegex) - 2:
-			if self._ignoreLine(buf, orgBuffer) is not None:
+			if self._ignoreLine(lineBuf, orgBuffer) is not None:
 				# The ignoreregex matched. Return.
 				return failList
 
@@ -879,7 +1016,7 @@ class Filter(JailThread):
 		preGroups = {}
 		if self.__prefRegex:
 			if ll <= 5: logSys.log(5, "  Looking for prefregex %r", self.__prefRegex.getRegex())
-			self.__prefRegex.search(buf, orgBuffer)
+			self.__prefRegex.search(lineBuf, orgBuffer)
 			if not self.__prefRegex.hasMatched():
 				if ll <= 5: logSys.log(5, "  Prefregex not matched")
 				return failList
@@ -888,16 +1025,21 @@ class Filter(JailThread):
 			repl = preGroups.pop('content', None)
 			# Content replacement:
 			if repl:
-				self.__lineBuffer, buf = [('', '', repl)], None
-
+				lineBuf.set([('', '', repl)])
+
+		# reject the line matching no failregex in single pass using combined set (if enabled):
+		if not self.checkAllRegex:
+			rs = self.__failRegexSet
+			if rs is None:
+				rs = self._getFailRegexSet()
+			if rs and not rs.search(lineBuf.buf):
+				if ll <= 5: logSys.log(5, "  No failregex of set matched")
+				return failList
 		# Iterates over all the regular expressions.
 		for failRegexIndex, failRegex in enumerate(self.__failRegex):
 			try:
-				# buffer from tuples if changed: 
-				if buf is None:
-					buf = Regex._tupleLinesBuf(self.__lineBuffer)
 				if ll <= 5: logSys.log(5, "  Looking for failregex %d - %r", failRegexIndex, failRegex.getRegex())
-				failRegex.search(buf, orgBuffer)
+				failRegex.search(lineBuf, orgBuffer)
 				if not failRegex.hasMatched():
 					continue
 				# current failure data (matched group dict):
@@ -905,9 +1047,8 @@ class Filter(JailThread):
 				# The failregex matched.
 				if ll <= 7: logSys.log(7, "  Matched failregex %d: %s", failRegexIndex, fail)
 				# Checks if we must ignore this match.
-				if self.__ignoreRegex and self._ignoreLine(buf, orgBuffer, failRegex) is not None:
+				if self.__ignoreRegex and self._ignoreLine(lineBuf, orgBuffer, failRegex) is not None:
 					# The ignoreregex matched. Remove ignored match.
-					buf = None
 					if not self.checkAllRegex:
 						break
 					continue
@@ -920,7 +1061,7 @@ class Filter(JailThread):
 					if date is None and self.checkFindTime: continue
 				# we should check all regex (bypass on multi-line, otherwise too complex):
 				if not self.checkAllRegex or self.__lineBufferSize > 1:
-					self.__lineBuffer, buf = failRegex.getUnmatchedTupleLines(), None
+					lineBuf.set(failRegex.getUnmatchedTupleLines())
 				# merge data if multi-line failure:
 				cidr = defcidr
 				raw = (defcidr == IPAddr.CIDR_RAW)
@@ -977,9 +1118,14 @@ class Filter(JailThread):
 						fail['ip'] = IPAddr(ip, cidr)
 						fid = IPAddr(fid, defcidr)
 					fids = [fid]
-				# otherwise, try to use dns conversion:
+				# otherwise, try to use dns conversion (deferred if resolved asynchronously):
 				else:
-					fids = DNSUtils.textToIp(ip, self.__useDns)
+					fids = DNSUtils.textToIp(ip, self.__useDns,
+						(lambda dns, ips, args=(date, fail): self._deferDns(dns, ips, *args))
+						if DNSUtils.Resolver is not None else None)
+					if fids is None:
+						if ll <= 7: logSys.log(7, "  Failure deferred until %r resolved", ip)
+						fids = ()
 				# if checkAllRegex we must make a copy (to be sure next RE doesn't change merged/cached failure):
 				if self.checkAllRegex and mlfid is not None:
 					fail = fail.copy()
@@ -1009,6 +1155,8 @@ class FileFilter(Filter):
 		## The log file path.
 		self.__logs = dict()
 		self.__autoSeek = dict()
+		## Readers shared with other filters monitoring the same log (by path):
+		self.__readers = dict()
 
 	##
 	# Add a log file path
@@ -1029,6 +1177,8 @@ class FileFilter(Filter):
 				if lastpos and not tail:
 					log.setPos(lastpos)
 			self.__logs[path] = log
+			# subscribe to reader shared by jails monitoring the same log:
+			self._getSharedReader(log)
 			logSys.info("Added logfile: %r (pos = %s, hash = %s)" , path, log.getPos(), log.getHash())
 			if autoSeek and not tail:
 				self.__autoSeek[path] = autoSeek
@@ -1050,6 +1200,11 @@ class FileFilter(Filter):
 		except KeyError:
 			return
 		logSys.info("Removed logfile: %r", path)
+		log.keepOpen = False
+		log.release()
+		reader = self.__readers.pop(path, None)
+		if reader is not None:
+			LogReaders.unsubscribe(reader, self)
 		self._delLogPath(path)
 		return
 
@@ -1154,18 +1309,25 @@ class FileFilter(Filter):
 						logSys.exception(e)
 						return False
 
-			if has_content:
-				while not self.idle:
-					line = log.readline()
+			if has_content and not self.idle and self.procPool is not None:
+				# process mode - lines are matched in batches by worker process:
+				if self._processLogInWorker(log, inOperation):
+					log.inOperation = True
+			elif has_content and not self.idle and self._getSharedReader(log) is not None:
+				# log is monitored by several jails - lines are read and split by date once:
+				if self._processLogShared(log, self.__readers[filename], inOperation):
+					log.inOperation = True
+			elif has_content and not self.idle:
+				for line in log.readlines():
 					if not self.active: break; # jail has been stopped
-					if line is None:
-						# The jail reached the bottom, simply set in operation for this log
-						# (since we are first time at end of file, growing is only possible after modifications):
-						log.inOperation = True
-						break
 					# acquire in operation from log and process:
 					self.inOperation = inOperation if inOperation is not None else log.inOperation
 					self.processLineAndAdd(line)
+					if self.idle: break
+				else:
+					# The jail reached the bottom, simply set in operation for this log
+					# (since we are first time at end of file, growing is only possible after modifications):
+					log.inOperation = True
 		finally:
 			log.close()
 		if self.jail.database is not None:
@@ -1179,6 +1341,55 @@ class FileFilter(Filter):
 				self._nextUpdateTM = MyTime.time() + Utils.DEFAULT_SLEEP_TIME * 5
 		return True
 
+	def _processLogInWorker(self, log, inOperation):
+		# returns True if the bottom of log is reached:
+		if not self.active: return False
+		self.inOperation = inOperation = inOperation if inOperation is not None else log.inOperation
+		batch = []
+		batchSize = self.procPool.batchSize
+		for line in log.readlines():
+			batch.append(line)
+			if len(batch) >= batchSize:
+				self.processLinesInWorker(batch, inOperation)
+				batch = []
+				if not self.active or self.idle:
+					return False
+		if batch:
+			self.processLinesInWorker(batch, inOperation)
+		return self.active and not self.idle
+
+	def _getSharedReader(self, log):
+		"""Returns reader if the log is shared with other filters (same file, encoding and date detection)
+		"""
+		path = log.getFileName()
+		reader = self.__readers.get(path)
+		if self.dateDetector is None:
+			return None
+		key = (path, log.getEncoding()) + self._getDateKey()
+		if reader is None or reader.key != key:
+			if reader is not None:
+				LogReaders.unsubscribe(reader, self)
+			reader = self.__readers[path] = LogReaders.subscribe(key, self)
+		return reader if reader.shared else None
+
+	def _processLogShared(self, log, reader, inOperation):
+		# returns True if the bottom of log is reached:
+		pos = log.tell()
+		try:
+			while True:
+				recs = reader.fetch(log, pos)
+				if not recs:
+					return True
+				for pos, line, split in recs:
+					# acquire in operation from log and process:
+					self.inOperation = inOperation if inOperation is not None else log.inOperation
+					self.processLineAndAdd(line, split=split)
+					if not self.active or self.idle:
+						return False
+		finally:
+			# position of this filter (last processed line):
+			log.seek(pos, False)
+
 	##
 	# Seeks to line with date (search using half-interval search algorithm), to start polling from it
 	#
@@ -1325,13 +1536,21 @@ except ImportError: # pragma: no cover
 
 class FileContainer:
 
+	## Size of data read at once in bulk mode (see readlines):
+	bulkReadSize = 256*1024
+
 	def __init__(self, filename, encoding, tail=False, doOpen=False):
 		self.__filename = filename
 		self.waitForLineEnd = True
 		self.setEncoding(encoding)
 		self.__tail = tail
 		self.__handler = None
+		## keep handle open between reads (backend signals it gets notified by rotation):
+		self.keepOpen = False
+		self.__keptHandler = None
 		self.__pos = 0
+		# position of consumed data in bulk mode (handler is read ahead):
+		self.__rpos = None
 		self.__pos4hash = 0
 		self.__hash = ''
 		self.__hashNextTime = time.time() + 30
@@ -1380,6 +1599,12 @@ class FileContainer:
 	def setEncoding(self, encoding):
 		codecs.lookup(encoding) # Raises LookupError if invalid
 		self.__encoding = encoding
+		# bulk mode (split raw data by new-line bytes) is safe for ASCII compatible encodings only,
+		# (new-line byte can be a part of multi-byte char e. g. in utf-16):
+		try:
+			self.__bulkMode = '\n'.encode(encoding) == b'\n'
+		except Exception: # pragma: no cover
+			self.__bulkMode = False
 
 	def getEncoding(self):
 		return self.__encoding
@@ -1387,6 +1612,9 @@ class FileContainer:
 	def getHash(self):
 		return self.__hash
 
+	def getIno(self):
+		return self.__ino
+
 	def getPos(self):
 		return self.__pos
 
@@ -1394,6 +1622,27 @@ class FileContainer:
 		self.__pos = value
 
 	def open(self, forcePos=None):
+		h = self.__keptHandler
+		if h is not None:
+			self.__keptHandler = None
+			# reuse kept handle if the path refers to the same inode (not rotated), not truncated
+			# and the hash is not to be verified yet (one stat instead of open/fstat/close):
+			try:
+				stats = os.stat(self.__filename)
+			except OSError:
+				stats = None
+			if (stats is not None and stats.st_ino == self.__ino and stats.st_size >= self.__pos
+				and len(self.__hash) and time.time() <= self.__hashNextTime
+			):
+				if forcePos is not None:
+					self.__pos = forcePos
+				elif stats.st_size <= self.__pos:
+					self.__keptHandler = h
+					return False
+				h.seek(self.__pos)
+				self.__handler = h
+				return True
+			h.close()
 		h = open(self.__filename, 'rb')
 		try:
 			# Set the file descriptor to be FD_CLOEXEC
@@ -1433,7 +1682,11 @@ class FileContainer:
 		finally:
 			# close (no content or error only)
 			if h:
-				h.close(); h = None
+				if self.keepOpen:
+					self.__keptHandler = h
+				else:
+					h.close()
+				h = None
 		return True
 
 	def seek(self, offs, endLine=True):
@@ -1442,6 +1695,7 @@ class FileContainer:
 			self.open(offs)
 			h = self.__handler
 		# seek to given position
+		self.__rpos = None
 		h.seek(offs, 0)
 		# goto end of next line
 		if offs and endLine:
@@ -1451,6 +1705,8 @@ class FileContainer:
 
 	def tell(self):
 		# get current real position
+		if self.__rpos is not None:
+			return self.__rpos
 		return self.__handler.tell()
 
 	@staticmethod
@@ -1491,6 +1747,10 @@ class FileContainer:
 		"""
 		if self.__handler is None:
 			return ""
+		# switch from bulk mode (handler was read ahead):
+		if self.__rpos is not None:
+			self.__handler.seek(self.__rpos)
+			self.__rpos = None
 		# read raw bytes up to \n char:
 		b = self.__handler.readline()
 		if not b:
@@ -1532,14 +1792,75 @@ class FileContainer:
 					return None
 		return l
 
+	def readlines(self):
+		"""Generator reading lines from file in bulk mode
+
+		Reads data in large chunks, decodes complete lines of chunk at once and
+		yields them (without new-line), incomplete line at end remains in buffer
+		to be completed by next chunk. Current position shifts to begin of next
+		line on each yield (only consumed lines are considered by tell and close).
+
+		Falls back to readline for encodings where new-line byte can be a part
+		of multi-byte char.
+		"""
+		h = self.__handler
+		if h is None:
+			return
+		if not self.__bulkMode or self.__rpos is not None:
+			while True:
+				line = self.readline()
+				if line is None:
+					return
+				yield line
+		fn, enc = self.getFileName(), self.getEncoding()
+		self.__rpos = pos = h.tell()
+		tail = b''
+		while True:
+			data = h.read(self.bulkReadSize)
+			if not data:
+				break
+			if tail:
+				data = tail + data
+			blines = data.split(b'\n')
+			tail = blines.pop()
+			if not blines:
+				continue
+			# decode all complete lines at once:
+			try:
+				lines = data[0:len(data)-len(tail)].decode(enc, 'strict').split('\n')
+				lines.pop()
+				if len(lines) != len(blines): # pragma: no cover - safety only
+					raise UnicodeDecodeError(enc, b'', 0, 0, 'count of lines mismatch')
+			except (UnicodeDecodeError, UnicodeEncodeError):
+				lines = [FileContainer.decode_line(fn, enc, b) for b in blines]
+			for b, l in zip(blines, lines):
+				pos += len(b) + 1
+				self.__rpos = pos
+				yield l.rstrip('\r')
+		# incomplete line at end of file:
+		if tail and not self.waitForLineEnd:
+			self.__rpos = pos + len(tail)
+			yield FileContainer.decode_line(fn, enc, tail).rstrip('\r\n')
+
 	def close(self):
 		if self.__handler is not None:
 			# Saves the last real position.
-			self.__pos = self.__handler.tell()
-			# Closes the file.
-			self.__handler.close()
+			self.__pos = self.tell()
+			self.__rpos = None
+			# Closes the file (or keeps it for the next read).
+			if self.keepOpen:
+				self.__keptHandler = self.__handler
+			else:
+				self.__handler.close()
 			self.__handler = None
 
+	def release(self):
+		"""Closes the handle kept open between reads (if any)"""
+		h = self.__keptHandler
+		if h is not None:
+			self.__keptHandler = None
+			h.close()
+
 	def __iter__(self):
 		return self
 	def __next__(self):
@@ -1549,7 +1870,7 @@ class FileContainer:
 			raise StopIteration
 		return line
 
-_decode_line_warn = Utils.Cache(maxCount=1000, maxTime=24*60*60);
+_decode_line_warn = Utils.Cache(maxCount=1000, maxTime=24*60*60, name='decodewarn');
 
 
 ##
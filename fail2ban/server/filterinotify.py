@@ -0,0 +1,297 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Developers"
+__copyright__ = "Copyright (c) 2026 Fail2Ban Developers"
+__license__ = "GPL"
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+
+from .filterwatcher import FilterWatcher
+from .mytime import time
+from ..helpers import getLogger
+
+# inotify constants (see linux/inotify.h):
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = os.O_CLOEXEC
+IN_NONBLOCK = os.O_NONBLOCK
+
+_IN_MASKNAMES = (
+	(IN_MODIFY, 'IN_MODIFY'), (IN_MOVED_FROM, 'IN_MOVED_FROM'), (IN_MOVED_TO, 'IN_MOVED_TO'),
+	(IN_CREATE, 'IN_CREATE'), (IN_DELETE, 'IN_DELETE'), (IN_DELETE_SELF, 'IN_DELETE_SELF'), (IN_MOVE_SELF, 'IN_MOVE_SELF'),
+	(IN_Q_OVERFLOW, 'IN_Q_OVERFLOW'), (IN_IGNORED, 'IN_IGNORED'), (IN_ISDIR, 'IN_ISDIR'),
+)
+
+# struct inotify_event header (wd, mask, cookie, len), followed by name of len bytes:
+_IN_EVENT = struct.Struct('iIII')
+
+# Load inotify functions from libc (Linux only):
+try:
+	_libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+	_inotify_init1 = _libc.inotify_init1
+	_inotify_init1.argtypes = (ctypes.c_int,)
+	_inotify_add_watch = _libc.inotify_add_watch
+	_inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+	_inotify_rm_watch = _libc.inotify_rm_watch
+	_inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+except (OSError, AttributeError) as e: # pragma: no cover
+	raise ImportError("Native inotify is not available on this system: %s" % e)
+
+# Verify that inotify is functional on this system:
+_fd = _inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+if _fd < 0: # pragma: no cover
+	raise ImportError("Native inotify is not functional on this system: %s"
+		% os.strerror(ctypes.get_errno()))
+os.close(_fd)
+del _fd
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+
+def _maskname(mask):
+	return '|'.join(n for m, n in _IN_MASKNAMES if mask & m)
+
+
+##
+# Log reader class.
+#
+# This class reads a log file and detects login failures or anything else
+# that matches a given regular expression. This class is instantiated by
+# a Jail object.
+#
+# Reads inotify events directly from kernel (without pyinotify and its notifier),
+# modify events of a file are coalesced within short window, so a burst of writes
+# is processed by single getFailures call. Handles of monitored files remain open
+# between reads, rotation is recognized by inode of the path (see FileContainer).
+
+class FilterInotify(FilterWatcher):
+	##
+	# Constructor.
+	#
+	# Initialize the filter object with default values.
+	# @param jail the jail object
+	# @param coalesce the window (in seconds) to collect further events after the first one
+
+	def __init__(self, jail, coalesce=0.05):
+		FilterWatcher.__init__(self, jail)
+		self.__coalesce = float(coalesce)
+		self.__fd = _inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+		if self.__fd < 0: # pragma: no cover
+			e = ctypes.get_errno()
+			raise OSError(e, os.strerror(e))
+		self.__poll = select.poll()
+		self.__poll.register(self.__fd, select.POLLIN)
+		self.__watchPaths = dict()
+		logSys.debug("Created FilterInotify")
+
+	def _addWatch(self, path, isDir=False):
+		mask = (IN_MODIFY | IN_MOVE_SELF | IN_DELETE_SELF) if not isDir else (
+			IN_CREATE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM |
+			IN_MOVE_SELF | IN_DELETE_SELF | IN_ONLYDIR)
+		wd = _inotify_add_watch(self.__fd, path.encode('utf-8', 'surrogateescape'), mask)
+		if wd < 0:
+			e = ctypes.get_errno()
+			raise OSError(e, os.strerror(e), path)
+		self.__watchPaths[wd] = path
+		return wd
+
+	def _delWatch(self, wd):
+		self.__watchPaths.pop(wd, None)
+		if _inotify_rm_watch(self.__fd, wd) < 0:
+			e = ctypes.get_errno()
+			# EINVAL - watch is already removed by kernel (file deleted, etc):
+			if e != errno.EINVAL: # pragma: no cover
+				logSys.debug("Remove watch causes: %s", os.strerror(e))
+			return False
+		return True
+
+	def _readEvents(self, modified):
+		"""Reads all available events and handles them, modified files are collected in `modified`
+		"""
+		while True:
+			try:
+				data = os.read(self.__fd, 65536)
+			except OSError as e:
+				if e.errno in (errno.EAGAIN, errno.EINTR):
+					break
+				raise # pragma: no cover
+			if not data: # pragma: no cover
+				break
+			pos, size = 0, len(data)
+			while pos < size:
+				wd, mask, cookie, nlen = _IN_EVENT.unpack_from(data, pos)
+				pos += _IN_EVENT.size
+				name = data[pos:pos+nlen].rstrip(b'\0').decode('utf-8', 'surrogateescape') if nlen else ''
+				pos += nlen
+				try:
+					self.callback(wd, mask, name, modified)
+				except Exception as e: # pragma: no cover
+					logSys.error("Error in FilterInotify callback: %s",
+						e, exc_info=logSys.getEffectiveLevel() <= logging.DEBUG)
+					# incr common error counter:
+					self.commonError()
+
+	def callback(self, wd, mask, name, modified):
+		if mask & IN_Q_OVERFLOW: # pragma: no cover - events lost, check all files
+			logSys.warning("[%s] Inotify event queue overflow", self.jailName)
+			for path in self._watchFiles:
+				modified[path] = 1
+			return
+		path = self.__watchPaths.get(wd)
+		if path is None: # watch is removed already
+			return
+		if name:
+			path = os.path.join(path, name)
+		if logSys.getEffectiveLevel() <= 4:
+			logSys.log(4, "[%s] Callback for Event: %s of %s", self.jailName, _maskname(mask), path)
+		isWD = not name and path in self._watchDirs
+		isWF = not isWD and path in self._watchFiles
+		if mask & (IN_CREATE | IN_MOVED_TO):
+			# skip directories altogether and files we do not monitor:
+			if mask & IN_ISDIR or not isWF:
+				return
+			self._delPending(path)
+			self._refreshWatcher(path)
+			modified[path] = 1
+			return
+		if mask & (IN_IGNORED | IN_MOVE_SELF | IN_DELETE_SELF):
+			# watch was removed for some reasons (log-rotate?):
+			if isWD and (mask & (IN_MOVE_SELF | IN_DELETE_SELF) or not os.path.isdir(path)):
+				self._addPending(path, (_maskname(mask), path), isDir=True)
+				return
+		if isWF:
+			if not mask & IN_MODIFY and not os.path.isfile(path):
+				# file moved away or deleted - don't hold its inode open anymore:
+				log = self.getLog(path)
+				if log is not None:
+					log.release()
+				self._addPending(path, (_maskname(mask), path))
+				return
+			modified[path] = 1
+
+	##
+	# Add a log file path
+	#
+	# @param path log file path
+
+	def _addLogPath(self, path):
+		# handle remains open between reads (watcher notifies about rotation):
+		self.getLog(path).keepOpen = True
+		super(FilterInotify, self)._addLogPath(path)
+
+	def _wait(self, timeout):
+		"""Waits for inotify events (timeout in seconds), returns True if available
+		"""
+		try:
+			return bool(self.__poll.poll(max(0, timeout) * 1000))
+		except InterruptedError: # pragma: no cover
+			return False
+
+	def _processModified(self, modified):
+		"""Processes collected files (once per file regardless the count of events)
+		"""
+		for path in modified:
+			if not self.active or self.idle:
+				break
+			self.getFailures(path)
+
+	##
+	# Main loop.
+	#
+	# Waits for inotify events, collects further events within coalesce window
+	# and processes every modified file once.
+
+	def run(self):
+		logSys.debug("[%s] filter started (inotify)", self.jailName)
+		modified = dict()
+		while self.active:
+			try:
+
+				# slow check events while idle:
+				if self.idle:
+					if self.wait_for(lambda: not self.active or not self.idle,
+						min(self.sleeptime * 10, self._pendingMinTime)
+					):
+						if not self.active: break
+
+				# wait for events / timeout:
+				if self._wait(min(self.sleeptime, 0.5, self._pendingMinTime)):
+					if not self.active: break
+					self._readEvents(modified)
+					# coalesce burst of events (further writes within short window):
+					if modified and self.__coalesce > 0:
+						stm = time.time() + self.__coalesce
+						while self.active:
+							tout = stm - time.time()
+							if tout <= 0 or not self._wait(tout):
+								break
+							self._readEvents(modified)
+					if modified:
+						self._processModified(modified)
+						modified.clear()
+
+				self.ticks += 1
+
+				# check pending files/dirs (logrotate ready):
+				if self.idle:
+					continue
+				self._checkPending()
+				if self.ticks % 10 == 0:
+					self.performSvc()
+
+			except Exception as e: # pragma: no cover
+				if not self.active: # if not active - error by stop...
+					break
+				logSys.error("Caught unhandled exception in main cycle: %r", e,
+					exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+				# incr common error counter:
+				self.commonError("unhandled", e)
+
+		logSys.debug("[%s] filter exited (inotify)", self.jailName)
+		self.done()
+
+		return True
+
+	##
+	# Clean-up: stop files monitoring and close inotify descriptor
+
+	def afterStop(self):
+		super(FilterInotify, self).afterStop()
+		fd, self.__fd = self.__fd, -1
+		if fd >= 0:
+			self.__poll.unregister(fd)
+			os.close(fd)
+			self.__watchPaths.clear()
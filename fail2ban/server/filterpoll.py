@@ -99,15 +99,16 @@ class FilterPoll(FileFilter):
 					logSys.log(4, "Woke up idle=%s with %d files monitored",
 							   self.idle, self.getLogCount())
 				if self.idle:
-					if not Utils.wait_for(lambda: not self.active or not self.idle, 
-						self.sleeptime * 10, self.sleeptime
+					if not self.wait_for(lambda: not self.active or not self.idle, 
+						self.sleeptime * 10
 					):
 						self.ticks += 1
 						continue
 				# Get file modification
 				modlst = []
-				Utils.wait_for(lambda: not self.active or self.getModified(modlst),
-					self.sleeptime)
+				# polling (nothing signals modification), but stop or idle wakes up:
+				self.wait_for(lambda: not self.active or self.idle or self.getModified(modlst),
+					self.sleeptime, Utils.DEFAULT_SLEEP_INTERVAL)
 				if not self.active: # pragma: no cover - timing
 					break
 				for filename in modlst:
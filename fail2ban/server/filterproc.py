@@ -0,0 +1,230 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Developers"
+__copyright__ = "Copyright (c) 2026 Fail2Ban Developers"
+__license__ = "GPL"
+
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import zlib
+
+from .ipdns import IPAddr
+from .mytime import MyTime
+from ..helpers import getLogger
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+
+##
+# Pool of filter worker processes.
+#
+# Matching of log lines (date detection and failregex) of jails in process mode
+# is executed in worker processes, so the filters of many jails are not limited
+# by a single core (GIL). The main process receives the failures only and keeps
+# owning of fail manager, ban manager, actions and database.
+#
+class FilterProcPool(object):
+	"""Pool of worker processes matching the log lines of jails.
+
+	Every jail is bound to a single worker (jail affinity), so the state of its
+	filter (multi-line buffer, mlfid cache, last date) is preserved between the
+	batches. The workers are started on demand and communicate via pipes
+	(pickled requests and responses).
+
+	Parameters
+	----------
+	processes : int
+		Max count of worker processes (0 - count of CPUs).
+	"""
+
+	# pool used by jails in process mode (created on demand, see `getMain`):
+	Main = None
+	# max count of processes of main pool (0 - count of CPUs):
+	processes = 0
+	# max count of lines sent to worker at once:
+	batchSize = 1000
+
+	def __init__(self, processes=0):
+		if not processes:
+			processes = os.cpu_count() or 1
+		self.processes = processes
+		self._workers = [None] * processes
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def getMain():
+		pool = FilterProcPool.Main
+		if pool is None:
+			pool = FilterProcPool.Main = FilterProcPool(FilterProcPool.processes)
+		return pool
+
+	@staticmethod
+	def setProcesses(value):
+		FilterProcPool.processes = value
+		if FilterProcPool.Main is not None:
+			FilterProcPool.Main.resize(value)
+
+	def resize(self, processes=0):
+		"""Changes count of processes (workers are restarted on demand)."""
+		if not processes:
+			processes = os.cpu_count() or 1
+		with self._lock:
+			if processes == self.processes:
+				return
+			workers, self._workers = self._workers, [None] * processes
+			self.processes = processes
+		self._stopWorkers(workers)
+
+	def _getWorker(self, name):
+		idx = zlib.crc32(name.encode('utf-8')) % self.processes
+		with self._lock:
+			w = self._workers[idx]
+			if w is None or w[0].poll() is not None:
+				# package root, to be sure the worker imports the same fail2ban:
+				root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+				p = subprocess.Popen([sys.executable, '-c',
+						'import sys; sys.path.insert(0, %r); '
+						'from fail2ban.server.filterproc import _worker; _worker()' % root
+					], stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True)
+				logSys.debug("Started filter worker %d (pid %s)", idx, p.pid)
+				w = self._workers[idx] = (p, threading.Lock())
+		return w
+
+	def process(self, name, conf, inOperation, lines):
+		"""Matches lines using filter of jail `name` (created in worker from `conf`).
+
+		Returns a tuple of found failures (`[fid, time, failure data]`), log records
+		of the worker (`(level, message)`) and count of errors.
+		"""
+		p, lock = self._getWorker(name)
+		with lock:
+			try:
+				pickle.dump((name, conf, MyTime.myTime, inOperation, lines), p.stdin,
+					pickle.HIGHEST_PROTOCOL)
+				p.stdin.flush()
+				fails, records, errors = pickle.load(p.stdout)
+			except (EOFError, IOError, pickle.UnpicklingError) as e:
+				# worker died - kill it (restarted by next request):
+				if p.poll() is None: p.kill()
+				raise RuntimeError("Filter worker (pid %s) failed: %r" % (p.pid, e))
+		for fail in fails:
+			# restore IPs (pickled as strings):
+			fid, valid = fail[0]
+			fail[0] = IPAddr(fid) if valid else IPAddr(fid, IPAddr.CIDR_RAW)
+			ip = fail[2].get('ip')
+			if ip is not None:
+				fail[2]['ip'] = IPAddr(ip)
+		return fails, records, errors
+
+	def stop(self, timeout=5):
+		with self._lock:
+			workers, self._workers = self._workers, [None] * self.processes
+		self._stopWorkers(workers, timeout)
+
+	@staticmethod
+	def _stopWorkers(workers, timeout=5):
+		for w in workers:
+			if w is None: continue
+			p = w[0]
+			# EOF of requests ends the worker:
+			with w[1]:
+				try:
+					p.stdin.close()
+					p.wait(timeout)
+				except Exception: # pragma: no cover
+					p.kill()
+				p.stdout.close()
+
+
+class _LogCollector(logging.Handler):
+	"""Collects log records of worker (returned with the response to main process)"""
+
+	def __init__(self):
+		logging.Handler.__init__(self)
+		self.records = []
+
+	def emit(self, record):
+		self.records.append((record.levelno, record.getMessage()))
+
+
+def _createFilter(conf):
+	from .filter import Filter
+	f = Filter(None, useDns=conf['usedns'])
+	f.setMaxLines(conf['maxlines'])
+	f.setFindTime(conf['findtime'])
+	if conf['logtimezone']:
+		f.setLogTimeZone(conf['logtimezone'])
+	if conf['datepattern'] != ():
+		f.setDatePattern(conf['datepattern'])
+	f.prefRegex = conf['prefregex']
+	for regex in conf['failregex']:
+		f.addFailRegex(regex)
+	for regex in conf['ignoreregex']:
+		f.addIgnoreRegex(regex)
+	f.regexSet = conf['regexset']
+	f.returnRawHost = conf['rawhost']
+	return f
+
+
+def _worker():
+	"""Main loop of worker process (requests are read from stdin, responses written to stdout)."""
+	fin, fout = sys.stdin.buffer, sys.stdout.buffer
+	# avoid that something else writes to the response pipe:
+	sys.stdout = sys.stderr
+	# collect warnings and errors to send them to main process:
+	coll = _LogCollector()
+	log = logging.getLogger("fail2ban")
+	log.addHandler(coll)
+	log.setLevel(logging.WARNING)
+	log.propagate = False
+	filters = {}
+	while True:
+		try:
+			name, conf, myTime, inOperation, lines = pickle.load(fin)
+		except EOFError:
+			break
+		MyTime.setTime(myTime)
+		fails = []
+		errors = 0
+		flt = filters.get(name)
+		try:
+			if flt is None or flt[0] != conf:
+				flt = filters[name] = (conf, _createFilter(conf))
+			f = flt[1]
+			f.inOperation = inOperation
+			for line in lines:
+				try:
+					for (_, fid, date, fail) in f.processLine(line):
+						if fid is None: continue
+						fails.append([(str(fid), fid.isValid), date, fail])
+				except Exception as e:
+					errors += 1
+					logSys.error("Failed to process line: %r, caught exception: %r", line, e)
+		except Exception as e:
+			errors += 1
+			logSys.error("Failed to create filter: %r", e)
+		pickle.dump((fails, coll.records, errors), fout, pickle.HIGHEST_PROTOCOL)
+		fout.flush()
+		coll.records = []
@@ -25,11 +25,11 @@ __license__ = "GPL"
 
 import logging
 import os
-from os.path import dirname, sep as pathsep
+from os.path import sep as pathsep
 
 from .failmanager import FailManagerEmpty
-from .filter import FileFilter
-from .mytime import MyTime, time
+from .filterwatcher import FilterWatcher
+from .mytime import MyTime
 from .utils import Utils
 from ..helpers import getLogger
 
@@ -62,7 +62,7 @@ pyinotify.log = logSys
 # that matches a given regular expression. This class is instantiated by
 # a Jail object.
 
-class FilterPyinotify(FileFilter):
+class FilterPyinotify(FilterWatcher):
 	##
 	# Constructor.
 	#
@@ -70,15 +70,10 @@ class FilterPyinotify(FileFilter):
 	# @param jail the jail object
 
 	def __init__(self, jail):
-		FileFilter.__init__(self, jail)
+		FilterWatcher.__init__(self, jail)
 		# Pyinotify watch manager
 		self.__monitor = pyinotify.WatchManager()
 		self.__notifier = None
-		self.__watchFiles = dict()
-		self.__watchDirs = dict()
-		self.__pending = dict()
-		self.__pendingChkTime = 0
-		self.__pendingMinTime = 60
 		logSys.debug("Created FilterPyinotify")
 
 	def callback(self, event, origin=''):
@@ -86,8 +81,8 @@ class FilterPyinotify(FileFilter):
 		path = event.pathname
 		# check watching of this path:
 		isWF = False
-		isWD = path in self.__watchDirs
-		if not isWD and path in self.__watchFiles:
+		isWD = path in self._watchDirs
+		if not isWD and path in self._watchFiles:
 			isWF = True
 		assumeNoDir = False
 		if event.mask & ( pyinotify.IN_CREATE | pyinotify.IN_MOVED_TO ):
@@ -107,12 +102,12 @@ class FilterPyinotify(FileFilter):
 					path.endswith('-unknown-path') and not isWF and not isWD
 			):
 				path = path[:-len('-unknown-path')]
-				isWD = path in self.__watchDirs
+				isWD = path in self._watchDirs
 			# watch was removed for some reasons (log-rotate?):
 			if isWD and (assumeNoDir or not os.path.isdir(path)):
 				self._addPending(path, event, isDir=True)
 			elif not isWF: # pragma: no cover (assume too sporadic)
-				for logpath in self.__watchDirs:
+				for logpath in self._watchDirs:
 					if logpath.startswith(path + pathsep) and (assumeNoDir or not os.path.isdir(logpath)):
 						self._addPending(logpath, event, isDir=True)
 		if isWF and not os.path.isfile(path):
@@ -127,95 +122,16 @@ class FilterPyinotify(FileFilter):
 			return
 		self._process_file(path)
 
-	def _process_file(self, path):
-		"""Process a given file
-
-		TODO -- RF:
-		this is a common logic and must be shared/provided by FileFilter
-		"""
-		if not self.idle:
-			self.getFailures(path)
-
 	def _addPending(self, path, reason, isDir=False):
-		if path not in self.__pending:
-			self.__pending[path] = [Utils.DEFAULT_SLEEP_INTERVAL, isDir];
-			self.__pendingMinTime = 0
-			if isinstance(reason, pyinotify.Event):
-				reason = [reason.maskname, reason.pathname]
-			logSys.log(logging.MSG, "Log absence detected (possibly rotation) for %s, reason: %s of %s",
-				path, *reason)
-
-	def _delPending(self, path):
-		try:
-			del self.__pending[path]
-		except KeyError: pass
+		if isinstance(reason, pyinotify.Event):
+			reason = [reason.maskname, reason.pathname]
+		super(FilterPyinotify, self)._addPending(path, reason, isDir)
 
-	def getPendingPaths(self):
-		return list(self.__pending.keys())
-
-	def _checkPending(self):
-		if not self.__pending:
-			return
-		ntm = time.time()
-		if ntm < self.__pendingChkTime + self.__pendingMinTime:
-			return
-		found = {}
-		minTime = 60
-		for path, (retardTM, isDir) in list(self.__pending.items()):
-			if ntm - self.__pendingChkTime < retardTM:
-				if minTime > retardTM: minTime = retardTM
-				continue
-			chkpath = os.path.isdir if isDir else os.path.isfile
-			if not chkpath(path): # not found - prolong for next time
-				if retardTM < 60: retardTM *= 2
-				if minTime > retardTM: minTime = retardTM
-				try:
-					self.__pending[path][0] = retardTM
-				except KeyError: pass
-				continue
-			logSys.log(logging.MSG, "Log presence detected for %s %s", 
-				"directory" if isDir else "file", path)
-			found[path] = isDir
-		self.__pendingChkTime = time.time()
-		self.__pendingMinTime = minTime
-		# process now because we've missed it in monitoring:
-		for path, isDir in found.items():
-			self._delPending(path)
-			# refresh monitoring of this:
-			if isDir is not None:
-				self._refreshWatcher(path, isDir=isDir)
-			if isDir:
-				# check all files belong to this dir:
-				for logpath in list(self.__watchFiles):
-					if logpath.startswith(path + pathsep):
-						# if still no file - add to pending, otherwise refresh and process:
-						if not os.path.isfile(logpath):
-							self._addPending(logpath, ('FROM_PARDIR', path))
-						else:
-							self._refreshWatcher(logpath)
-							self._process_file(logpath)
-			else:
-				# process (possibly no old events for it from watcher):
-				self._process_file(path)
-
-	def _refreshWatcher(self, oldPath, newPath=None, isDir=False):
-		if not newPath: newPath = oldPath
-		# we need to substitute the watcher with a new one, so first
-		# remove old one and then place a new one
-		if not isDir:
-			self._delFileWatcher(oldPath)
-			self._addFileWatcher(newPath)
-		else:
-			self._delDirWatcher(oldPath)
-			self._addDirWatcher(newPath)
-
-	def _addFileWatcher(self, path):
-		# we need to watch also the directory for IN_CREATE
-		self._addDirWatcher(dirname(path))
-		# add file watcher:
-		wd = self.__monitor.add_watch(path, pyinotify.IN_MODIFY)
-		self.__watchFiles.update(wd)
-		logSys.debug("Added file watcher for %s", path)
+	def _addWatch(self, path, isDir=False):
+		mask = pyinotify.IN_MODIFY if not isDir else (
+			pyinotify.IN_CREATE | pyinotify.IN_MOVED_TO | pyinotify.IN_MOVE_SELF |
+			pyinotify.IN_DELETE_SELF | pyinotify.IN_ISDIR)
+		return self.__monitor.add_watch(path, mask)[path]
 
 	def _delWatch(self, wdInt):
 		m = self.__monitor
@@ -229,70 +145,6 @@ class FilterPyinotify(FileFilter):
 				raise e
 		return False
 
-	def _delFileWatcher(self, path):
-		try:
-			wdInt = self.__watchFiles.pop(path)
-			if not self._delWatch(wdInt):
-				logSys.debug("Non-existing file watcher %r for file %s", wdInt, path)
-			logSys.debug("Removed file watcher for %s", path)
-			return True
-		except KeyError: # pragma: no cover
-			pass
-		return False
-
-	def _addDirWatcher(self, path_dir):
-		# Add watch for the directory:
-		if path_dir not in self.__watchDirs:
-			self.__watchDirs.update(
-				self.__monitor.add_watch(path_dir, pyinotify.IN_CREATE | 
-					pyinotify.IN_MOVED_TO | pyinotify.IN_MOVE_SELF |
-					pyinotify.IN_DELETE_SELF | pyinotify.IN_ISDIR))
-			logSys.debug("Added monitor for the parent directory %s", path_dir)
-
-	def _delDirWatcher(self, path_dir):
-		# Remove watches for the directory:
-		try:
-			wdInt = self.__watchDirs.pop(path_dir)
-			if not self._delWatch(wdInt): # pragma: no cover
-				logSys.debug("Non-existing file watcher %r for directory %s", wdInt, path_dir)
-			logSys.debug("Removed monitor for the parent directory %s", path_dir)
-		except KeyError: # pragma: no cover
-			pass
-
-	##
-	# Add a log file path
-	#
-	# @param path log file path
-
-	def _addLogPath(self, path):
-		self._addFileWatcher(path)
-		# notify (wake up if in waiting):
-		if self.active:
-			self.__pendingMinTime = 0
-		# retard until filter gets started, isDir=None signals special case: process file only (don't need to refresh monitor):
-		self._addPending(path, ('INITIAL', path), isDir=None)
-
-	##
-	# Delete a log path
-	#
-	# @param path the log file to delete
-
-	def _delLogPath(self, path):
-		self._delPending(path)
-		if not self._delFileWatcher(path): # pragma: no cover
-			logSys.error("Failed to remove watch on path: %s", path)
-
-		path_dir = dirname(path)
-		for k in list(self.__watchFiles):
-			if k.startswith(path_dir + pathsep):
-				path_dir = None
-				break
-		if path_dir:
-			# Remove watches for the directory
-			# since there is no other monitored file under this directory
-			self._delPending(path_dir)
-			self._delDirWatcher(path_dir)
-
 	# pyinotify.ProcessEvent default handler:
 	def __process_default(self, event):
 		try:
@@ -308,7 +160,7 @@ class FilterPyinotify(FileFilter):
 	def __notify_maxtout(self):
 		# timeout for pyinotify must be set in milliseconds (fail2ban time values are 
 		# floats contain seconds), max 0.5 sec (additionally regards pending check time)
-		return min(self.sleeptime, 0.5, self.__pendingMinTime) * 1000
+		return min(self.sleeptime, 0.5, self._pendingMinTime) * 1000
 
 	##
 	# Main loop.
@@ -327,9 +179,8 @@ class FilterPyinotify(FileFilter):
 
 				# slow check events while idle:
 				if self.idle:
-					if Utils.wait_for(lambda: not self.active or not self.idle,
-						min(self.sleeptime * 10, self.__pendingMinTime), 
-						min(self.sleeptime, self.__pendingMinTime)
+					if self.wait_for(lambda: not self.active or not self.idle,
+						min(self.sleeptime * 10, self._pendingMinTime)
 					):
 						if not self.active: break
 
@@ -341,9 +192,9 @@ class FilterPyinotify(FileFilter):
 					return (
 						not self.active
 						or bool(self.__notifier.check_events(timeout=self.__notify_maxtout))
-						or (self.__pendingMinTime and self.__pending)
+						or (self._pendingMinTime and self._pending)
 					)
-				wres = Utils.wait_for(__check_events, min(self.sleeptime, self.__pendingMinTime))
+				wres = Utils.wait_for(__check_events, min(self.sleeptime, self._pendingMinTime))
 				if wres:
 					if not self.active: break
 					if not isinstance(wres, dict):
@@ -0,0 +1,502 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Developers"
+__copyright__ = "Copyright (c) 2026 Fail2Ban Developers"
+__license__ = "GPL"
+
+import calendar
+import datetime
+import os
+import re
+import select
+import socket
+import stat
+import threading
+import time
+from collections import deque
+
+from .filter import Filter
+from .jailthread import JailThread
+from .mytime import MyTime
+from ..helpers import getLogger, logging, splitwords, uni_decode
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+
+## Syslog facilities (RFC 5424, section 6.2.1):
+FACILITIES = {
+	'kern': 0, 'user': 1, 'mail': 2, 'daemon': 3, 'auth': 4, 'syslog': 5, 'lpr': 6,
+	'news': 7, 'uucp': 8, 'cron': 9, 'authpriv': 10, 'ftp': 11, 'ntp': 12, 'security': 13,
+	'console': 14, 'solaris-cron': 15,
+	'local0': 16, 'local1': 17, 'local2': 18, 'local3': 19,
+	'local4': 20, 'local5': 21, 'local6': 22, 'local7': 23,
+}
+
+_MONTHS = dict((m, i) for i, m in enumerate(
+	('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1))
+
+_PRI_CRE = re.compile(r'<(\d{1,3})>')
+# RFC 5424: VERSION SP TIMESTAMP SP HOSTNAME SP APP-NAME SP PROCID SP MSGID SP STRUCTURED-DATA [SP MSG]
+_RFC5424_CRE = re.compile(
+	r'1 (\S+) (\S+) (\S+) (\S+) \S+ (?:-|(?:\[(?:[^\]"\\]|\\.|"(?:[^"\\]|\\.)*")*\])+)(?: |$)', re.S)
+_RFC5424_TS_CRE = re.compile(
+	r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?(Z|([+-])(\d\d):(\d\d))$')
+# RFC 3164: TIMESTAMP ("Mmm dd hh:mm:ss", optional by local sockets) SP [HOSTNAME SP] TAG[PID]: MSG
+_RFC3164_TS_CRE = re.compile(r'([A-Z][a-z]{2}) ([ \d]\d) (\d\d):(\d\d):(\d\d) ')
+_RFC3164_TAG_CRE = re.compile(r'([^\s\[\]:]+)(?:\[([^\]\s]*)\])?:(?: |$)')
+
+
+def _parseRFC5424Time(v):
+	m = _RFC5424_TS_CRE.match(v)
+	if not m:
+		return None
+	tm = calendar.timegm(tuple(int(v) for v in m.group(1, 2, 3, 4, 5, 6)))
+	if m.group(7):
+		tm += float('0.' + m.group(7))
+	if m.group(8) != 'Z':
+		ofs = int(m.group(10)) * 3600 + int(m.group(11)) * 60
+		tm += -ofs if m.group(9) == '+' else ofs
+	return tm
+
+def _parseRFC3164Time(m, now):
+	try:
+		lt = MyTime.localtime(now)
+		tm = (lt.tm_year, _MONTHS[m.group(1)], int(m.group(2)),
+			int(m.group(3)), int(m.group(4)), int(m.group(5)), 0, 0, -1)
+		t = time.mktime(tm)
+		# no year in header - message of previous year (e. g. December's message received in January):
+		if t > now + 86400:
+			t = time.mktime((tm[0] - 1,) + tm[1:])
+		return t
+	except (KeyError, ValueError, OverflowError):
+		return None
+
+
+def parseSyslogMessage(msg, now=None):
+	"""Parses syslog message (RFC 5424 or RFC 3164, header may be reduced as by local sockets).
+
+	Returns
+	-------
+	tuple
+		(facility, severity, time, host, tag, pid, message); time is the receive time
+		(`now`) if the header contains no (valid) timestamp, host, tag and pid may be None.
+		Messages without PRI get facility "user" and severity "notice".
+	"""
+	if now is None:
+		now = MyTime.time()
+	fac, sev, tm, host, tag, pid = 1, 5, None, None, None, None
+	m = _PRI_CRE.match(msg)
+	if m:
+		pri = int(m.group(1))
+		fac, sev = pri >> 3, pri & 7
+		pos = m.end()
+		m = _RFC5424_CRE.match(msg, pos)
+		if m:
+			ts, host, tag, pid = (None if v == '-' else v for v in m.group(1, 2, 3, 4))
+			if ts:
+				tm = _parseRFC5424Time(ts)
+			msg = msg[m.end():]
+			if msg.startswith('\ufeff'):
+				msg = msg[1:]
+			return (fac, sev, tm if tm is not None else now, host, tag, pid, msg)
+		m = _RFC3164_TS_CRE.match(msg, pos)
+		if m:
+			tm = _parseRFC3164Time(m, now)
+			pos = m.end()
+		m = _RFC3164_TAG_CRE.match(msg, pos)
+		if not m:
+			# hostname before tag:
+			i = msg.find(' ', pos)
+			if i > pos:
+				m = _RFC3164_TAG_CRE.match(msg, i + 1)
+				if m:
+					host = msg[pos:i]
+		if m:
+			tag, pid = m.group(1, 2)
+			pos = m.end()
+		msg = msg[pos:]
+	return (fac, sev, tm if tm is not None else now, host, tag, pid, msg)
+
+
+def parseListenAddress(address):
+	"""Parses listen address "udp:host:port", "tcp:host:port" or "unix:path".
+
+	Host of IPv6 address should be enclosed in brackets, e. g. "udp:[::1]:514".
+	Returns tuple (protocol, family, address).
+	"""
+	proto, _, addr = address.partition(':')
+	proto = proto.lower()
+	if proto == 'unix':
+		if not addr:
+			raise ValueError("Invalid syslog listen address %r" % address)
+		return proto, socket.AF_UNIX, addr
+	if proto not in ('udp', 'tcp'):
+		raise ValueError("Invalid syslog listen address %r, expected udp:, tcp: or unix:" % address)
+	host, _, port = addr.rpartition(':')
+	try:
+		port = int(port)
+	except ValueError:
+		raise ValueError("Invalid port in syslog listen address %r" % address)
+	if host.startswith('['):
+		return proto, socket.AF_INET6, (host.strip('[]'), port)
+	return proto, socket.AF_INET, (host or '127.0.0.1', port)
+
+
+class SyslogListener(JailThread):
+	"""Receives syslog messages from a socket (UDP, TCP or unix datagram) and routes
+	them to the filters subscribed to the listener.
+
+	Messages are received in batches (socket drained without blocking up to `maxBatch`
+	messages per wakeup), each message is decoded and its header is parsed once,
+	the regex stage is done by the filters in their own threads.
+	"""
+
+	## Max count of messages received at once:
+	maxBatch = 256
+	## Max size of message (datagram resp. frame of TCP stream):
+	maxSize = 65536
+
+	__wakeFds = None
+
+	def __init__(self, address):
+		JailThread.__init__(self, name="f2b/syslog")
+		self.address = address
+		self.subscribers = []
+		self.received = 0
+		self.__conns = {}
+		self.__proto, family, addr = parseListenAddress(address)
+		self.__sock = sock = socket.socket(family,
+			socket.SOCK_STREAM if self.__proto == 'tcp' else socket.SOCK_DGRAM)
+		try:
+			if self.__proto == 'unix':
+				# remove stale socket:
+				try:
+					if stat.S_ISSOCK(os.stat(addr).st_mode):
+						os.unlink(addr)
+				except OSError:
+					pass
+			else:
+				sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			sock.bind(addr)
+			if self.__proto == 'tcp':
+				sock.listen(16)
+			sock.setblocking(False)
+		except:
+			sock.close()
+			raise
+		self.__path = addr if self.__proto == 'unix' else None
+		self.__wakeFds = os.pipe()
+		self.__poll = select.poll()
+		self.__poll.register(sock.fileno(), select.POLLIN)
+		self.__poll.register(self.__wakeFds[0], select.POLLIN)
+
+	def __repr__(self):
+		return "%s(%r)" % (self.__class__.__name__, self.address)
+
+	def status(self, flavor="basic"):
+		return [("Listen", self.address), ("Received", self.received)]
+
+	def wakeup(self):
+		super(SyslogListener, self).wakeup()
+		# wake up blocking poll:
+		if self.__wakeFds:
+			try:
+				os.write(self.__wakeFds[1], b'\0')
+			except OSError: # pragma: no cover
+				pass
+
+	def onStop(self):
+		pass
+
+	def _recvDgrams(self, msgs):
+		sock = self.__sock
+		for _ in range(self.maxBatch):
+			try:
+				msgs.append(sock.recv(self.maxSize))
+			except (BlockingIOError, InterruptedError):
+				break
+
+	def _accept(self):
+		while True:
+			try:
+				conn, _ = self.__sock.accept()
+			except (BlockingIOError, InterruptedError):
+				break
+			conn.setblocking(False)
+			self.__conns[conn.fileno()] = [conn, b'']
+			self.__poll.register(conn.fileno(), select.POLLIN)
+
+	def _closeConn(self, fd):
+		conn = self.__conns.pop(fd, None)
+		if conn:
+			self.__poll.unregister(fd)
+			conn[0].close()
+
+	def _recvStream(self, fd, msgs):
+		c = self.__conns.get(fd)
+		if not c:
+			return
+		try:
+			data = c[0].recv(self.maxSize)
+		except (BlockingIOError, InterruptedError): # pragma: no cover
+			return
+		except OSError:
+			data = b''
+		if not data:
+			if c[1].strip():
+				msgs.append(c[1])
+			self._closeConn(fd)
+			return
+		buf = c[1] + data
+		# frames are either octet counted ("LEN SP MSG") or delimited by new line (RFC 6587):
+		while buf:
+			if buf[:1].isdigit():
+				i = buf.find(b' ')
+				if 0 < i < 10 and buf[:i].isdigit():
+					n = int(buf[:i])
+					if len(buf) < i + 1 + n:
+						break
+					msgs.append(buf[i+1:i+1+n])
+					buf = buf[i+1+n:]
+					continue
+			i = buf.find(b'\n')
+			if i < 0:
+				if len(buf) >= self.maxSize:
+					msgs.append(buf)
+					buf = b''
+				break
+			msgs.append(buf[:i].rstrip(b'\r'))
+			buf = buf[i+1:]
+		c[1] = buf
+
+	def _dispatch(self, msgs):
+		now = MyTime.time()
+		recs = []
+		for data in msgs:
+			data = uni_decode(data.rstrip(b'\r\n\0'), 'utf-8', 'replace')
+			if data:
+				recs.append(parseSyslogMessage(data, now))
+		if not recs:
+			return
+		self.received += len(recs)
+		for flt in list(self.subscribers):
+			flt._putMessages(recs)
+
+	def run(self):
+		sockfd = self.__sock.fileno()
+		wakefd = self.__wakeFds[0]
+		while self.active:
+			try:
+				events = self.__poll.poll(self.sleeptime * 1000)
+				msgs = []
+				for fd, ev in events:
+					if fd == wakefd:
+						os.read(wakefd, 4096)
+					elif fd == sockfd:
+						if self.__proto == 'tcp':
+							self._accept()
+						else:
+							self._recvDgrams(msgs)
+					else:
+						self._recvStream(fd, msgs)
+				if msgs:
+					self._dispatch(msgs)
+			except Exception as e: # pragma: no cover
+				if not self.active:
+					break
+				logSys.error("Caught unhandled exception in syslog listener %r: %r", self.address, e,
+					exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+		return True
+
+	def afterStop(self):
+		for fd in list(self.__conns):
+			self._closeConn(fd)
+		self.__sock.close()
+		fds, self.__wakeFds = self.__wakeFds, None
+		if fds:
+			os.close(fds[0])
+			os.close(fds[1])
+		if self.__path:
+			try:
+				os.unlink(self.__path)
+			except OSError: # pragma: no cover
+				pass
+
+
+class SyslogListeners(object):
+	"""Registry of syslog listeners (one per listen address) shared by filters.
+	"""
+
+	_lock = threading.Lock()
+	_listeners = {}
+
+	@classmethod
+	def subscribe(cls, address, flt):
+		"""Returns (started) listener for given address, filter gets subscribed.
+		"""
+		with cls._lock:
+			l = cls._listeners.get(address)
+			if l is None:
+				l = SyslogListener(address)
+				l.start()
+				cls._listeners[address] = l
+			l.subscribers.append(flt)
+		return l
+
+	@classmethod
+	def unsubscribe(cls, listener, flt):
+		"""Unsubscribes filter from listener, listener is stopped if no more filters use it.
+		"""
+		with cls._lock:
+			try:
+				listener.subscribers.remove(flt)
+			except ValueError:
+				pass
+			if listener.subscribers:
+				return
+			if cls._listeners.get(listener.address) is listener:
+				del cls._listeners[listener.address]
+		listener.stop()
+
+	@classmethod
+	def getListeners(cls):
+		with cls._lock:
+			return list(cls._listeners.values())
+
+
+##
+# Syslog socket filter class.
+#
+# This class receives syslog messages from a socket (e. g. forwarded by rsyslog or
+# sent by local programs directly) and detects login failures or anything else that
+# matches a given regular expression. This class is instantiated by a Jail object.
+
+class FilterSyslog(Filter):
+
+	## Max count of messages queued for the filter (oldest get dropped if exceeded):
+	maxQueue = 100000
+
+	def __init__(self, jail, listen='udp:127.0.0.1:514', program=None, facility=None, **kwargs):
+		Filter.__init__(self, jail, **kwargs)
+		self.__programs = set(splitwords(program)) if program else None
+		self.__facilities = None
+		if facility:
+			self.__facilities = set()
+			for f in splitwords(facility):
+				if f.isdigit():
+					self.__facilities.add(int(f))
+				elif f.lower() in FACILITIES:
+					self.__facilities.add(FACILITIES[f.lower()])
+				else:
+					raise ValueError("Unknown syslog facility %r" % f)
+		self.__queue = deque()
+		self.__dropped = 0
+		self.__listener = SyslogListeners.subscribe(listen, self)
+		self.setDatePattern(None)
+		logSys.debug("Created FilterSyslog")
+
+	@property
+	def listener(self):
+		return self.__listener
+
+	def _putMessages(self, recs):
+		"""Queues messages routed to this filter (by program and facility), invoked by listener.
+		"""
+		if not self.active or self.idle:
+			return
+		progs, facs = self.__programs, self.__facilities
+		if progs is not None or facs is not None:
+			recs = [r for r in recs if
+				(progs is None or r[4] in progs) and (facs is None or r[0] in facs)]
+			if not recs:
+				return
+		q = self.__queue
+		q.extend(recs)
+		n = len(q) - self.maxQueue
+		if n > 0:
+			self.__dropped += n
+			for _ in range(n):
+				q.popleft()
+		self.wakeup()
+
+	def formatSyslogEntry(self, rec):
+		"""Formats syslog message to the line (in journal style) and its time.
+		"""
+		fac, sev, tm, host, tag, pid, msg = rec
+		logelements = []
+		if host:
+			logelements.append(host)
+		if tag:
+			logelements.append(tag + ("[%s]:" % pid if pid else ":"))
+		logelements.append(msg)
+		logline = " ".join(logelements)
+		return (("", datetime.datetime.fromtimestamp(tm).isoformat() + ' ',
+			logline.replace('\n', '\\n')), tm)
+
+	def run(self):
+		if self.__programs is None and self.__facilities is None:
+			logSys.notice(
+				"[%s] Jail started without 'program' or 'facility' set. "
+				"Jail regexs will be checked against all syslog messages, "
+				"which is not advised for performance reasons.", self.jailName)
+		logSys.debug("[%s] filter started (syslog %s)", self.jailName, self.__listener.address)
+		q = self.__queue
+		while self.active:
+			try:
+				if self.idle:
+					if not self.wait_for(lambda: not self.active or not self.idle,
+						self.sleeptime * 10
+					):
+						self.ticks += 1
+						continue
+				# wait for messages (woken up by listener):
+				if self.wait_for(lambda: not self.active or self.idle or q, self.sleeptime):
+					while q and self.active and not self.idle:
+						line, tm = self.formatSyslogEntry(q.popleft())
+						self.processLineAndAdd(line, tm)
+				self.ticks += 1
+				if self.ticks % 10 == 0:
+					self.performSvc()
+			except Exception as e: # pragma: no cover
+				if not self.active: # if not active - error by stop...
+					break
+				logSys.error("Caught unhandled exception in main cycle: %r", e,
+					exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+				# incr common error counter:
+				self.commonError("unhandled", e)
+		logSys.debug("[%s] filter terminated", self.jailName)
+		return True
+
+	def status(self, flavor="basic"):
+		ret = super(FilterSyslog, self).status(flavor=flavor)
+		if flavor == "stats":
+			return ret
+		ret.append(("Syslog listen", [self.__listener.address] if self.__listener else []))
+		if self.__dropped:
+			ret.append(("Syslog dropped", self.__dropped))
+		return ret
+
+	def afterStop(self):
+		"""Unsubscribes from listener (stops it if not used by other filters)."""
+		listener, self.__listener = self.__listener, None
+		if listener:
+			SyslogListeners.unsubscribe(listener, self)
+		self.__queue.clear()
@@ -38,7 +38,7 @@ from ..helpers import getLogger, logging, splitwords, uni_decode, _as_bool
 logSys = getLogger(__name__)
 
 
-_systemdPathCache = Utils.Cache()
+_systemdPathCache = Utils.Cache(name='systemdpath')
 def _getSystemdPath(path):
 	"""Get systemd path using systemd-path command (cached)"""
 	p = _systemdPathCache.get(path)
@@ -423,8 +423,8 @@ class FilterSystemd(JournalFilter): # pragma: systemd no cover
 				if self.idle:
 					# because journal.wait will returns immediately if we have records in journal,
 					# just wait a little bit here for not idle, to prevent hi-load:
-					if not Utils.wait_for(lambda: not self.active or not self.idle, 
-						self.sleeptime * 10, self.sleeptime
+					if not self.wait_for(lambda: not self.active or not self.idle, 
+						self.sleeptime * 10
 					):
 						self.ticks += 1
 						continue
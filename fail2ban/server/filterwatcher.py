@@ -0,0 +1,220 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Developers"
+__copyright__ = "Copyright (c) 2026 Fail2Ban Developers"
+__license__ = "GPL"
+
+import logging
+import os
+from os.path import dirname, sep as pathsep
+
+from .filter import FileFilter
+from .mytime import time
+from .utils import Utils
+from ..helpers import getLogger
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+
+##
+# Base class of file filters monitoring logs using watchers (inotify).
+#
+# Maintains watchers of log files and their parent directories, and the pending
+# paths (absent files or directories, e. g. by log rotation), which are checked
+# periodically and processed as soon as they appear again.
+#
+# The backend implements adding and removing of single watch (`_addWatch`,
+# `_delWatch`), and may overwrite processing of single file (`_process_file`).
+
+class FilterWatcher(FileFilter):
+
+	def __init__(self, jail, **kwargs):
+		FileFilter.__init__(self, jail, **kwargs)
+		self._watchFiles = dict()
+		self._watchDirs = dict()
+		self._pending = dict()
+		self._pendingChkTime = 0
+		self._pendingMinTime = 60
+
+	def _addWatch(self, path, isDir=False): # pragma: no cover - abstract
+		"""Adds watch for file (or directory), returns watch descriptor (raises OSError on failure)
+		"""
+		raise NotImplementedError()
+
+	def _delWatch(self, wd): # pragma: no cover - abstract
+		"""Removes watch, returns False if it does not exist (anymore)
+		"""
+		raise NotImplementedError()
+
+	def _process_file(self, path):
+		"""Process a given file (found by watcher or appeared again after absence)
+		"""
+		if not self.idle:
+			self.getFailures(path)
+
+	def _addPending(self, path, reason, isDir=False):
+		if path not in self._pending:
+			self._pending[path] = [Utils.DEFAULT_SLEEP_INTERVAL, isDir];
+			self._pendingMinTime = 0
+			logSys.log(logging.MSG, "Log absence detected (possibly rotation) for %s, reason: %s of %s",
+				path, *reason)
+
+	def _delPending(self, path):
+		try:
+			del self._pending[path]
+		except KeyError: pass
+
+	def getPendingPaths(self):
+		return list(self._pending.keys())
+
+	def _checkPending(self):
+		if not self._pending:
+			return
+		ntm = time.time()
+		if ntm < self._pendingChkTime + self._pendingMinTime:
+			return
+		found = {}
+		minTime = 60
+		for path, (retardTM, isDir) in list(self._pending.items()):
+			if ntm - self._pendingChkTime < retardTM:
+				if minTime > retardTM: minTime = retardTM
+				continue
+			chkpath = os.path.isdir if isDir else os.path.isfile
+			if not chkpath(path): # not found - prolong for next time
+				if retardTM < 60: retardTM *= 2
+				if minTime > retardTM: minTime = retardTM
+				try:
+					self._pending[path][0] = retardTM
+				except KeyError: pass
+				continue
+			logSys.log(logging.MSG, "Log presence detected for %s %s",
+				"directory" if isDir else "file", path)
+			found[path] = isDir
+		self._pendingChkTime = time.time()
+		self._pendingMinTime = minTime
+		# process now because we've missed it in monitoring:
+		for path, isDir in found.items():
+			self._delPending(path)
+			# refresh monitoring of this:
+			if isDir is not None:
+				self._refreshWatcher(path, isDir=isDir)
+			if isDir:
+				# check all files belong to this dir:
+				for logpath in list(self._watchFiles):
+					if logpath.startswith(path + pathsep):
+						# if still no file - add to pending, otherwise refresh and process:
+						if not os.path.isfile(logpath):
+							self._addPending(logpath, ('FROM_PARDIR', path))
+						else:
+							self._refreshWatcher(logpath)
+							self._process_file(logpath)
+			else:
+				# process (possibly no old events for it from watcher):
+				self._process_file(path)
+
+	def _refreshWatcher(self, oldPath, newPath=None, isDir=False):
+		if not newPath: newPath = oldPath
+		# we need to substitute the watcher with a new one, so first
+		# remove old one and then place a new one
+		if not isDir:
+			self._delFileWatcher(oldPath)
+			self._addFileWatcher(newPath)
+		else:
+			self._delDirWatcher(oldPath)
+			self._addDirWatcher(newPath)
+
+	def _addFileWatcher(self, path):
+		# we need to watch also the directory for IN_CREATE
+		self._addDirWatcher(dirname(path))
+		# add file watcher:
+		try:
+			self._watchFiles[path] = self._addWatch(path)
+		except OSError as e:
+			# file is missing (rotation in-between) - monitor it as pending:
+			self._watchFiles[path] = None
+			self._addPending(path, ('ADD_WATCH', e.strerror))
+			return
+		logSys.debug("Added file watcher for %s", path)
+
+	def _delFileWatcher(self, path):
+		try:
+			wd = self._watchFiles.pop(path)
+		except KeyError: # pragma: no cover
+			return False
+		if wd is not None and not self._delWatch(wd):
+			logSys.debug("Non-existing file watcher %r for file %s", wd, path)
+		logSys.debug("Removed file watcher for %s", path)
+		return True
+
+	def _addDirWatcher(self, path_dir):
+		# Add watch for the directory:
+		if path_dir not in self._watchDirs:
+			try:
+				self._watchDirs[path_dir] = self._addWatch(path_dir, isDir=True)
+			except OSError as e:
+				self._watchDirs[path_dir] = None
+				self._addPending(path_dir, ('ADD_WATCH', e.strerror), isDir=True)
+				return
+			logSys.debug("Added monitor for the parent directory %s", path_dir)
+
+	def _delDirWatcher(self, path_dir):
+		# Remove watches for the directory:
+		try:
+			wd = self._watchDirs.pop(path_dir)
+		except KeyError: # pragma: no cover
+			return
+		if wd is not None and not self._delWatch(wd): # pragma: no cover
+			logSys.debug("Non-existing file watcher %r for directory %s", wd, path_dir)
+		logSys.debug("Removed monitor for the parent directory %s", path_dir)
+
+	##
+	# Add a log file path
+	#
+	# @param path log file path
+
+	def _addLogPath(self, path):
+		self._addFileWatcher(path)
+		# notify (wake up if in waiting):
+		if self.active:
+			self._pendingMinTime = 0
+		# retard until filter gets started, isDir=None signals special case: process file only (don't need to refresh monitor):
+		self._addPending(path, ('INITIAL', path), isDir=None)
+
+	##
+	# Delete a log path
+	#
+	# @param path the log file to delete
+
+	def _delLogPath(self, path):
+		self._delPending(path)
+		if not self._delFileWatcher(path): # pragma: no cover
+			logSys.error("Failed to remove watch on path: %s", path)
+
+		path_dir = dirname(path)
+		for k in list(self._watchFiles):
+			if k.startswith(path_dir + pathsep):
+				path_dir = None
+				break
+		if path_dir:
+			# Remove watches for the directory
+			# since there is no other monitored file under this directory
+			self._delPending(path_dir)
+			self._delDirWatcher(path_dir)
@@ -25,6 +25,9 @@ import socket
 import struct
 import os
 import re
+import time
+from collections import deque
+from threading import Condition, Event, Thread
 
 from .utils import Utils
 from ..helpers import getLogger, MyTime, splitwords
@@ -70,6 +73,159 @@ def getfqdn(name=''):
 	return socket.getfqdn(name)
 
 
+##
+# Pool of resolver threads.
+#
+# Resolves names (and addresses) in worker threads, so a slow or lazy DNS-system
+# cannot stall the callers (e. g. log processing of filter).
+#
+class DNSResolverPool(object):
+	"""Shared pool of worker threads for asynchronous DNS lookups.
+
+	Parallel lookups of the same key are deduplicated (only one resolution is
+	in flight), negative results (nothing resolved or resolver failed) are cached
+	for a short time in a separate cache, and every lookup has a deadline - the
+	waiting callers resp. deferred callbacks are released with `None` as result
+	if the resolver did not respond in time (the result still gets cached later).
+
+	Parameters
+	----------
+	workers : int
+		Max count of worker threads (started on demand).
+	timeout : float
+		Deadline of a lookup in seconds.
+	negTime : float
+		Life time of negative results in seconds.
+	"""
+
+	def __init__(self, workers=4, timeout=5, negTime=60):
+		self._cond = Condition()
+		self._queue = deque()
+		self._inflight = {}
+		self._threads = []
+		self._idle = 0
+		self._active = True
+		self.workers = workers
+		self.timeout = timeout
+		self._negCache = Utils.Cache(maxCount=1000, maxTime=negTime)
+
+	def lookup(self, resolve, cache, key, callback=None, timeout=None, expired=None):
+		"""Returns result of `resolve(key)` (cached or resolved in time).
+
+		If not resolved until deadline, it returns `expired`. If `callback` is given,
+		it returns `None` immediately and the result will be supplied later via
+		`callback(key, result)` (`None` if the deadline is exceeded).
+		"""
+		v = cache.get(key)
+		if v is not None:
+			return v
+		v = self._negCache.get((resolve, key), ())
+		if v != ():
+			return v
+		ev = self._submit(resolve, cache, key, callback)
+		if callback is not None:
+			return None
+		if timeout is None: timeout = self.timeout
+		if not ev.wait(timeout):
+			logSys.debug("Lookup of %r exceeded deadline of %ss", key, timeout)
+			self._release()
+			return expired
+		return ev.result
+
+	def _release(self):
+		# release expired deferred callbacks (also if all workers are busy):
+		with self._cond:
+			expired = self._expire()
+		for key, callbacks in expired:
+			self._notify(key, callbacks, None)
+
+	def _submit(self, resolve, cache, key, callback):
+		if self._inflight:
+			self._release()
+		with self._cond:
+			entry = self._inflight.get((resolve, key))
+			if entry is None:
+				ev = Event()
+				ev.result = None
+				entry = self._inflight[(resolve, key)] = [ev, [],
+					time.time() + self.timeout, resolve, cache, key]
+				self._queue.append(entry)
+				if self._idle < len(self._queue) and len(self._threads) < self.workers:
+					self._start()
+				self._cond.notify()
+			if callback is not None:
+				entry[1].append(callback)
+			return entry[0]
+
+	def _start(self):
+		th = Thread(target=self._run, name="f2b/dns-%d" % len(self._threads))
+		th.daemon = True
+		self._threads.append(th)
+		th.start()
+
+	def _expire(self):
+		# release deferred callbacks of lookups exceeding deadline (real time, not the simulated one):
+		tm = time.time()
+		expired = []
+		for entry in self._inflight.values():
+			if entry[1] and entry[2] <= tm:
+				expired.append((entry[5], entry[1]))
+				entry[1] = []
+		return expired
+
+	@staticmethod
+	def _notify(key, callbacks, result):
+		for callback in callbacks:
+			try:
+				callback(key, result)
+			except Exception as e: # pragma: no cover
+				logSys.error("Resolver callback for %r failed: %r", key, e)
+
+	def _run(self):
+		while True:
+			with self._cond:
+				while self._active and not self._queue:
+					self._idle += 1
+					self._cond.wait(self.timeout if self._inflight else None)
+					self._idle -= 1
+					expired = self._expire()
+					if expired: break
+				else:
+					expired = None
+				if not self._active:
+					return
+				entry = self._queue.popleft() if not expired else None
+			if expired:
+				for key, callbacks in expired:
+					logSys.debug("Lookup of %r exceeded deadline of %ss", key, self.timeout)
+					self._notify(key, callbacks, None)
+				continue
+			ev, _, _, resolve, cache, key = entry
+			try:
+				v = resolve(key)
+			except Exception as e:
+				logSys.debug("Unable to resolve %r: %s", key, e)
+				v = None
+			with self._cond:
+				del self._inflight[(resolve, key)]
+				if v:
+					cache.set(key, v)
+				else:
+					self._negCache.set((resolve, key), v)
+				ev.result = v
+				ev.set()
+				callbacks = entry[1]
+				expired = self._expire()
+			self._notify(key, callbacks, v)
+			for key, callbacks in expired:
+				self._notify(key, callbacks, None)
+
+	def stop(self):
+		with self._cond:
+			self._active = False
+			self._cond.notify_all()
+
+
 ##
 # Utils class for DNS handling.
 #
@@ -77,21 +233,57 @@ def getfqdn(name=''):
 #
 class DNSUtils:
 
-	# todo: make configurable the expired time and max count of cache entries:
-	CACHE_nameToIp = Utils.Cache(maxCount=1000, maxTime=5*60)
-	CACHE_ipToName = Utils.Cache(maxCount=1000, maxTime=5*60)
+	# caches of resolved names and addresses (configurable in section [Cache] of fail2ban.conf):
+	CACHE_nameToIp = Utils.Cache(maxCount=1000, maxTime=5*60, name='nametoip')
+	CACHE_ipToName = Utils.Cache(maxCount=1000, maxTime=5*60, name='iptoname')
 	# static cache used to hold sets read from files:
-	CACHE_fileToIp = Utils.Cache(maxCount=100, maxTime=5*60)
+	CACHE_fileToIp = Utils.Cache(maxCount=100, maxTime=5*60, name='filetoip')
+
+	# pool of resolver threads (if None, lookups are synchronous) and deadline of single lookup:
+	Resolver = None
+	resolverTimeout = 5
+
+	@staticmethod
+	def setResolverOptions(workers=None, timeout=None):
+		"""Configures the pool resolving DNS asynchronously (workers 0 - synchronous lookups)."""
+		pool = DNSUtils.Resolver
+		if workers is not None:
+			if pool is not None and (not workers or workers != pool.workers):
+				pool.stop()
+				pool = DNSUtils.Resolver = None
+			if workers and pool is None:
+				pool = DNSUtils.Resolver = DNSResolverPool(workers)
+		if timeout is not None:
+			DNSUtils.resolverTimeout = timeout
+		if pool is not None:
+			pool.timeout = DNSUtils.resolverTimeout
 
 	@staticmethod
-	def dnsToIp(dns):
+	def dnsToIp(dns, callback=None):
 		""" Convert a DNS into an IP address using the Python socket module.
 			Thanks to Kevin Drapel.
+
+		If the resolver pool is configured and `callback` is given, it returns None
+		if not yet resolved and the IPs will be supplied later via `callback(dns, ips)`.
+		Without `callback` the lookup waits until deadline and if exceeded resolves it
+		synchronously (the caller, e. g. ignore check, never gets an unresolved result).
 		"""
 		# cache, also prevent long wait during retrieving of ip for wrong dns or lazy dns-system:
 		ips = DNSUtils.CACHE_nameToIp.get(dns)
 		if ips is not None: 
 			return ips
+		pool = DNSUtils.Resolver
+		if pool is not None:
+			ips = pool.lookup(DNSUtils._dnsToIp, DNSUtils.CACHE_nameToIp, dns, callback)
+			if ips is not None or callback is not None:
+				return ips
+			logSys.debug("Resolve %r synchronously after deadline", dns)
+		ips = DNSUtils._dnsToIp(dns)
+		DNSUtils.CACHE_nameToIp.set(dns, ips)
+		return ips
+
+	@staticmethod
+	def _dnsToIp(dns):
 		# retrieve ips
 		ips = set()
 		saveerr = None
@@ -109,8 +301,6 @@ class DNSUtils:
 				saveerr = e
 		if not ips and saveerr:
 			logSys.warning("Unable to find a corresponding IP address for %s: %s", dns, saveerr)
-
-		DNSUtils.CACHE_nameToIp.set(dns, ips)
 		return ips
 
 	@staticmethod
@@ -119,18 +309,32 @@ class DNSUtils:
 		v = DNSUtils.CACHE_ipToName.get(ip, ())
 		if v != ():
 			return v
+		pool = DNSUtils.Resolver
+		if pool is not None:
+			v = pool.lookup(DNSUtils._ipToName, DNSUtils.CACHE_ipToName, ip, expired=())
+			if v != ():
+				return v
+			# deadline exceeded - resolve synchronously (see dnsToIp):
+			logSys.debug("Resolve %r synchronously after deadline", ip)
+		v = DNSUtils._ipToName(ip)
+		DNSUtils.CACHE_ipToName.set(ip, v)
+		return v
+
+	@staticmethod
+	def _ipToName(ip):
 		# retrieve name
 		try:
-			v = socket.gethostbyaddr(ip)[0]
+			return socket.gethostbyaddr(ip)[0]
 		except socket.error as e:
 			logSys.debug("Unable to find a name for the IP %s: %s", ip, e)
-			v = None
-		DNSUtils.CACHE_ipToName.set(ip, v)
-		return v
+			return None
 
 	@staticmethod
-	def textToIp(text, useDns):
+	def textToIp(text, useDns, callback=None):
 		""" Return the IP of DNS found in a given text.
+
+		If `callback` is given and the resolution is pending (see `dnsToIp`),
+		it returns None.
 		"""
 		ipList = set()
 		# Search for plain IP
@@ -143,7 +347,9 @@ class DNSUtils:
 		# If we are allowed to resolve -- give it a try if nothing was found
 		if useDns in ("yes", "warn") and not ipList:
 			# Try to get IP from possible DNS
-			ip = DNSUtils.dnsToIp(text)
+			ip = DNSUtils.dnsToIp(text, callback)
+			if ip is None:
+				return None
 			ipList.update(ip)
 			if ip and useDns == "warn":
 				logSys.warning("Determined IP using DNS Lookup: %s = %s",
@@ -330,10 +536,10 @@ class IPAddr(object):
 	IP6_4COMPAT = None
 
 	# object attributes
-	__slots__ = '_family','_addr','_plen','_maskplen','_raw'
+	__slots__ = '_family','_addr','_plen','_maskplen','_raw','_ntoa'
 
-	# todo: make configurable the expired time and max count of cache entries:
-	CACHE_OBJ = Utils.Cache(maxCount=10000, maxTime=5*60)
+	# cache of converted addresses (configurable in section [Cache] of fail2ban.conf):
+	CACHE_OBJ = Utils.Cache(maxCount=10000, maxTime=5*60, name='ip')
 
 	CIDR_RAW = -2
 	CIDR_UNSPEC = -1
@@ -343,7 +549,27 @@ class IPAddr(object):
 	def _AF2FAM(v):
 		return IPAddr.CIDR_RAW - v
 
+	# bounded intern tables for addresses of known family (e. g. ip4/ip6 groups of failregex),
+	# without expiration, locking and tuple keys (conversion is deterministic):
+	INTERN_MAX = 10000
+	_INTERN = {FAM_IPv4: {}, FAM_IPv6: {}}
+
 	def __new__(cls, ipstr, cidr=CIDR_UNSPEC):
+		# fast path - address of known family:
+		tab = IPAddr._INTERN.get(cidr)
+		if tab is not None:
+			ip = tab.get(ipstr)
+			if ip is None:
+				ip = super(IPAddr, cls).__new__(cls)
+				ip.__init(ipstr, cidr)
+				while tab and len(tab) >= IPAddr.INTERN_MAX:
+					# remove the oldest entry (ignore concurrent modification):
+					try:
+						del tab[next(iter(tab))]
+					except (KeyError, RuntimeError, StopIteration): # pragma: no cover
+						pass
+				tab[ipstr] = ip
+			return ip
 		if cidr == IPAddr.CIDR_UNSPEC and isinstance(ipstr, (tuple, list)):
 			cidr = IPAddr.CIDR_RAW
 		if cidr == IPAddr.CIDR_RAW: # don't cache raw
@@ -400,6 +626,7 @@ class IPAddr(object):
 		self._addr = 0
 		self._plen = 0
 		self._maskplen = None
+		self._ntoa = None
 		# always save raw value (normally used if really raw or not valid only):
 		self._raw = ipstr
 		# if not raw - recognize family, set addr, etc.:
@@ -418,7 +645,7 @@ class IPAddr(object):
 
 			if self._family == socket.AF_INET:
 				# convert host to network byte order
-				self._addr, = struct.unpack("!L", binary)
+				self._addr = int.from_bytes(binary, 'big')
 				self._plen = 32
 
 				# mask out host portion if prefix length is supplied
@@ -429,8 +656,7 @@ class IPAddr(object):
 
 			elif self._family == socket.AF_INET6:
 				# convert host to network byte order
-				hi, lo = struct.unpack("!QQ", binary)
-				self._addr = (hi << 64) | lo
+				self._addr = int.from_bytes(binary, 'big')
 				self._plen = 128
 
 				# mask out host portion if prefix length is supplied
@@ -439,9 +665,9 @@ class IPAddr(object):
 					self._addr &= mask
 					self._plen = cidr
 
-				# if IPv6 address is a IPv4-compatible, make instance a IPv4
-				elif self.isInNet(IPAddr.IP6_4COMPAT):
-					self._addr = lo & 0xFFFFFFFF
+				# if IPv6 address is a IPv4-compatible (::ffff:0:0/96), make instance a IPv4
+				elif (self._addr >> 32) == 0xFFFF:
+					self._addr &= 0xFFFFFFFF
 					self._family = socket.AF_INET
 					self._plen = 32
 		else:
@@ -554,12 +780,13 @@ class IPAddr(object):
 		else:
 			return ""
 
-	# TODO: could be lazily evaluated
 	@property
 	def ntoa(self):
 		""" represent IP object as text like the deprecated
 			C pendant inet.ntoa but address family independent
 		"""
+		if self._ntoa is not None:
+			return self._ntoa
 		add = ''
 		if self.isIPv4:
 			# convert network to host byte order
@@ -575,8 +802,9 @@ class IPAddr(object):
 				add = "/%d" % self._plen
 		else:
 			return self._raw
-		
-		return socket.inet_ntop(self._family, binary) + add
+		# cache it (used as hash also, so IP as key must be fast):
+		self._ntoa = socket.inet_ntop(self._family, binary) + add
+		return self._ntoa
 
 	def getPTR(self, suffix=None):
 		""" return the DNS PTR string of the provided IP address object
@@ -697,9 +925,80 @@ class IPAddr(object):
 IPAddr.IP6_4COMPAT = IPAddr("::ffff:0:0", 96)
 
 
+class IPAddrTrie(object):
+	"""Immutable binary trie (prefix index) of IPv4 and IPv6 networks
+
+	Check whether an IP is covered by some network of the trie costs
+	O(prefix length), independent from count of networks.
+	Networks covered by other (shorter) network are not stored.
+	"""
+
+	__slots__ = ('_tries', '_count')
+
+	def __init__(self, nets=()):
+		tries = {}
+		for net in nets:
+			width = {socket.AF_INET: 32, socket.AF_INET6: 128}.get(net.family)
+			if width is None:
+				continue
+			t = tries.get(net.family)
+			if t is None:
+				# nodes as parallel lists (child for bit 0, child for bit 1, is end of network):
+				t = tries[net.family] = (width, [0], [0], [False])
+			_, c0, c1, term = t
+			addr = net.addr
+			node = 0
+			for bit in range(width-1, width-1-net.plen, -1):
+				# already covered by shorter network:
+				if term[node]:
+					break
+				ch = c1 if (addr >> bit) & 1 else c0
+				nxt = ch[node]
+				if not nxt:
+					nxt = ch[node] = len(term)
+					c0.append(0); c1.append(0); term.append(False)
+				node = nxt
+			else:
+				# end of network (longer networks below it are covered now):
+				term[node] = True
+				c0[node] = c1[node] = 0
+		self._tries = dict(
+			(fam, (width, tuple(c0), tuple(c1), tuple(term)))
+				for fam, (width, c0, c1, term) in tries.items())
+		# count of stored networks (reachable ends):
+		self._count = 0
+		for width, c0, c1, term in self._tries.values():
+			stack = [0]
+			while stack:
+				node = stack.pop()
+				if term[node]:
+					self._count += 1
+				stack.extend(n for n in (c0[node], c1[node]) if n)
+
+	def __len__(self):
+		return self._count
+
+	def __contains__(self, ip):
+		t = self._tries.get(ip.family)
+		if t is None:
+			return False
+		width, c0, c1, term = t
+		addr = ip.addr
+		node = 0
+		for bit in range(width-1, -1, -1):
+			if term[node]:
+				return True
+			node = (c1 if (addr >> bit) & 1 else c0)[node]
+			if not node:
+				return False
+		return term[node]
+
+
 class IPAddrSet(set):
 
 	hasSubNet = 0
+	# index of subnets (trie and list of DNS entries), created on demand:
+	_netIndex = None
 
 	def __init__(self, ips=[]):
 		ips, subnet = IPAddrSet._list2set(ips)
@@ -730,11 +1029,79 @@ class IPAddrSet(set):
 		if not isinstance(ip, IPAddr): ip = IPAddr(ip)
 		self.hasSubNet |= not ip.isSingle
 		set.add(self, ip)
+		self._netIndex = None
+
+	def update(self, *others):
+		set.update(self, *others)
+		self._netIndex = None
+
+	def __ior__(self, other):
+		for ip in other:
+			self.add(ip)
+		return self
+
+	def remove(self, ip):
+		set.remove(self, ip)
+		self._netIndex = None
+
+	def discard(self, ip):
+		set.discard(self, ip)
+		self._netIndex = None
+
+	def clear(self):
+		set.clear(self)
+		self._netIndex = None
+
+	def pop(self):
+		ip = set.pop(self)
+		self._netIndex = None
+		return ip
+
+	def difference_update(self, *others):
+		set.difference_update(self, *others)
+		self._netIndex = None
+
+	def intersection_update(self, *others):
+		set.intersection_update(self, *others)
+		self._netIndex = None
+
+	def symmetric_difference_update(self, other):
+		set.symmetric_difference_update(self, other)
+		self.hasSubNet |= any(not ip.isSingle for ip in other)
+		self._netIndex = None
+
+	def __isub__(self, other):
+		self.difference_update(other)
+		return self
+
+	def __iand__(self, other):
+		self.intersection_update(other)
+		return self
+
+	def __ixor__(self, other):
+		self.symmetric_difference_update(other)
+		return self
+
+	def _getNetIndex(self):
+		idx = self._netIndex
+		if idx is None:
+			nets = [ip for ip in self if not ip.isSingle]
+			self._netIndex = idx = (
+				IPAddrTrie(ip for ip in nets if ip.isValid),
+				[ip for ip in nets if not ip.isValid]
+			)
+		return idx
 
 	def __contains__(self, ip):
 		if not isinstance(ip, IPAddr): ip = IPAddr(ip)
-		# IP can be found directly or IP is in each subnet:
-		return set.__contains__(self, ip) or (self.hasSubNet and any(n.contains(ip) for n in self))
+		# IP can be found directly:
+		if set.__contains__(self, ip):
+			return True
+		if not self.hasSubNet:
+			return False
+		# IP is in some subnet (prefix index) or resolved by some DNS entry:
+		trie, dns = self._getNetIndex()
+		return ip in trie or any(n.contains(ip) for n in dns)
 
 
 class FileIPAddrSet(IPAddrSet):
@@ -66,7 +66,7 @@ class Jail(object):
 	#Known backends. Each backend should have corresponding __initBackend method
 	# yoh: stored in a list instead of a tuple since only
 	#      list had .index until 2.6
-	_BACKENDS = ['pyinotify', 'polling', 'systemd']
+	_BACKENDS = ['pyinotify', 'inotify', 'polling', 'systemd', 'syslog']
 
 	def __init__(self, name, backend = "auto", db=None):
 		self.__db = db
@@ -138,12 +138,24 @@ class Jail(object):
 		logSys.info("Jail '%s' uses pyinotify %r" % (self.name, kwargs))
 		self.__filter = FilterPyinotify(self, **kwargs)
 
+	def _initInotify(self, **kwargs):
+		# Try to use native inotify (Linux only)
+		from .filterinotify import FilterInotify
+		logSys.info("Jail '%s' uses inotify %r" % (self.name, kwargs))
+		self.__filter = FilterInotify(self, **kwargs)
+
 	def _initSystemd(self, **kwargs): # pragma: systemd no cover
 		# Try to import systemd
 		from .filtersystemd import FilterSystemd
 		logSys.info("Jail '%s' uses systemd %r" % (self.name, kwargs))
 		self.__filter = FilterSystemd(self, **kwargs)
 
+	def _initSyslog(self, **kwargs):
+		# Listen on syslog socket
+		from .filtersyslog import FilterSyslog
+		logSys.info("Jail '%s' uses syslog socket %r" % (self.name, kwargs))
+		self.__filter = FilterSyslog(self, **kwargs)
+
 	@property
 	def name(self):
 		"""Name of jail.
@@ -208,6 +220,8 @@ class Jail(object):
 		Used by filter to add a failure for banning.
 		"""
 		self.__queue.put(ticket)
+		# wake up actions thread waiting for tickets:
+		self.actions.wakeup()
 		# add ban to database moved to observer (should previously check not already banned 
 		# and increase ticket time if "bantime.increment" set)
 
@@ -278,8 +292,37 @@ class Jail(object):
 		return self._banExtra.get("maxtime", -1) \
 			if self._banExtra.get('increment') else self.actions.getBanTime()
 
+	def _restoreTickets(self, pages, forbantime):
+		"""Filters pages of tickets restored from database (skips ignored and obsolete tickets).
+		"""
+		for page in pages:
+			tickets = []
+			for ticket in page:
+				try:
+					# mark ticked was restored from database - does not put it again into db:
+					ticket.restored = True
+					#logSys.debug('restored ticket: %s', ticket)
+					if self.filter._inIgnoreIPList(ticket.getID(), ticket): continue
+					# correct start time / ban time (by the same end of ban):
+					btm = ticket.getBanTime(forbantime)
+					diftm = MyTime.time() - ticket.getTime()
+					if btm != -1 and diftm > 0:
+						btm -= diftm
+					# ignore obsolete tickets:
+					if btm != -1 and btm <= 0:
+						continue
+					tickets.append(ticket)
+				except Exception as e: # pragma: no cover
+					logSys.error('Restore ticket failed: %s', e, 
+						exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+			yield tickets
+
 	def restoreCurrentBans(self, correctBanTime=True):
 		"""Restore any previous valid bans from the database.
+
+		The bans are read from database in pages; if the actions thread is running,
+		the pages are handed over to it and get banned as bulk (one batch per action
+		if supported), otherwise the tickets are put into the queue one by one.
 		"""
 		try:
 			if self.database is not None:
@@ -290,26 +333,17 @@ class Jail(object):
 				else:
 					# use ban time as search time if we have not enabled a increasing:
 					forbantime = self.actions.getBanTime()
-				for ticket in self.database.getCurrentBans(jail=self, forbantime=forbantime,
+				pages = self._restoreTickets(self.database.iterCurrentBans(jail=self, forbantime=forbantime,
 					correctBanTime=correctBanTime, maxmatches=self.filter.failManager.maxMatches
-				):
-					try:
-						# mark ticked was restored from database - does not put it again into db:
-						ticket.restored = True
-						#logSys.debug('restored ticket: %s', ticket)
-						if self.filter._inIgnoreIPList(ticket.getID(), ticket): continue
-						# correct start time / ban time (by the same end of ban):
-						btm = ticket.getBanTime(forbantime)
-						diftm = MyTime.time() - ticket.getTime()
-						if btm != -1 and diftm > 0:
-							btm -= diftm
-						# ignore obsolete tickets:
-						if btm != -1 and btm <= 0:
-							continue
+				), forbantime)
+				# restore in actions thread (pages are read lazily there):
+				if self.actions.is_alive():
+					self.actions.restoreBans(pages,
+						self.database.getCurrentBansCount(self, forbantime=forbantime))
+					return
+				for tickets in pages:
+					for ticket in tickets:
 						self.putFailTicket(ticket)
-					except Exception as e: # pragma: no cover
-						logSys.error('Restore ticket failed: %s', e, 
-							exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
 		except Exception as e: # pragma: no cover
 			logSys.error('Restore bans failed: %s', e,
 				exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
@@ -25,7 +25,8 @@ __copyright__ = "Copyright (c) 2004 Cyril Jaquier"
 __license__ = "GPL"
 
 import sys
-from threading import Thread
+import time
+from threading import Condition, Thread, current_thread
 from abc import abstractmethod
 
 from .utils import Utils
@@ -51,6 +52,8 @@ class JailThread(Thread):
 
 	def __init__(self, name=None):
 		super(JailThread, self).__init__(name=name)
+		## Condition the thread waits on (notified by wakeup, e. g. new ticket, idle or active changed):
+		self.__wakeupCond = Condition()
 		## Should going with main thread also:
 		self.daemon = True
 		## Control the state of the thread (None - was not started, True - active, False - stopped).
@@ -78,6 +81,56 @@ class JailThread(Thread):
 					print(e)
 		self.run = run_with_except_hook
 
+	@property
+	def idle(self):
+		return self._idle
+
+	@idle.setter
+	def idle(self, value):
+		self._idle = value
+		self.wakeup()
+
+	def wakeup(self):
+		"""Wakes up the thread waiting in `wait_for` (to re-evaluate its condition).
+		"""
+		with self.__wakeupCond:
+			self.__wakeupCond.notify_all()
+
+	def wait_for(self, cond, timeout=None, interval=None):
+		"""Waits until condition expression `cond` is True, up to `timeout` sec.
+
+		Unlike `Utils.wait_for` the thread does not poll, but blocks until it gets
+		woken up (see `wakeup`), so the condition should be signaled by the code
+		changing it (e. g. put of ticket, change of idle or active state).
+		If `interval` specified, the condition is additionally checked in intervals
+		(increasing similar to `Utils.wait_for`), e. g. for modification of files,
+		that nobody signals.
+
+		Returns
+		-------
+		variable
+			The return value of the last call of `cond`,
+			logical False (or None, 0, etc) if timeout occurred.
+		"""
+		c = self.__wakeupCond
+		endtm = time.time() + timeout if timeout is not None else None
+		stm = 0
+		with c:
+			while True:
+				ret = cond()
+				if ret:
+					return ret
+				wt = None
+				if endtm is not None:
+					wt = endtm - time.time()
+					if wt <= 0:
+						return ret
+				if interval:
+					stm = min(stm + interval, Utils.DEFAULT_SLEEP_TIME)
+					if wt is None or stm < wt:
+						wt = stm
+				c.wait(wt)
+
 	def _bootstrap(self):
 		prctl_set_th_name(self.name)
 		return super(JailThread, self)._bootstrap();
@@ -104,6 +157,7 @@ class JailThread(Thread):
 		"""Sets `active` property to False, to flag run method to return.
 		"""
 		if self.active: self.active = False
+		self.wakeup()
 		# normally onStop will be called automatically in thread after its run ends,
 		# but for backwards compatibilities we'll invoke it in caller of stop method.
 		self.onStop()
@@ -113,8 +167,8 @@ class JailThread(Thread):
 	def done(self):
 		self.done = lambda:()
 		# if still runniung - wait a bit before initiate clean-up:
-		if self.is_alive():
-			Utils.wait_for(lambda: not self.is_alive(), 5)
+		if self.is_alive() and self is not current_thread():
+			super(JailThread, self).join(5)
 		# now clean-up everything:
 		self.afterStop()
 
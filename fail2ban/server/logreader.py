@@ -0,0 +1,191 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: t -*-
+# vi: set ft=python sts=4 ts=4 sw=4 noet :
+
+# This file is part of Fail2Ban.
+#
+# Fail2Ban is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# Fail2Ban is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Fail2Ban; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+__author__ = "Fail2Ban Developers"
+__copyright__ = "Copyright (c) 2026 Fail2Ban Developers"
+__license__ = "GPL"
+
+import re
+import threading
+import weakref
+from bisect import bisect_right
+
+from .datedetector import DateDetector
+from ..helpers import getLogger
+
+# Gets the instance of the logger.
+logSys = getLogger(__name__)
+
+
+def createDateDetector(pattern, tz=None):
+	"""Creates date detector for given date pattern (empty for default detectors) and time zone.
+	"""
+	dd = DateDetector()
+	dd.default_tz = tz
+	if not isinstance(pattern, (list, tuple)):
+		pattern = list(filter(bool, list(map(str.strip, re.split('\n+', pattern)))))
+	for pattern in pattern:
+		dd.appendTemplate(pattern)
+	return dd
+
+
+def splitDate(dateDetector, line):
+	"""Splits the time portion from log line.
+
+	Returns
+	-------
+	tuple
+		(tupleLine, date, timeText), where tupleLine is (begin, timeText, end),
+		date is None if not found or not parsable, timeText is None if nothing
+		matched and empty if date matched empty value (optional date).
+	"""
+	timeMatch = dateDetector.matchTime(line)
+	m = timeMatch[0]
+	if not m:
+		return ("", "", line), None, None
+	s = m.start(1)
+	e = m.end(1)
+	m = line[s:e]
+	date = None
+	if m: # found and not empty - retrieve date:
+		date = dateDetector.getTime(m, timeMatch)
+		if date is not None:
+			date = date[0]
+		else:
+			logSys.error("findFailure failed to parse timeText: %s", m)
+	return (line[:s], m, line[e:]), date, m
+
+
+class SharedLogReader(object):
+	"""Reader of a log file shared by several filters (jails) monitoring it.
+
+	Lines read by one of the filters are decoded and split by date once and cached
+	as records (end position, line, split result), so other filters at the same
+	position of the same file get them from cache instead of reading and parsing
+	them again. Each filter keeps its own position (in its FileContainer), thus
+	positions in database remain per jail.
+	"""
+
+	## Max count of records cached:
+	maxRecords = 10000
+	## Max count of records read and parsed at once:
+	chunkSize = 1000
+
+	def __init__(self, key):
+		self.key = key
+		self.lock = threading.Lock()
+		self.subscribers = weakref.WeakSet()
+		self.dateDetector = createDateDetector(key[2], key[3])
+		self.__ino = None
+		self.__hash = None
+		self.__base = 0
+		self.__ends = []
+		self.__recs = []
+
+	def __repr__(self):
+		return "%s(%r, subscribers=%d)" % (self.__class__.__name__, self.key[0], len(self.subscribers))
+
+	@property
+	def shared(self):
+		return len(self.subscribers) > 1
+
+	def clear(self):
+		with self.lock:
+			self.__ino = None
+			self.__ends = []
+			self.__recs = []
+
+	def fetch(self, log, pos):
+		"""Returns records of the log (opened container) starting at position pos.
+
+		If the records are not cached yet, reads the next chunk from the log (positioned
+		at pos) and parses it. Empty list signals end of file.
+		"""
+		with self.lock:
+			ends = self.__ends
+			# check the cache belongs to this file and it is not truncated:
+			if (self.__ino != log.getIno() or self.__hash != log.getHash()
+				or not (self.__base <= pos <= (ends[-1] if ends else self.__base))
+				or log.getFileSize() < (ends[-1] if ends else pos)
+			):
+				self.__ino, self.__hash = log.getIno(), log.getHash()
+				self.__base = pos
+				ends = self.__ends = []
+				self.__recs = []
+			# served from cache:
+			if ends and pos < ends[-1]:
+				i = bisect_right(ends, pos)
+				return self.__recs[i:i+self.chunkSize]
+			# read and parse next chunk:
+			log.seek(pos, False)
+			recs = []
+			dd = self.dateDetector
+			for line in log.readlines():
+				recs.append((log.tell(), line, splitDate(dd, line)))
+				if len(recs) >= self.chunkSize:
+					break
+			if not recs:
+				return recs
+			# append to cache (drop the oldest records if too large):
+			self.__recs.extend(recs)
+			ends.extend(r[0] for r in recs)
+			n = len(ends) - self.maxRecords
+			if n > 0:
+				self.__base = ends[n-1]
+				del ends[:n]
+				del self.__recs[:n]
+			return recs
+
+
+class LogReaders(object):
+	"""Registry of log readers shared by filters monitoring the same file
+	(with the same encoding and date detection).
+	"""
+
+	_lock = threading.Lock()
+	_readers = {}
+
+	@classmethod
+	def subscribe(cls, key, flt):
+		"""Returns reader for given key (path, encoding, datepattern, logtimezone), filter gets subscribed.
+		"""
+		with cls._lock:
+			r = cls._readers.get(key)
+			if r is None:
+				r = cls._readers[key] = SharedLogReader(key)
+			r.subscribers.add(flt)
+		return r
+
+	@classmethod
+	def unsubscribe(cls, reader, flt):
+		"""Unsubscribes filter from reader, reader is released if no more filters use it.
+		"""
+		with cls._lock:
+			reader.subscribers.discard(flt)
+			if not reader.subscribers:
+				if cls._readers.get(reader.key) is reader:
+					del cls._readers[reader.key]
+			# not shared anymore - cache is unneeded:
+			if not reader.shared:
+				reader.clear()
+
+	@classmethod
+	def getReaders(cls):
+		with cls._lock:
+			return list(cls._readers.values())
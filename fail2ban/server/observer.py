@@ -26,6 +26,9 @@ __copyright__ = "Copyright (c) 2014 Serg G. Brester"
 __license__ = "GPL"
 
 import threading
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
 from .jailthread import JailThread
 from .failmanager import FailManagerEmpty
 import os, logging, time, datetime, math, json, random
@@ -60,21 +63,36 @@ class ObserverThread(JailThread):
 	# observer is event driven and it sleep organized incremental, so sleep intervals can be shortly:
 	DEFAULT_SLEEP_INTERVAL = Utils.DEFAULT_SLEEP_INTERVAL / 10
 
+	## Control events (service, timers) executed before bulk events (like failureFound):
+	CONTROL_EVENTS = frozenset((
+		'db_set', 'db_purge', 'prolongBan', 'is_alive', 'is_active', 'start', 'stop', 'shutdown'
+	))
+	## Max count of subsequent failureFound events of same jail coalesced into single batch:
+	maxBatchSize = 100
+
 	def __init__(self):
     # init thread
 		super(ObserverThread, self).__init__(name='f2b/observer')
 		# before started - idle:
 		self.idle = True
-		## Event queue
+		## Event queues (control and bulk events), entries are tuples (event, time added):
 		self._queue_lock = threading.RLock()
-		self._queue = []
+		self._ctlqueue = deque()
+		self._queue = deque()
+		## Statistic of processed events (count, coalesced failures, latency):
+		self._stats = {'events': 0, 'batches': 0, 'batched': 0,
+			'latency': 0, 'sumlatency': 0, 'maxlatency': 0}
 		## Event, be notified if anything added to event queue
 		self._notify = threading.Event()
 		## Sleep for max 60 seconds, it possible to specify infinite to always sleep up to notifying via event, 
 		## but so we can later do some service "events" occurred infrequently directly in main loop of observer (not using queue)
 		self.sleeptime = 60
-		#
+		## Timers (single scheduler instead of thread per timer): heap of entries
+		## [due time, sequence, event, due time in MyTime (testing only), name], named timers by name:
+		self._timerHeap = []
+		self._timerSeq = count()
 		self._timers = {}
+		self._timerStats = {'fired': 0, 'lateness': 0, 'maxlateness': 0}
 		self._paused = False
 		self.__db = None
 		self.__db_purge_interval = 60*60
@@ -83,21 +101,28 @@ class ObserverThread(JailThread):
 
 	def __getitem__(self, i):
 		try:
-			return self._queue[i]
-		except KeyError:
+			return list(self)[i]
+		except IndexError:
 			raise KeyError("Invalid event index : %s" % i)
 
 	def __delitem__(self, i):
-		try:
-			del self._queue[i]
-		except KeyError:
-			raise KeyError("Invalid event index: %s" % i)
+		with self._queue_lock:
+			n = len(self._ctlqueue)
+			if i < 0: i += n + len(self._queue)
+			try:
+				if 0 <= i < n:
+					del self._ctlqueue[i]
+				else:
+					del self._queue[i - n]
+			except IndexError:
+				raise KeyError("Invalid event index: %s" % i)
 
 	def __iter__(self):
-		return iter(self._queue)
+		with self._queue_lock:
+			return iter([ev for q in (self._ctlqueue, self._queue) for ev, _ in q])
 
 	def __len__(self):
-		return len(self._queue)
+		return len(self._ctlqueue) + len(self._queue)
 
 	def __eq__(self, other): # Required for Threading
 		return False
@@ -111,37 +136,95 @@ class ObserverThread(JailThread):
 		Previous timer event with same name will be canceled and trigger self into 
 		queue after new 'starttime' value
 		"""
-		t = self._timers.get(name, None)
-		if t is not None:
-			t.cancel()
-		t = threading.Timer(starttime, self.add, event)
-		self._timers[name] = t
-		t.start()
+		return self._addTimer(starttime, event, name)
 
 	def add_timer(self, starttime, *event):
 		"""Add a timer event to queue will start (and wake) in 'starttime' seconds
+
+		Returns the timer, that can be canceled using cancel_timer.
 		"""
 		# in testing we should wait (looping) for the possible time drifts:
+		myDue = None
 		if MyTime.myTime is not None and starttime:
-			# test time after short sleep:
-			t = threading.Timer(Utils.DEFAULT_SLEEP_INTERVAL, self._delayedEvent,
-				(MyTime.time() + starttime, time.time() + starttime, event)
-			)
-			t.start()
-			return
-		# add timer event:
-		t = threading.Timer(starttime, self.add, event)
-		t.start()
+			myDue = MyTime.time() + starttime
+		return self._addTimer(starttime, event, myDue=myDue)
 
-	def _delayedEvent(self, endMyTime, endTime, event):
-		if MyTime.time() >= endMyTime or time.time() >= endTime:
-			self.add_timer(0, *event)
-			return
-		# repeat after short sleep:
-		t = threading.Timer(Utils.DEFAULT_SLEEP_INTERVAL, self._delayedEvent,
-			(endMyTime, endTime, event)
-		)
-		t.start()
+	def _addTimer(self, starttime, event, name=None, myDue=None):
+		t = [time.time() + starttime, next(self._timerSeq), event, myDue, name]
+		with self._queue_lock:
+			if name is not None:
+				prev = self._timers.get(name)
+				if prev is not None:
+					prev[2] = None
+				self._timers[name] = t
+			heappush(self._timerHeap, t)
+			# wake up to recalculate sleep time if it is the next timer now:
+			first = self._timerHeap[0] is t
+		if first:
+			self.pulse_notify()
+		return t
+
+	def cancel_timer(self, timer):
+		"""Cancel timer (given by name or as returned from add_timer)
+		"""
+		with self._queue_lock:
+			if not isinstance(timer, list):
+				timer = self._timers.get(timer)
+			if timer is None or timer[2] is None:
+				return False
+			timer[2] = None
+			if timer[4] is not None and self._timers.get(timer[4]) is timer:
+				del self._timers[timer[4]]
+			return True
+
+	def _fireTimers(self):
+		"""Adds events of due timers to queue (without notify), returns the count of them.
+		"""
+		h = self._timerHeap
+		if not h:
+			return 0
+		fired = []
+		with self._queue_lock:
+			now = time.time()
+			while h and (h[0][0] <= now or h[0][2] is None):
+				t = heappop(h)
+				if t[2] is not None:
+					fired.append(t)
+			# testing only - timers due in MyTime (time drifts):
+			if MyTime.myTime is not None and h:
+				mnow = MyTime.time()
+				for t in h:
+					if t[3] is not None and t[3] <= mnow and t[2] is not None:
+						fired.append(t)
+			st = self._timerStats
+			for t in fired:
+				if t[4] is not None and self._timers.get(t[4]) is t:
+					del self._timers[t[4]]
+				late = max(0, now - t[0]) if t[3] is None else 0
+				st['fired'] += 1
+				st['lateness'] = late
+				if late > st['maxlateness']:
+					st['maxlateness'] = late
+				ev, t[2] = t[2], None
+				self.add_wn(*ev)
+		return len(fired)
+
+	def _timerWait(self):
+		"""Returns time to sleep (up to next timer due, max sleeptime).
+		"""
+		with self._queue_lock:
+			h = self._timerHeap
+			while h and h[0][2] is None:
+				heappop(h)
+			if not h:
+				return self.sleeptime
+			wt = h[0][0] - time.time()
+			# testing only - check timers due in MyTime after short sleep:
+			if (MyTime.myTime is not None and wt > Utils.DEFAULT_SLEEP_INTERVAL
+				and any(t[3] is not None and t[2] is not None for t in h)
+			):
+				wt = Utils.DEFAULT_SLEEP_INTERVAL
+		return min(self.sleeptime, max(0, wt))
 
 	def pulse_notify(self):
 		"""Notify wakeup (sets /and resets/ notify event)
@@ -152,20 +235,64 @@ class ObserverThread(JailThread):
 				n.set()
 				#n.clear()
 
+	def _isControl(self, event):
+		ev = event[0]
+		if callable(ev): ev = getattr(ev, '__name__', None)
+		return ev in self.CONTROL_EVENTS
+
 	def add(self, *event):
 		"""Add a event to queue and notify thread to wake up.
 		"""
-		## lock and add new event to queue:
-		with self._queue_lock:
-			self._queue.append(event)
+		self.add_wn(*event)
 		self.pulse_notify()
 
 	def add_wn(self, *event):
 		"""Add a event to queue without notifying thread to wake up.
+
+		Control events are added to priority queue, so will be executed before
+		bulk events (e. g. failureFound), which remain in order of its addition.
 		"""
+		q = self._ctlqueue if self._isControl(event) else self._queue
 		## lock and add new event to queue:
 		with self._queue_lock:
-			self._queue.append(event)
+			q.append((event, time.time()))
+
+	def _popEvent(self):
+		"""Pops next event from queue (control events first).
+
+		Subsequent failureFound events of same jail are coalesced into single
+		failuresFound event (checked as batch with one database query).
+		"""
+		with self._queue_lock:
+			q = self._ctlqueue or self._queue
+			if not q:
+				return None
+			ev, tm = q.popleft()
+			n = 1
+			if ev[0] == 'failureFound' and q:
+				jail = ev[1]
+				tickets = [ev[2]]
+				while q and len(tickets) < self.maxBatchSize:
+					nev = q[0][0]
+					if nev[0] != 'failureFound' or nev[1] is not jail:
+						break
+					tickets.append(nev[2])
+					q.popleft()
+				n = len(tickets)
+				if n > 1:
+					ev = ('failuresFound', jail, tickets)
+		# statistic (latency of the oldest event in batch):
+		st = self._stats
+		st['events'] += n
+		if n > 1:
+			st['batches'] += 1
+			st['batched'] += n
+		tm = time.time() - tm
+		st['latency'] = tm
+		st['sumlatency'] += tm * n
+		if tm > st['maxlatency']:
+			st['maxlatency'] = tm
+		return ev
 
 	def call_lambda(self, l, *args):
 		l(*args)
@@ -204,14 +331,13 @@ class ObserverThread(JailThread):
 			## if we should stop - break a main loop
 			while self.active:
 				self.idle = False
+				## move events of due timers into queue:
+				self._fireTimers()
 				## check events available and execute all events from queue
 				while not self._paused:
 					## lock, check and pop one from begin of queue:
 					try:
-						ev = None
-						with self._queue_lock:
-							if len(self._queue):
-								ev = self._queue.pop(0)
+						ev = self._popEvent()
 						if ev is None:
 							break
 						## retrieve method by name
@@ -226,7 +352,7 @@ class ObserverThread(JailThread):
 				n = self._notify
 				if n:
 					self.idle = True
-					n.wait(self.sleeptime)
+					n.wait(self._timerWait())
 					## wake up - reset signal now (we don't need it so long as we reed from queue)
 					n.clear()
 					if self._paused:
@@ -238,15 +364,18 @@ class ObserverThread(JailThread):
 					if not self.is_full:
 						break
 				## end of main loop - exit
-			logSys.info("Observer stopped, %s events remaining.", len(self._queue))
+			logSys.info("Observer stopped, %s events remaining.", len(self))
 			self._notify = None
-			#print("Observer stopped, %s events remaining." % len(self._queue))
+			#print("Observer stopped, %s events remaining." % len(self))
 		except Exception as e:
 			logSys.error('Observer stopped after error: %s', e, exc_info=True)
 			#print("Observer stopped with error: %s" % str(e))
 		# clear all events - exit, for possible calls of wait_empty:
 		with self._queue_lock:
-			self._queue = []
+			self._ctlqueue.clear()
+			self._queue.clear()
+			del self._timerHeap[:]
+			self._timers.clear()
 		self.idle = True
 		return True
 
@@ -291,7 +420,7 @@ class ObserverThread(JailThread):
 	@property
 	def is_full(self):
 		with self._queue_lock:
-			return True if len(self._queue) else False
+			return True if self._ctlqueue or self._queue else False
 
 	def wait_empty(self, sleeptime=None):
 		"""Wait observer is running and returns if observer has no more events (queue is empty)
@@ -342,9 +471,28 @@ class ObserverThread(JailThread):
 
 	@property
 	def status(self):
-		"""Status of observer to be implemented. [TODO]
+		"""Status of observer (queue depth, processed and coalesced events,
+		latency of last, average and the slowest event in seconds, pending timers
+		and lateness of last and the latest fired timer in seconds).
 		"""
-		return ('', '')
+		st = self._stats
+		tst = self._timerStats
+		with self._queue_lock:
+			ctl, bulk = len(self._ctlqueue), len(self._queue)
+			timers = sum(1 for t in self._timerHeap if t[2] is not None)
+		return [
+			("Queue depth", ctl + bulk),
+			("Control events", ctl),
+			("Processed events", st['events']),
+			("Coalesced failures", st['batched']),
+			("Last latency", round(st['latency'], 6)),
+			("Avg latency", round(st['sumlatency'] / st['events'], 6) if st['events'] else 0),
+			("Max latency", round(st['maxlatency'], 6)),
+			("Timers", timers),
+			("Fired timers", tst['fired']),
+			("Timer lateness", round(tst['lateness'], 6)),
+			("Max timer lateness", round(tst['maxlateness'], 6)),
+		]
 
 	## -----------------------------------------
 	## [Async] database service functionality ...
@@ -369,9 +517,28 @@ class ObserverThread(JailThread):
 
 		Observer will check ip was known (bad) and possibly increase an retry count
 		"""
+		self.failuresFound(jail, (ticket,))
+
+	def failuresFound(self, jail, tickets):
+		""" Notify observer failures for several ips were found (coalesced failureFound events)
+
+		Known (bad) ips are retrieved from database using single query for all tickets
+		"""
 		# check jail active :
 		if not jail.isAlive() or not jail.getBanTimeExtra("increment"):
 			return
+		try:
+			bans = {}
+			db = jail.database
+			if db is not None:
+				bans = db.getBanMany(set(str(t.getID()) for t in tickets), jail)
+		except Exception as e:
+			logSys.error('%s', e, exc_info=logSys.getEffectiveLevel()<=logging.DEBUG)
+			return
+		for ticket in tickets:
+			self._failureFound(jail, ticket, db, bans.get(str(ticket.getID())))
+
+	def _failureFound(self, jail, ticket, db, ban):
 		ip = ticket.getID()
 		unixTime = ticket.getTime()
 		logSys.debug("[%s] Observer: failure found %s", jail.name, ip)
@@ -381,14 +548,13 @@ class ObserverThread(JailThread):
 		timeOfBan = None
 		try:
 			maxRetry = jail.filter.failManager.getMaxRetry()
-			db = jail.database
 			if db is not None:
-				for banCount, timeOfBan, lastBanTime in db.getBan(ip, jail):
+				if ban is not None:
+					banCount, timeOfBan, lastBanTime = ban
 					banCount = max(banCount, ticket.getBanCount())
 					retryCount = ((1 << (banCount if banCount < 20 else 20))/2 + 1)
 					# if lastBanTime == -1 or timeOfBan + lastBanTime * 2 > MyTime.time():
 					# 	retryCount = maxRetry
-					break
 				retryCount = min(retryCount, maxRetry)
 				# check this ticket already known (line was already processed and in the database and will be restored from there):
 				if timeOfBan is not None and unixTime <= timeOfBan:
@@ -32,10 +32,14 @@ import signal
 import stat
 import sys
 
+from .action import setMaxCmdConcurrency, getMaxCmdConcurrency
 from .observer import Observers, ObserverThread
 from .jails import Jails
 from .filter import DNSUtils, FileFilter, JournalFilter
+from .filterproc import FilterProcPool
 from .transmitter import Transmitter
+from .mytime import MyTime
+from .utils import Utils
 from .asyncserver import AsyncServer, AsyncServerException
 from .. import version
 from ..helpers import getLogger, _as_bool, extractOptions, str2LogLevel, \
@@ -221,6 +225,11 @@ class Server:
 		if obsMain is not None:
 			obsMain.stop()
 
+		# Stop filter worker processes
+		if FilterProcPool.Main is not None:
+			FilterProcPool.Main.stop()
+			FilterProcPool.Main = None
+
 		# Explicit close database (server can leave in a thread, 
 		# so delayed GC can prevent committing changes)
 		if self.__db:
@@ -504,6 +513,18 @@ class Server:
 	def getMaxLines(self, name):
 		return self.__jails[name].filter.getMaxLines()
 	
+	def setRegexSet(self, name, value):
+		self.__jails[name].filter.regexSet = _as_bool(value)
+	
+	def getRegexSet(self, name):
+		return self.__jails[name].filter.regexSet
+	
+	def setFilterProcess(self, name, value):
+		self.__jails[name].filter.procPool = FilterProcPool.getMain() if _as_bool(value) else None
+	
+	def getFilterProcess(self, name):
+		return self.__jails[name].filter.procPool is not None
+	
 	# Action
 	def addAction(self, name, value, *args):
 		## create (or reload) jail action:
@@ -571,6 +592,12 @@ class Server:
 	def getBanTime(self, name):
 		return self.__jails[name].actions.getBanTime()
 
+	def setActionThreads(self, name, value):
+		self.__jails[name].actions.actionThreads = value
+
+	def getActionThreads(self, name):
+		return self.__jails[name].actions.actionThreads
+
 	def getBanList(self, name, withTime=False):
 		"""Returns the list of banned IP addresses for a jail.
 
@@ -819,11 +846,41 @@ class Server:
 		for o, v in value.items():
 			if o == 'stacksize':
 				threading.stack_size(int(v)*1024)
+			elif o == 'actionthreads':
+				setMaxCmdConcurrency(int(v))
+			elif o == 'dnsthreads':
+				DNSUtils.setResolverOptions(workers=int(v))
+			elif o == 'dnstimeout':
+				DNSUtils.setResolverOptions(timeout=MyTime.str2seconds(v))
+			elif o == 'filterprocesses':
+				FilterProcPool.setProcesses(int(v))
 			else: # pragma: no cover
 				raise KeyError("unknown option %r" % o)
 
 	def getThreadOptions(self):
-		return {'stacksize': threading.stack_size() // 1024}
+		return {'stacksize': threading.stack_size() // 1024,
+			'actionthreads': getMaxCmdConcurrency(),
+			'dnsthreads': DNSUtils.Resolver.workers if DNSUtils.Resolver else 0,
+			'dnstimeout': DNSUtils.resolverTimeout,
+			'filterprocesses': FilterProcPool.processes}
+
+	def setCacheOptions(self, value):
+		for o, v in value.items():
+			cache = Utils.Cache.named.get(o)
+			if cache is None:
+				raise KeyError("unknown cache %r" % o)
+			v = str(v).split()
+			cache.setOptions(maxCount=int(v[0]),
+				maxTime=MyTime.str2seconds(v[1]) if len(v) > 1 else cache.maxTime)
+
+	def getCacheOptions(self):
+		return dict((n, "%s %s" % (c.maxCount, c.maxTime))
+			for n, c in Utils.Cache.named.items())
+
+	def getCacheStats(self, name=None):
+		if name is not None:
+			return self.__jails[name].filter.getCacheStats()
+		return [(n, c.stats) for n, c in sorted(Utils.Cache.named.items())]
 
 	def setDatabase(self, filename):
 		# if not changed - nothing to do
@@ -851,6 +908,10 @@ class Server:
 	def getDatabase(self):
 		return self.__db
 
+	def getObserverStatus(self):
+		obs = Observers.Main
+		return obs.status if obs is not None else None
+
 	@staticmethod
 	def __get_fdlist():
 		"""Generate a list of open file descriptors.
@@ -186,7 +186,7 @@ def zone2offset(tz, dt):
 		# [+-]hh:mm --> [+-]1 * (hh*60 + mm)
 		return TZ_ABBR_OFFS[tz] + (-1 if tzo[0] == '-' else 1) * (int(tzo[1:3])*60 + int(tzo[4:6]))
 
-def reGroupDictStrptime(found_dict, msec=False, default_tz=None):
+def reGroupDictStrptime(found_dict, msec=False, default_tz=None, cache=None):
 	"""Return time from dictionary of strptime fields
 
 	This is tweaked from python built-in _strptime.
@@ -198,13 +198,82 @@ def reGroupDictStrptime(found_dict, msec=False, default_tz=None):
 		respective value.
 	default_tz : default timezone to apply if nothing relevant is in found_dict
                      (may be a non-fixed one in the future)
+	cache : dict, optional
+		Memo of the date part (all fields except the seconds), e. g. of the
+		date template, so consecutive lines of the same minute don't need
+		to rebuild the date (the seconds are added to the cached time).
 	Returns
 	-------
 	float
 		Unix time stamp.
 	"""
+	if cache is not None and not msec:
+		tm = _reGroupDictStrptimeCached(found_dict, default_tz, cache)
+		if tm is not None:
+			return tm
 
-	now = \
+	date_result, tzoffset, fraction, assume, now = _strptimeDate(found_dict, msec, default_tz)
+	if assume:
+		date_result = _rolloverDate(date_result, now, *assume)[0]
+
+	# make time:
+	tm = _dateToTime(date_result, tzoffset)
+	if msec: # pragma: no cover - currently unused
+		tm += fraction/1000000.0
+	return tm
+
+# max count of dates cached per template (consecutive lines share mostly the same minute):
+STRPTIME_CACHE_SIZE = 64
+# fields not in the key of cached dates (seconds added to cached time, fraction ignored without msec):
+_NOT_CACHED_FIELDS = ('S', 'f')
+
+def _reGroupDictStrptimeCached(found_dict, default_tz, cache):
+	"""Return time using cached date part of strptime fields (or None if not cacheable)"""
+	second = found_dict.get('S')
+	second = int(second) if second is not None else 0
+	# leap second (invalid for datetime) - not cacheable:
+	if second > 59:
+		return None
+	key = (default_tz, tuple(v for k, v in found_dict.items() if k not in _NOT_CACHED_FIELDS))
+	ent = cache.get(key)
+	now = None
+	# date part depends on current time (assumed year or day) - check it is still the same:
+	if ent is not None and ent[0] is not None:
+		now = MyTime.now()
+		if ent[0] != _assumedNowKey(now, ent[3]):
+			ent = None
+	if ent is None:
+		fd = dict(found_dict)
+		fd['S'] = None
+		date_result, tzoffset, _, assume, now = _strptimeDate(fd, False, default_tz, now)
+		# time of the minute begin (for not assumed date, otherwise filled on demand):
+		ent = (_assumedNowKey(now, assume) if assume else None, date_result, tzoffset, assume,
+			{} if assume else _dateToTime(date_result, tzoffset))
+		if len(cache) >= STRPTIME_CACHE_SIZE:
+			cache.clear()
+		cache[key] = ent
+	nowKey, date_result, tzoffset, assume, tm = ent
+	if not assume:
+		return tm + second
+	# rollover depends on the seconds (compared with now), so check it and use
+	# the time of the minute begin cached for the rollover variant:
+	date_result, now, rollDay, rollYear = _rolloverDate(
+		date_result + datetime.timedelta(seconds=second), now, *assume)
+	t = tm.get((rollDay, rollYear))
+	if t is None:
+		t = tm[(rollDay, rollYear)] = _dateToTime(date_result, tzoffset) - second
+	return t + second
+
+def _assumedNowKey(now, assume):
+	"""Part of current time the date with assumed year or day depends on"""
+	return (now.year, now.month, now.day) if assume[0] else now.year
+
+def _strptimeDate(found_dict, msec=False, default_tz=None, now=None):
+	"""Return datetime (corrected by timezone) from dictionary of strptime fields
+
+	Returns tuple of datetime, timezone offset, fraction, arguments for `_rolloverDate`
+	(or None if nothing assumed) and current time (if it was used).
+	"""
 	year = month = day = tzoffset = \
 	weekday = julian = week_of_year = None
 	hour = minute = second = fraction = 0
@@ -317,26 +386,35 @@ def reGroupDictStrptime(found_dict, msec=False, default_tz=None):
 	if tzoffset is not None:
 		date_result -= datetime.timedelta(seconds=tzoffset * 60)
 
+	assume = (assume_today, assume_year, year, month, day) if assume_today or assume_year else None
+	return date_result, tzoffset, fraction, assume, now
+
+def _rolloverDate(date_result, now, assume_today, assume_year, year, month, day):
+	"""Correct date with assumed day or year, if it is in the future
+
+	Returns tuple of datetime, current time and whether day or year rollover occurred.
+	"""
+	rollDay = rollYear = False
 	if assume_today:
 		if not now: now = MyTime.now()
 		if date_result > now:
 			# Rollover at midnight, could mean it's yesterday...
 			date_result -= datetime.timedelta(days=1)
+			rollDay = True
 	if assume_year:
 		if not now: now = MyTime.now()
 		if date_result > now + datetime.timedelta(days=1): # ignore by timezone issues (+24h)
 			# assume last year - also reset month and day as it's not yesterday...
 			date_result = date_result.replace(
 				year=year-1, month=month, day=day)
+			rollYear = True
+	return date_result, now, rollDay, rollYear
 
-	# make time:
+def _dateToTime(date_result, tzoffset):
+	"""Return unix time stamp of datetime (in UTC if timezone offset known, otherwise local)"""
 	if tzoffset is not None:
-		tm = calendar.timegm(date_result.utctimetuple())
-	else:
-		tm = time.mktime(date_result.timetuple())
-	if msec: # pragma: no cover - currently unused
-		tm += fraction/1000000.0
-	return tm
+		return calendar.timegm(date_result.utctimetuple())
+	return time.mktime(date_result.timetuple())
 
 
 TZ_ABBR_OFFS = {'':0, None:0}
@@ -184,6 +184,10 @@ class Transmitter:
 		elif name == "thread":
 			value = command[1]
 			return self.__server.setThreadOptions(value)
+		#Cache
+		elif name == "cache":
+			value = command[1]
+			return self.__server.setCacheOptions(value)
 		#Database
 		elif name == "dbfile":
 			self.__server.setDatabase(command[1])
@@ -211,6 +215,15 @@ class Transmitter:
 				db.purgeage = command[1]
 				if self.__quiet: return
 				return db.purgeage
+		elif name == "dbflushinterval":
+			db = self.__server.getDatabase()
+			if db is None:
+				logSys.log(logging.MSG, "dbflushinterval setting was not in effect since no db yet")
+				return None
+			else:
+				db.flushinterval = command[1]
+				if self.__quiet: return
+				return db.flushinterval
 		# Jail
 		elif command[1] == "idle":
 			if command[2] == "on":
@@ -345,12 +358,27 @@ class Transmitter:
 			self.__server.setMaxLines(name, int(value))
 			if self.__quiet: return
 			return self.__server.getMaxLines(name)
+		elif command[1] == "regexset":
+			value = command[2]
+			self.__server.setRegexSet(name, value)
+			if self.__quiet: return
+			return self.__server.getRegexSet(name)
+		elif command[1] == "filterprocess":
+			value = command[2]
+			self.__server.setFilterProcess(name, value)
+			if self.__quiet: return
+			return self.__server.getFilterProcess(name)
 		# command
 		elif command[1] == "bantime":
 			value = command[2]
 			self.__server.setBanTime(name, value)
 			if self.__quiet: return
 			return self.__server.getBanTime(name)
+		elif command[1] == "actionthreads":
+			value = command[2]
+			self.__server.setActionThreads(name, value)
+			if self.__quiet: return
+			return self.__server.getActionThreads(name)
 		elif command[1] == "attempt":
 			value = command[2:]
 			return self.__server.addAttemptIP(name, *value)
@@ -421,6 +449,11 @@ class Transmitter:
 		#Thread
 		elif name == "thread":
 			return self.__server.getThreadOptions()
+		#Cache
+		elif name == "cache":
+			return self.__server.getCacheOptions()
+		elif name == "cache-stats":
+			return self.__server.getCacheStats()
 		#Database
 		elif name == "dbfile":
 			db = self.__server.getDatabase()
@@ -440,10 +473,27 @@ class Transmitter:
 				return None
 			else:
 				return db.purgeage
+		elif name == "dbflushinterval":
+			db = self.__server.getDatabase()
+			if db is None:
+				return None
+			else:
+				return db.flushinterval
+		elif name == "dbqueue":
+			db = self.__server.getDatabase()
+			if db is None:
+				return None
+			else:
+				return db.queueStats
+		# Observer
+		elif name == "observer":
+			return self.__server.getObserverStatus()
 		# Jail, Filter
 		elif command[1] == "banned":
 			# check IP is banned in all jails:
 			return self.__server.banned(name, command[2:])
+		elif command[1] == "cache-stats":
+			return self.__server.getCacheStats(name)
 		elif command[1] == "logpath":
 			return self.__server.getLogPath(name)
 		elif command[1] == "logencoding":
@@ -479,9 +529,15 @@ class Transmitter:
 			return self.__server.getMaxRetry(name)
 		elif command[1] == "maxlines":
 			return self.__server.getMaxLines(name)
+		elif command[1] == "regexset":
+			return self.__server.getRegexSet(name)
+		elif command[1] == "filterprocess":
+			return self.__server.getFilterProcess(name)
 		# Action
 		elif command[1] == "bantime":
 			return self.__server.getBanTime(name)
+		elif command[1] == "actionthreads":
+			return self.__server.getActionThreads(name)
 		elif command[1] == "banip":
 			return self.__server.getBanList(name,
 				withTime=len(command) > 2 and command[2] == "--with-time")
@@ -64,17 +64,28 @@ class Utils():
 
 
 	class Cache(object):
-		"""A simple cache with a TTL and limit on size
+		"""A LRU cache with a TTL and limit on size (get and set are O(1))
+
+		Named caches are registered in `Utils.Cache.named` (to be configurable
+		and to provide statistic via fail2ban-client).
 		"""
 
+		named = {}
+
 		def __init__(self, *args, **kwargs):
-			self.setOptions(*args, **kwargs)
+			name = kwargs.pop('name', None)
 			self._cache = OrderedDict()
 			self.__lock = Lock()
+			self.hits = self.misses = self.evictions = 0
+			self.setOptions(*args, **kwargs)
+			if name is not None:
+				Utils.Cache.named[name] = self
 
 		def setOptions(self, maxCount=1000, maxTime=60):
 			self.maxCount = maxCount
 			self.maxTime = maxTime
+			# shrink if max count decreased:
+			self._evict()
 
 		def __len__(self):
 			return len(self._cache)
@@ -83,8 +94,15 @@ class Utils():
 			v = self._cache.get(k)
 			if v: 
 				if v[1] > time.time():
+					self.hits += 1
+					# refresh recency (ignore if removed concurrently):
+					try:
+						self._cache.move_to_end(k)
+					except KeyError: # pragma: no cover
+						pass
 					return v[0]
 				self.unset(k)
+			self.misses += 1
 			return defv
 			
 		def set(self, k, v):
@@ -92,16 +110,18 @@ class Utils():
 			# avoid multiple modification of dict multi-threaded:
 			cache = self._cache
 			with self.__lock:
-				# clean cache if max count reached:
-				if len(cache) >= self.maxCount:
-					# ordered (so remove some from ahead, FIFO)
-					while cache:
-						(ck, cv) = cache.popitem(last=False)
-						# if not yet expired (but has free slot for new entry):
-						if cv[1] > t and len(cache) < self.maxCount:
-							break
-				# set now:
 				cache[k] = (v, t + self.maxTime)
+				cache.move_to_end(k)
+			# remove least recently used entries if max count reached:
+			if len(cache) > self.maxCount:
+				self._evict()
+
+		def _evict(self):
+			with self.__lock:
+				cache = self._cache
+				while len(cache) > self.maxCount:
+					cache.popitem(last=False)
+					self.evictions += 1
 
 		def unset(self, k):
 			with self.__lock:
@@ -111,6 +131,18 @@ class Utils():
 			with self.__lock:
 				self._cache.clear()
 
+		@property
+		def stats(self):
+			"""Statistic of cache (size, limits, hits, misses and evictions)."""
+			return [
+				("Size", len(self._cache)),
+				("Max count", self.maxCount),
+				("Max time", self.maxTime),
+				("Hits", self.hits),
+				("Misses", self.misses),
+				("Evictions", self.evictions),
+			]
+
 
 	@staticmethod
 	def setFBlockMode(fhandle, value):
@@ -174,6 +174,123 @@ class ExecuteActions(LogCaptureTestCase):
 		self.assertLogged("action1 unban deleted aInfo IP")
 		self.assertLogged("action2 unban deleted aInfo IP")
 
+	@with_tmpdir
+	def testBanActionsConcurrent(self, tmp):
+		from ..server.action import getMaxCmdConcurrency, setMaxCmdConcurrency
+		self.assertRaises(ValueError, setattr, self.__actions, 'actionThreads', 0)
+		self.assertRaises(ValueError, setMaxCmdConcurrency, 0)
+		self.__actions.actionThreads = 3
+		self.assertEqual(self.__actions.actionThreads, 3)
+		setMaxCmdConcurrency(3)
+		self.assertEqual(getMaxCmdConcurrency(), 3)
+		self.addCleanup(setMaxCmdConcurrency, 1)
+		names = ('act1', 'act2', 'act3')
+		for name in names:
+			self.__actions.add(name)
+			act = self.__actions[name]
+			fn = os.path.join(tmp, name)
+			act.actionban = 'echo ban <ip> >> %s' % fn
+			act.actionunban = 'echo unban <ip> >> %s' % fn
+		ips = ['192.0.2.%d' % i for i in range(1, 11)]
+		self.__actions._Actions__checkBan([FailTicket(ip) for ip in ips])
+		# all tickets are banned (flag set after all actions processed):
+		self.assertEqual(self.__actions.status('short')[0][1], len(ips))
+		self.assertTrue(all(t.banned for t in self.__actions.banManager._BanManager__banList.values()))
+		self.__actions._Actions__flushBan()
+		self.assertNotLogged("Failed to execute")
+		# each action processes the tickets in order, ban always before unban:
+		expected = ['ban ' + ip for ip in ips] + ['unban ' + ip for ip in ips]
+		for name in names:
+			with open(os.path.join(tmp, name)) as f:
+				self.assertEqual(f.read().splitlines(), expected)
+
+	def testBanActionsConcurrentResize(self):
+		from threading import Event, Thread
+		for name in ('act1', 'act2', 'act3'):
+			self.__actions.add(name, os.path.join(TEST_FILES_DIR, "action.d/action.py"), {'opt1': 'value'})
+		self.__actions.actionThreads = 2
+		# change count of threads (swaps the pool) while operations are executed:
+		stop = Event()
+		def _resize():
+			while not stop.is_set():
+				for n in (3, 2):
+					self.__actions.actionThreads = n
+		th = Thread(target=_resize)
+		th.start()
+		try:
+			ips = ['192.0.2.%d' % i for i in range(1, 6)]
+			for i in range(50):
+				self.assertEqual(self.__actions._Actions__checkBan([FailTicket(ip) for ip in ips]), len(ips))
+				self.assertEqual(self.__actions._Actions__flushBan(), len(ips))
+		finally:
+			stop.set()
+			th.join()
+		self.assertNotLogged("Failed to execute")
+
+	@with_tmpdir
+	def testBanActionsBatch(self, tmp):
+		fn = os.path.join(tmp, 'cmds')
+		self.__actions.add('act')
+		act = self.__actions['act']
+		act.actionban = 'echo ban <ip> >> %s' % fn
+		act.actionunban = 'echo unban <ip> >> %s' % fn
+		act.actionban_batch = "printf 'batch-ban %%s\\n' <batch> >> %s" % fn
+		act.actionunban_batch = "printf 'batch-unban %%s\\n' <batch> >> %s" % fn
+		ips = ['192.0.2.%d' % i for i in range(1, 6)]
+		self.assertEqual(self.__actions._Actions__checkBan([FailTicket(ip) for ip in ips]), len(ips))
+		self.__actions._Actions__flushBan()
+		self.assertNotLogged("Failed to execute")
+		with open(fn) as f:
+			self.assertEqual(f.read().splitlines(),
+				['batch-ban ' + ip for ip in ips] + ['batch-unban ' + ip for ip in ips])
+		# single ticket - no batch:
+		os.remove(fn)
+		self.__actions._Actions__checkBan([FailTicket(ips[0])])
+		# failed batch - fallback to single operation for each ticket:
+		act.actionban_batch = 'false'
+		self.__actions._Actions__checkBan([FailTicket(ip) for ip in ips[1:]])
+		self.assertLogged("Failed to execute ban jail 'DummyJail' action 'act' for 4 tickets at once")
+		with open(fn) as f:
+			self.assertEqual(f.read().splitlines(), ['ban ' + ip for ip in ips])
+
+	def testActionsWakeup(self):
+		# thread doesn't poll (sleeps long), but gets woken up by new ticket, change of idle and stop:
+		self.__actions.sleeptime = 60
+		self.__actions.start()
+		stm = time.time()
+		self.__jail.putFailTicket(FailTicket('192.0.2.1'))
+		self.assertLogged("Ban 192.0.2.1", wait=True)
+		self.__actions.idle = True
+		self.assertLogged("Actions: enter idle mode", wait=True)
+		self.__actions.idle = False
+		self.assertLogged("Actions: leave idle mode", wait=True)
+		self.__actions.stop()
+		self.__actions.join()
+		self.assertFalse(self.__actions.is_alive())
+		self.assertLess(time.time() - stm, 10)
+
+	@with_tmpdir
+	def testRestoreBansBatch(self, tmp):
+		fn = os.path.join(tmp, 'cmds')
+		self.__actions.add('act')
+		act = self.__actions['act']
+		act.actionban = 'echo ban <ip> >> %s' % fn
+		act.actionban_batch = "printf 'batch-ban %%s\\n' <batch> >> %s" % fn
+		ips = ['192.0.2.%d' % i for i in range(1, 8)]
+		pages = [[], [FailTicket(ip) for ip in ips[:4]], [FailTicket(ip) for ip in ips[4:]]]
+		for p in pages:
+			for t in p: t.restored = True
+		self.__actions.start()
+		self.__actions.restoreBans(iter(pages), len(ips))
+		self.assertLogged("[DummyJail] Restored 7 ban(s)", wait=True)
+		self.assertLogged("Restore Ban 192.0.2.1", "Restore Ban 192.0.2.7", all=True)
+		# each page banned as single batch:
+		with open(fn) as f:
+			self.assertEqual(f.read().splitlines(), ['batch-ban ' + ip for ip in ips])
+		self.assertEqual(self.__actions.status('short'), [("Currently banned", 7), ("Total banned", 7)])
+		self.__actions.stop()
+		self.__actions.join()
+
 	@with_alt_time
 	def testUnbanOnBusyBanBombing(self):
 		# check unban happens in-between of "ban bombing" despite lower precedence,
@@ -29,7 +29,7 @@ import tempfile
 import time
 import unittest
 
-from ..server.action import CommandAction, CallingMap, substituteRecursiveTags
+from ..server.action import CommandAction, CommandTemplate, CallingMap, substituteRecursiveTags
 from ..server.actions import OrderedDict, Actions
 from ..server.utils import Utils
 
@@ -295,6 +295,31 @@ class CommandActionTest(LogCaptureTestCase):
 				"Text 000-567 text 567 '567'")
 		self.assertTrue(len(cache) >= 3)
 
+	def testCommandTemplate(self):
+		setattr(self.__action, 'abc', "123")
+		setattr(self.__action, 'abc?family=inet6', "567")
+		# (<sp> and <br> are static, replaced by compiling):
+		setattr(self.__action, 'actionban', "ban <abc> <ip><sp><F-USER> '<matches>' <unknown> <br>end")
+		aInfo = {'ip': '192.0.2.1', 'matches': "a `b`", 'F-*': {'user': 'test'}}
+		# compiled once (static tags replaced), rendered per ticket:
+		tmpl = self.__action._getCmdTemplate('<actionban>', 'inet4')
+		self.assertEqual(tmpl.cmd, "ban 123 <ip> <F-USER> '<matches>' <unknown> \nend")
+		self.assertIs(self.__action._getCmdTemplate('<actionban>', 'inet4'), tmpl)
+		self.assertEqual(self.__action._getCmdTemplate('<actionban>', 'inet6').cmd,
+			"ban 567 <ip> <F-USER> '<matches>' <unknown> \nend")
+		# the same result as replacement of string:
+		for info in (aInfo, {'ip': '192.0.2.2', 'F-*': {}}, CallingMap(ip=lambda: '192.0.2.3')):
+			self.assertEqual(self.__action.replaceDynamicTags(tmpl, info),
+				self.__action.replaceDynamicTags(tmpl.cmd, info))
+		self.assertEqual(self.__action.replaceDynamicTags(tmpl, aInfo),
+			['f2bV_matches=$0 \nban 123 192.0.2.1 test \'$f2bV_matches\' <unknown> \nend', 'a `b`'])
+		# static command:
+		self.assertEqual(CommandTemplate("echo 1").render(aInfo, None), "echo 1")
+		# parameters changed - template recompiled:
+		setattr(self.__action, 'abc', "000")
+		self.assertEqual(self.__action._getCmdTemplate('<actionban>', 'inet4').cmd,
+			"ban 000 <ip> <F-USER> '<matches>' <unknown> \nend")
+
 	@with_tmpdir
 	def testExecuteActionBan(self, tmp):
 		tmp += "/fail2ban.test"
@@ -321,6 +346,30 @@ class CommandActionTest(LogCaptureTestCase):
 		self.__action.stop()
 		self.assertLogged(self.__action.actionstop)
 
+	@with_tmpdir
+	def testExecuteActionBatch(self, tmp):
+		tmp += "/fail2ban.test"
+		aInfos = [{'ip': '192.0.2.%d' % i, 'family': 'inet4', 'F-*': {'user': 'u%d\n;id' % i}} for i in range(1, 4)]
+		# not supported without batch command:
+		self.assertRaises(NotImplementedError, self.__action.ban_many, aInfos)
+		self.assertRaises(NotImplementedError, self.__action.unban_many, aInfos)
+		self.__action.actionban = "echo ban <ip> >> '%s'" % tmp
+		self.__action.actionban_batch = "printf '%%s\\n' \"<batch>\" >> '%s'" % tmp
+		self.__action.actionban_batch_item = "add <ip> <F-USER>"
+		self.__action.actionunban_batch = "printf '%%s\\n' <batch-count> \"<batch>\" >> '%s'" % tmp
+		self.__action.ban_many(aInfos)
+		self.__action.unban_many(aInfos)
+		with open(tmp) as f:
+			self.assertEqual(f.read().splitlines(), [
+				# new-line in value doesn't break the structure of batch:
+				'add 192.0.2.1 u1 ;id', 'add 192.0.2.2 u2 ;id', 'add 192.0.2.3 u3 ;id',
+				# default item is ip:
+				'3', '192.0.2.1', '192.0.2.2', '192.0.2.3'
+			])
+		# failed batch causes an error:
+		self.__action.actionban_batch = "false"
+		self.assertRaisesRegex(RuntimeError, r"Error banning 3 tickets", self.__action.ban_many, aInfos)
+
 	def testExecuteActionEmptyUnban(self):
 		# unban will be executed for actions with banned items only:
 		self.__action.actionban = ""
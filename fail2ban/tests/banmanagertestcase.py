@@ -144,6 +144,36 @@ class AddFailure(unittest.TestCase):
 		self.assertEqual(len(self.__banManager.unBanList(stime + btime + 5*10 + 1)), 3)
 		self.assertEqual(self.__banManager.size(), 0)
 
+	def testUnbanExpiryOrder(self):
+		btime = self.__banManager.getBanTime()
+		stime = self.__ticket.getTime()
+		tickets = []
+		for i in (5, 1, 4, 2, 3, 0):
+			ticket = BanTicket('192.0.2.%s' % i, stime)
+			ticket.setBanTime(btime + i*10)
+			self.assertTrue(self.__banManager.addBanTicket(ticket))
+			tickets.append(ticket)
+		# next unban time is the nearest end of ban:
+		self.assertEqual(self.__banManager._nextUnbanTime, stime + btime)
+		# prolong ticket 1 directly (like observer does it by increment of ban time):
+		tickets[1].setBanTime(btime + 100)
+		# remove ticket 2 (obsolete entry in expiry index):
+		self.assertEqual(self.__banManager.getTicketByID('192.0.2.2'), tickets[3])
+		# unban limited by max count, in order of end of ban:
+		self.assertEqual(
+			[t.getID() for t in self.__banManager.unBanList(stime + btime + 50, 2)],
+			['192.0.2.0', '192.0.2.3'])
+		self.assertEqual(self.__banManager._nextUnbanTime, stime + btime + 40)
+		self.assertEqual(
+			[t.getID() for t in self.__banManager.unBanList(stime + btime + 50)],
+			['192.0.2.4'])
+		self.assertEqual(self.__banManager._nextUnbanTime, stime + btime + 50)
+		self.assertEqual(
+			[t.getID() for t in self.__banManager.unBanList(stime + btime + 1000)],
+			['192.0.2.5', '192.0.2.1'])
+		self.assertEqual(self.__banManager.size(), 0)
+		self.assertEqual(self.__banManager._nextUnbanTime, BanTicket.MAX_TIME)
+
 	def testUnbanPermanent(self):
 		btime = self.__banManager.getBanTime()
 		self.__banManager.setBanTime(-1)
@@ -225,6 +225,29 @@ class BeautifierTest(unittest.TestCase):
 		self.assertEqual(self.b.beautify(86400), output)
 		self.assertEqual(self.b.beautify(None), "Database currently disabled")
 
+	def testDbQueue(self):
+		self.b.setInputCmd(["get", "dbqueue"])
+		response = [("Queue depth", 2), ("Flushes", 5)]
+		output = "Database write queue:\n|- Queue depth:\t2\n`- Flushes:\t5"
+		self.assertEqual(self.b.beautify(response), output)
+		self.assertEqual(self.b.beautify(None), "Database currently disabled")
+
+	def testCacheStats(self):
+		response = [("ip", [("Size", 2), ("Hits", 5)]), ("nametoip", [("Size", 0)])]
+		output = ("Cache statistic:\n|- ip\n|  |- Size:\t2\n|  `- Hits:\t5\n"
+			"`- nametoip\n   `- Size:\t0")
+		self.b.setInputCmd(["get", "cache-stats"])
+		self.assertEqual(self.b.beautify(response), output)
+		self.b.setInputCmd(["get", "sshd", "cache-stats"])
+		self.assertEqual(self.b.beautify(response), output)
+
+	def testObserverStatus(self):
+		self.b.setInputCmd(["get", "observer"])
+		response = [("Queue depth", 0), ("Processed events", 12)]
+		output = "Observer event queue:\n|- Queue depth:\t0\n`- Processed events:\t12"
+		self.assertEqual(self.b.beautify(response), output)
+		self.assertEqual(self.b.beautify(None), "Observer currently disabled")
+
 	def testLogPath(self):
 		self.b.setInputCmd(["get", "sshd", "logpath"])
 		response = []
@@ -1051,6 +1051,10 @@ filter = testfilter1
 			raise unittest.SkipTest("systemd python interface not available")
 		self._testLogPath(backend='systemd')
 		self._testLogPath(backend='systemd[journalflags=2]')
+
+	def testLogPathSyslogBackend(self):
+		# logpath is ignored (no error by missing files):
+		self._testLogPath(backend='syslog[listen="udp:127.0.0.1:5514", program=sshd]')
 	
 	@with_tmpdir
 	def _testLogPath(self, basedir, backend, skip_if_nologs=False):
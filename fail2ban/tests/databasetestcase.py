@@ -308,6 +308,157 @@ class DatabaseTest(LogCaptureTestCase):
 		self.assertTrue(
 			isinstance(tickets[0], FailTicket))
 
+	def testWriteBehindQueue(self):
+		self.testAddJail()
+		def _rawCount(table):
+			return self.db._db.execute("SELECT count(*) FROM %s" % table).fetchone()[0]
+		# bans and journal positions are queued:
+		for i in range(5):
+			self.db.addBan(self.jail, FailTicket("127.0.0.%d" % i, 0))
+			self.db.updateJournal(self.jail, 'systemd-journal', 1500000000 + i, 'TEST')
+		stats = dict(self.db.queueStats)
+		self.assertEqual(stats["Queue depth"], 10)
+		self.assertEqual(stats["Flushes"], 0)
+		self.assertEqual(_rawCount("bans"), 0)
+		# written by flush within single transaction (journal positions are coalesced):
+		self.db.flush()
+		self.assertEqual(_rawCount("bans"), 5)
+		self.assertEqual(_rawCount("bips"), 5)
+		self.assertEqual(_rawCount("logs"), 1)
+		stats = dict(self.db.queueStats)
+		self.assertEqual(stats["Queue depth"], 0)
+		self.assertEqual(stats["Flushes"], 1)
+		self.assertEqual(stats["Written operations"], 10)
+		self.assertTrue(stats["Max flush latency"] >= stats["Last flush latency"] >= 0)
+		# any read operation sees queued writes:
+		self.db.addBan(self.jail, FailTicket("127.0.0.10", 0))
+		self.assertEqual(len(self.db.getBans(jail=self.jail)), 6)
+		# flush if queue is full:
+		self.db.maxPending = 3
+		for i in range(3):
+			self.db.addBan(self.jail, FailTicket("127.0.0.2%d" % i, 0))
+		self.assertEqual(_rawCount("bans"), 9)
+		# flush after interval:
+		self.db.flushinterval = 0.1
+		self.db.addBan(self.jail, FailTicket("127.0.0.30", 0))
+		self.assertTrue(Utils.wait_for(lambda: _rawCount("bans") == 10, 5))
+		# write immediately:
+		self.db.flushinterval = 0
+		self.db.addBan(self.jail, FailTicket("127.0.0.31", 0))
+		self.assertEqual(_rawCount("bans"), 11)
+
+	def testWriteBehindQueueSnapshot(self):
+		self.testAddJail()
+		ticket = FailTicket("127.0.0.1", 0, ['m1'])
+		self.db.addBan(self.jail, ticket)
+		# modification of ticket after addBan doesn't affect queued ban:
+		ticket.getData()['matches'].append('LATER')
+		ticket.setData('extra', 'mutated')
+		self.db.flush()
+		tickets = self.db.getBans(jail=self.jail)
+		self.assertEqual(len(tickets), 1)
+		self.assertEqual(tickets[0].getData(), {'matches': ['m1'], 'failures': 0})
+
+	def testWriteBehindQueueFailure(self):
+		self.testAddJail()
+		def _rawCount(table):
+			return self.db._db.execute("SELECT count(*) FROM %s" % table).fetchone()[0]
+		for i in range(3):
+			self.db.addBan(self.jail, FailTicket("127.0.0.%d" % i, 0))
+		self.db.updateJournal(self.jail, 'systemd-journal', 1500000000, 'TEST')
+		# transient error - nothing written (rolled back), but operations are kept in queue:
+		orgUpdateLog = self.db._updateLog
+		def _updateLog(*args):
+			raise sqlite3.OperationalError("database is locked")
+		self.db._updateLog = _updateLog
+		try:
+			self.db.flush()
+		finally:
+			self.db._updateLog = orgUpdateLog
+		self.assertLogged("Failed to write 4 pending operations to database")
+		self.assertEqual(_rawCount("bans"), 0)
+		# queued in-between:
+		self.db.addBan(self.jail, FailTicket("127.0.0.3", 0))
+		self.db.updateJournal(self.jail, 'systemd-journal', 1500000001, 'TEST')
+		self.assertEqual(dict(self.db.queueStats)["Queue depth"], 6)
+		# written by next flush (newer journal position wins):
+		self.db.flush()
+		self.assertEqual(dict(self.db.queueStats)["Queue depth"], 0)
+		self.assertEqual(_rawCount("bans"), 4)
+		self.assertEqual(_rawCount("logs"), 1)
+		self.assertEqual(self.db.getJournalPos(self.jail, 'systemd-journal'), 1500000001)
+		# persistent error - back off (no flush by each queued operation), retry queue is limited:
+		class _FailedDb:
+			attempts = 0
+			def __enter__(self):
+				self.attempts += 1
+				raise sqlite3.OperationalError("attempt to write a readonly database")
+			def __exit__(self, *args): # pragma: no cover
+				pass
+		self.db.maxPending = 2
+		self.db.maxRetryPending = 5
+		orgDb, self.db._db = self.db._db, _FailedDb()
+		try:
+			for i in range(10):
+				self.db.addBan(self.jail, FailTicket("127.0.1.%d" % i, 0))
+			self.assertEqual(self.db._db.attempts, 1)
+			self.assertEqual(dict(self.db.queueStats)["Queue depth"], 10)
+			self.db.flush()
+			self.assertEqual(self.db._db.attempts, 2)
+			self.assertLogged("Too many pending operations to retry, dropped 5 oldest bans")
+			self.assertEqual(dict(self.db.queueStats)["Queue depth"], 5)
+		finally:
+			self.db._db = orgDb
+		# the newest are written as soon as database is writable again:
+		self.db.flush()
+		self.assertEqual(dict(self.db.queueStats)["Queue depth"], 0)
+		self.assertEqual(_rawCount("bans"), 9)
+		self.assertEqual(self.db._retryTime, 0)
+
+	def testBipsCache(self):
+		self.testAddJail()
+		jail2 = DummyJail(name='DummyJail-2')
+		self.db.addJail(jail2)
+		def _ticket(ip, t, cnt):
+			ticket = FailTicket(ip, t)
+			ticket.setBanTime(600)
+			ticket.setBanCount(cnt)
+			return ticket
+		self.db.addBan(self.jail, _ticket("192.0.2.1", 1000, 1))
+		self.db.addBan(jail2, _ticket("192.0.2.1", 2000, 2))
+		# rows of all jails are loaded with single query (also missing IPs):
+		self.assertEqual(self.db.getBanMany(["192.0.2.1", "192.0.2.2"], self.jail),
+			{"192.0.2.1": (1, 1000, 600)})
+		self.assertEqual(sorted(self.db._bipsCache.keys()), ["192.0.2.1", "192.0.2.2"])
+		self.assertEqual(self.db.getBan("192.0.2.1", jail2), [(2, 2000, 600)])
+		self.assertEqual(self.db.getBan("192.0.2.1"), [(2, 2000, 600)])
+		self.assertEqual(self.db.getBan("192.0.2.1", overalljails=True), [(3, 2000, 1200)])
+		self.assertEqual(self.db.getBan("192.0.2.1", fromtime=1500, overalljails=True), [(2, 2000, 600)])
+		self.assertEqual(self.db.getBan("192.0.2.2"), [])
+		# cache is actualized by new bans (without flush of queued writes):
+		flushes = dict(self.db.queueStats)["Flushes"]
+		self.db.addBan(self.jail, _ticket("192.0.2.1", 3000, 5))
+		self.db.addBan(self.jail, _ticket("192.0.2.2", 3000, 1))
+		self.assertEqual(self.db.getBan("192.0.2.1", self.jail), [(5, 3000, 600)])
+		self.assertEqual(self.db.getBan("192.0.2.2", self.jail), [(1, 3000, 600)])
+		self.assertEqual(dict(self.db.queueStats)["Flushes"], flushes)
+		# and by removal of bans:
+		self.db.delBan(jail2, "192.0.2.1")
+		self.assertEqual(self.db.getBan("192.0.2.1", overalljails=True), [(5, 3000, 600)])
+		self.db.delBan(self.jail)
+		self.assertEqual(self.db.getBanMany(["192.0.2.1", "192.0.2.2"]), {})
+		# cache is cleared by purge (old bips removed):
+		self.db.addBan(jail2, _ticket("192.0.2.3", 3000, 1))
+		self.assertEqual(self.db.getBan("192.0.2.3", jail2), [(1, 3000, 600)])
+		self.db.purge()
+		self.assertEqual(len(self.db._bipsCache), 0)
+		self.assertEqual(self.db.getBan("192.0.2.3", jail2), [])
+		# least recently used IPs are removed if cache is full:
+		self.db.maxBipsCache = 2
+		self.db.getBanMany(["192.0.2.1", "192.0.2.2"])
+		self.db.getBan("192.0.2.3")
+		self.assertEqual(list(self.db._bipsCache.keys()), ["192.0.2.2", "192.0.2.3"])
+
 	def testAddBanInvalidEncoded(self):
 		self.testAddJail()
 		# invalid + valid, invalid + valid unicode, invalid + valid dual converted (like in filter:readline by fallback) ...
@@ -349,6 +500,8 @@ class DatabaseTest(LogCaptureTestCase):
 
 			for ticket in tickets:
 				self.db.addBan(self.jail, ticket)
+			# bans are queued - write them now:
+			self.db.flush()
 
 			self.assertLogged("json dumps failed")
 
@@ -566,6 +719,27 @@ class DatabaseTest(LogCaptureTestCase):
 		self.assertEqual(len(tickets), 1)
 		self.assertEqual(tickets[0].getBanTime(), -1); # current jail ban time.
 
+	def testIterCurrentBans(self):
+		self.testAddJail()
+		ips = ['192.0.2.%d' % i for i in range(1, 26)]
+		for ip in ips:
+			self.db.addBan(self.jail, FailTicket(ip, MyTime.time() - 10, ["abc\n"]))
+		# expired ban is not counted:
+		self.db.addBan(self.jail, FailTicket('192.0.2.100', MyTime.time() - 1000, ["abc\n"]))
+		self.assertEqual(self.db.getCurrentBansCount(self.jail, forbantime=600), 25)
+		# read in pages (keyset ordered by IP), same tickets as getCurrentBans:
+		pages = list(self.db.iterCurrentBans(self.jail, forbantime=600, pageSize=10))
+		self.assertEqual([len(p) for p in pages], [10, 10, 5])
+		self.assertSortedEqual([t.getID() for p in pages for t in p], ips)
+		self.assertSortedEqual([t.getID() for p in pages for t in p],
+			[t.getID() for t in self.db.getCurrentBans(jail=self.jail, forbantime=600)])
+		# exact multiple of page size - last query returns nothing:
+		pages = list(self.db.iterCurrentBans(self.jail, forbantime=600, pageSize=5))
+		self.assertEqual([len(p) for p in pages], [5] * 5)
+		# nothing to restore:
+		self.assertEqual(list(self.db.iterCurrentBans(self.jail, forbantime=600,
+			fromtime=MyTime.time() + 1000)), [])
+
 	def testActionWithDB(self):
 		# test action together with database functionality
 		self.testAddJail() # Jail required
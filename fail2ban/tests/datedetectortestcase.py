@@ -31,6 +31,7 @@ import datetime
 from ..server.datedetector import DateDetector
 from ..server import datedetector
 from ..server.datetemplate import DatePatternRegex, DateTemplate
+from ..server.strptime import reGroupDictStrptime
 from .utils import setUpMyTime, tearDownMyTime, LogCaptureTestCase
 from ..helpers import getLogger
 
@@ -385,6 +386,37 @@ class DateDetectorTest(LogCaptureTestCase):
 				self.assertTrue(match)
 				self.assertEqual(match.group(1), debit)
 
+	def testCombinedTemplates(self):
+		dd = self.datedetector
+		cmb = dd._getCombined()
+		self.assertTrue(cmb)
+		filters, tmplFilter = cmb
+		# templates with named back-reference (?P=_sep) are combinable too:
+		self.assertTrue([t for t in tmplFilter if '(?P=_sep)' in t.regex])
+		# each prefilter searches for dates of several templates:
+		self.assertTrue(len(filters) < len(tmplFilter))
+		# the same results as sequential search without prefilter:
+		dd2 = DateDetector()
+		dd2.addDefaultTemplate()
+		dd2._getCombined = lambda: False
+		for line in (
+			"no date at all in this line ...",
+			"some free text 2003-03-07 17:05:01 test ...",
+			"server mysqld[1000]: 030324  0:04:00 [Warning] foreign-input 2003-03-07 17:05:01 test",
+			"server sshd[1020]: Sep 16 21:30:26 server mysqld: 030916 21:30:26 [Warning]",
+			"server: (Sun Jan 23 21:59:59 2005) x",
+			"text 23-Jan-2005 21:59:59, 03/24/2003 text",
+			"text 23/Jan/2005:21:59:59 +0100 text",
+			"no date at all in this line ...",
+		) * 2:
+			match, template = dd.matchTime(line)
+			match2, template2 = dd2.matchTime(line)
+			self.assertEqual(template, template2)
+			if match2:
+				self.assertEqual(match.span(1), match2.span(1))
+			else:
+				self.assertEqual(match, None)
+
 	def testLowLevelLogging(self):
 		# test coverage for the deep (heavy) debug messages:
 		try:
@@ -580,6 +612,31 @@ class CustomDateFormatsTest(unittest.TestCase):
 			else: # pragma: no cover
 				self.assertEqual(date, None)
 
+	def testCachedDate(self):
+		# in test cases now == 14 Aug 2005 12:00, cover rollover (yesterday, last year) around it:
+		for (dp, lines) in (
+			("^%ExH:%ExM:%ExS**", ('11:59:58', '12:00:00', '12:00:01', '12:00:59', '11:59:59')),
+			("^%m/%d %ExH:%ExM:%ExS**", ('08/15 11:59:59', '08/15 12:00:00', '08/15 12:00:01', '08/14 12:00:01')),
+			("^%b %d %ExH:%ExM:%ExS**", ('Aug 14 21:59:01', 'Aug 14 21:59:59', 'Sep 01 21:59:59')),
+			("^%Y-%m-%d %ExH:%ExM:%ExS**", ('2005-08-14 21:59:01', '2005-08-14 21:59:59', '2005-08-14 21:58:00')),
+			("^%Y-%m-%d %ExH:%ExM:%ExS%z**", ('2005-08-14 21:59:01+0100', '2005-08-14 21:59:59+0100', '2005-08-14 21:59:59Z')),
+		):
+			template = DatePatternRegex(dp)
+			for default_tz in (None, 60):
+				for line in lines * 2:
+					logSys.debug('== test: %r', (dp, default_tz, line))
+					m = template.matchDate(line)
+					self.assertTrue(m)
+					# the same as without cache:
+					self.assertEqual(template.getDate(line, m, default_tz=default_tz)[0],
+						reGroupDictStrptime(m.groupdict(), default_tz=default_tz))
+			# lines of the same minute share the cached date part:
+			self.assertTrue(len(template._strptimeCache) < len(lines) * 2)
+		# leap second is not cacheable (invalid for datetime):
+		template = DatePatternRegex("^%Y-%m-%d %ExH:%ExM:%ExS**")
+		m = template.matchDate('2005-08-14 21:59:60')
+		self.assertRaises(ValueError, template.getDate, None, m)
+
 #	def testDefaultTemplate(self):
 #		self.__datedetector.setDefaultRegex("^\S{3}\s{1,2}\d{1,2} \d{2}:\d{2}:\d{2}")
 #		self.__datedetector.setDefaultPattern("%b %d %H:%M:%S")
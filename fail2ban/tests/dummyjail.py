@@ -61,6 +61,7 @@ class DummyJail(Jail):
 	def putFailTicket(self, ticket):
 		with self.lock:
 			self.queue.append(ticket)
+		self.actions.wakeup()
 
 	def getFailTicket(self):
 		with self.lock:
@@ -485,7 +485,7 @@ class Fail2banClientServerBase(LogCaptureTestCase):
 		# check thread options were set:
 		self.pruneLog()
 		self.execCmd(SUCCESS, startparams, "get", "thread")
-		self.assertLogged("{'stacksize': 128}")
+		self.assertLogged("'stacksize': 128")
 		# several commands to server:
 		self.execCmd(SUCCESS, startparams, "ping")
 		self.execCmd(FAILED, startparams, "~~unknown~cmd~failed~~")
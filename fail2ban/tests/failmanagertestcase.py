@@ -145,6 +145,44 @@ class AddFailure(unittest.TestCase):
 		self.__failManager.cleanup(timestamp)
 		self.assertEqual(self.__failManager.size(), 2)
 	
+	def testCleanupIndex(self):
+		fm = self.__failManager
+		for ip, tm in (('192.0.2.1', 1000), ('192.0.2.2', 1100), ('192.0.2.3', 1200)):
+			fm.addFailure(FailTicket(ip, tm))
+		# new failure of first ip (its time gets adjusted), second ip removed:
+		fm.addFailure(FailTicket('192.0.2.1', 1300))
+		fm.delFailure('192.0.2.2')
+		fm.cleanup(1000 + 600)
+		self.assertEqual(fm.size(), 2)
+		fm.cleanup(1250 + 600)
+		self.assertEqual(fm.size(), 1)
+		self.assertRaises(FailManagerEmpty, fm.toBan)
+		fm.setMaxRetry(2)
+		self.assertEqual(fm.toBan().getID(), '192.0.2.1')
+		fm.cleanup(1300 + 600)
+		self.assertEqual(fm.size(), 0)
+		self.assertEqual(fm._FailManager__timeHeap, [])
+
+	def testbanReadyList(self):
+		self._addDefItems()
+		fm = self.__failManager
+		# given id not reached maxretry - no other failures checked:
+		fm.setMaxRetry(5)
+		self.assertRaises(FailManagerEmpty, fm.toBan, '87.142.124.10')
+		self.assertEqual(fm.size(), 3)
+		# removed failure is not ready anymore:
+		fm.delFailure('193.168.0.128')
+		self.assertRaises(FailManagerEmpty, fm.toBan)
+		# lower maxretry makes other failures ready:
+		fm.setMaxRetry(3)
+		self.assertEqual(fm.toBan('87.142.124.10').getID(), '87.142.124.10')
+		# '100.100.10.10' is not ready (attempts estimated from rate by findtime):
+		self.assertRaises(FailManagerEmpty, fm.toBan)
+		self.assertEqual(fm.size(), 1)
+		# unknown id - any ready failure:
+		fm.addFailure(FailTicket('192.0.2.1', 1167605999.0), 3)
+		self.assertEqual(fm.toBan('192.0.2.2').getID(), '192.0.2.1')
+
 	def testbanOK(self):
 		self._addDefItems()
 		self.__failManager.setMaxRetry(5)
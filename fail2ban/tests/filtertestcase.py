@@ -24,6 +24,7 @@ __license__ = "GPL"
 
 from builtins import open as fopen
 import unittest
+import socket
 import os
 import re
 import sys
@@ -39,9 +40,13 @@ except ImportError:
 from ..helpers import uni_bytes
 from ..server.jail import Jail
 from ..server.filterpoll import FilterPoll
+from ..server.failregex import FailRegex, Regex, TupleLinesBuf
 from ..server.filter import FailTicket, Filter, FileFilter, FileContainer
+from ..server.filterproc import FilterProcPool
+from ..server.logreader import LogReaders
+from ..server.filtersyslog import FilterSyslog, SyslogListeners, parseSyslogMessage
 from ..server.failmanager import FailManagerEmpty
-from ..server.ipdns import asip, getfqdn, DNSUtils, IPAddr, IPAddrSet
+from ..server.ipdns import asip, getfqdn, DNSUtils, DNSResolverPool, IPAddr, IPAddrSet, IPAddrTrie
 from ..server.mytime import MyTime
 from ..server.utils import Utils, uni_decode
 from .databasetestcase import getFail2BanDb
@@ -767,6 +772,82 @@ class LogFile(LogCaptureTestCase):
 		self.assertEqual(FileContainer.decode_line('TESTFILE', 'utf-8', r), l)
 		self.assertLogged('Error decoding line')
 
+	def testKeepOpen(self):
+		fname = tempfile.mktemp(prefix='tmp_fail2ban', suffix='.log')
+		f = open(fname, 'wb')
+		try:
+			f.write(b"line 1\n"); f.flush()
+			fc = FileContainer(fname, 'utf-8')
+			fc.keepOpen = True
+			self.assertTrue(fc.open())
+			self.assertEqual(list(fc.readlines()), ["line 1"])
+			fc.close()
+			h = fc._FileContainer__keptHandler
+			self.assertTrue(h)
+			# no new data - handle is kept:
+			self.assertFalse(fc.open())
+			self.assertIs(fc._FileContainer__keptHandler, h)
+			# the same handle is reused to read new data:
+			f.write(b"line 2\n"); f.flush()
+			self.assertTrue(fc.open())
+			self.assertIs(fc._FileContainer__handler, h)
+			self.assertEqual(list(fc.readlines()), ["line 2"])
+			fc.close()
+			# rotation (other inode) - reopened:
+			f.close(); os.rename(fname, fname + '.1')
+			f = open(fname, 'wb')
+			f.write(b"line 3\n"); f.flush()
+			self.assertTrue(fc.open())
+			self.assertIsNot(fc._FileContainer__handler, h)
+			self.assertTrue(h.closed)
+			self.assertEqual(list(fc.readlines()), ["line 3"])
+			fc.close()
+			h = fc._FileContainer__keptHandler
+			fc.release()
+			self.assertTrue(h.closed)
+			self.assertEqual(fc._FileContainer__keptHandler, None)
+		finally:
+			_killfile(f, fname)
+			_killfile(None, fname + '.1')
+
+	def testReadLinesBulk(self):
+		fname = tempfile.mktemp(prefix='tmp_fail2ban', suffix='.log')
+		data = b"line 1\r\nline 2 \xe2\x82\xac\n" + b"x" * 20 + b"\nbad \xc8 line\nincomplete"
+		f = open(fname, 'wb')
+		try:
+			f.write(data)
+			f.close()
+			fc = FileContainer(fname, 'utf-8')
+			# small chunks (lines are spread over several chunks):
+			fc.bulkReadSize = 7
+			self.assertTrue(fc.open())
+			lines = list(fc.readlines())
+			self.assertEqual(lines, ["line 1", "line 2 \u20ac", "x" * 20, "bad \ufffd line"])
+			self.assertLogged('Error decoding line')
+			# position is exactly at begin of incomplete line:
+			self.assertEqual(fc.tell(), data.rfind(b"\n") + 1)
+			fc.close()
+			self.assertEqual(fc.getPos(), data.rfind(b"\n") + 1)
+			# consume one line only (position after first line, not at end of read chunk):
+			fc.bulkReadSize = 1024
+			self.assertTrue(fc.open(0))
+			for line in fc.readlines():
+				break
+			fc.close()
+			self.assertEqual(fc.getPos(), 8)
+			# continue reading from this position:
+			self.assertTrue(fc.open())
+			self.assertEqual(next(fc.readlines()), "line 2 \u20ac")
+			fc.close()
+			# incomplete line is returned if not wait for line end:
+			fc.waitForLineEnd = False
+			self.assertTrue(fc.open(0))
+			self.assertEqual(list(fc.readlines())[-1], "incomplete")
+			fc.close()
+			self.assertEqual(fc.getPos(), len(data))
+		finally:
+			_killfile(f, fname)
+
 
 class LogFileFilterPoll(unittest.TestCase):
 
@@ -1289,7 +1370,7 @@ def get_monitor_failures_testcase(Filter_):
 			self.assertEqual(self.filter.failManager.getFailTotal(), 6)
 
 		def test_pyinotify_delWatch(self):
-			if hasattr(self.filter, '_delWatch'): # pyinotify only
+			if hasattr(self.filter, '_FilterPyinotify__monitor'): # pyinotify only
 				m = self.filter._FilterPyinotify__monitor
 				# remove existing watch:
 				self.assertTrue(self.filter._delWatch(m.get_wd(self.name)))
@@ -1303,6 +1384,27 @@ def get_monitor_failures_testcase(Filter_):
 				self.assertFalse(self.filter._delWatch(0x7fffffff))
 				m.get_path = _org_get_path
 
+		def test_inotify_coalesce(self):
+			if hasattr(self.filter, '_FilterInotify__coalesce'): # inotify only
+				self.filter._FilterInotify__coalesce = 0.5
+				self.waitForTicks(2)
+				# count processing of the file:
+				calls = []
+				_org_getFailures = self.filter.getFailures
+				def _getFailures(filename, *args):
+					calls.append(filename)
+					return _org_getFailures(filename, *args)
+				self.filter.getFailures = _getFailures
+				# burst of writes (line by line) is processed at once:
+				for i in range(3):
+					_copy_lines_between_files(GetFailures.FILENAME_01, self.file, skip=12+i, n=1)
+				self.assert_correct_last_attempt(GetFailures.FAILURES_01)
+				self.assertEqual(calls, [self.name])
+				# handle remains open between reads:
+				log = self.filter.getLog(self.name)
+				self.assertTrue(log.keepOpen)
+				self.assertTrue(log._FileContainer__keptHandler)
+
 		def test_del_file(self):
 			# test filter reaction by delete watching file:
 			self.file.close()
@@ -1861,6 +1963,48 @@ class GetFailures(LogCaptureTestCase):
 		finally:
 			_killfile(fout, fname)
 
+	def testSharedLogReader(self):
+		# two jails monitoring the same log share its reader:
+		filename = tempfile.mktemp(prefix='tmp_fail2ban', suffix='.log')
+		_copy_lines_between_files(GetFailures.FILENAME_01, filename).close()
+		flt2 = FileFilter(DummyJail())
+		flt2.active = True
+		flt2.setDatePattern(r'^(?:%a )?%b %d %H:%M:%S(?:\.%f)?(?: %ExY)?')
+		flts = (self.filter, flt2)
+		try:
+			for flt in flts:
+				flt.addLogPath(filename, autoSeek=0)
+				flt.addFailRegex(r"(?:(?:Authentication failure|Failed [-/\w+]+) for(?: [iI](?:llegal|nvalid) user)?|[Ii](?:llegal|nvalid) user|ROOT LOGIN REFUSED) .*(?: from|FROM) <HOST>$")
+				# shared if more than one filter subscribed:
+				reader = flt._getSharedReader(flt.getLog(filename))
+				self.assertEqual(reader is not None, flt is flt2)
+			self.assertIs(self.filter._getSharedReader(self.filter.getLog(filename)), reader)
+			self.assertIn(reader, LogReaders.getReaders())
+			# count date parsing of lines:
+			calls = []
+			for dd in (reader.dateDetector, self.filter.dateDetector, flt2.dateDetector):
+				_org_matchTime = dd.matchTime
+				dd.matchTime = lambda line, _org_matchTime=_org_matchTime: (
+					calls.append(line), _org_matchTime(line))[1]
+			# both filters find failures, but lines are read and parsed once:
+			for flt in flts:
+				flt.getFailures(filename)
+				_assert_correct_last_attempt(self, flt, GetFailures.FAILURES_01)
+			with open(filename, 'rb') as f:
+				size, lines = os.fstat(f.fileno()).st_size, len(f.readlines())
+			self.assertEqual(len(calls), lines)
+			# each filter keeps own position:
+			self.assertEqual([flt.getLog(filename).getPos() for flt in flts], [size, size])
+			# not shared anymore if log removed from other filter:
+			flt2.delLogPath(filename)
+			self.assertFalse(reader.shared)
+			self.assertEqual(self.filter._getSharedReader(self.filter.getLog(filename)), None)
+		finally:
+			for flt in flts:
+				flt.delLogPath(filename)
+			_killfile(None, filename)
+		self.assertNotIn(reader, LogReaders.getReaders())
+
 	def testNLCharAsPartOfUniChar(self):
 		fname = tempfile.mktemp(prefix='tmp_fail2ban', suffix='uni')
 		# test two multi-byte encodings (both contains `\x0A` in either \x02\x0A or \x0A\x02):
@@ -1903,6 +2047,45 @@ class GetFailures(LogCaptureTestCase):
 		self.filter.getFailures(GetFailures.FILENAME_02)
 		_assert_correct_last_attempt(self, self.filter, output)
 
+	def testGetFailures02InWorker(self):
+		output = ('141.3.81.106', 4, 1124013539.0,
+				  ['Aug 14 11:%d:59 i60p295 sshd[12365]: Failed publickey for roehl from ::ffff:141.3.81.106 port 51332 ssh2'
+				   % m for m in (53, 54, 57, 58)])
+
+		# lines are matched in worker process, failures are added in main process:
+		pool = self.filter.procPool = FilterProcPool(1)
+		try:
+			self.filter.setMaxRetry(4)
+			self.filter.addLogPath(GetFailures.FILENAME_02, autoSeek=0)
+			self.filter.addFailRegex(r"Failed .* from <HOST>")
+			self.filter.getFailures(GetFailures.FILENAME_02)
+			_assert_correct_last_attempt(self, self.filter, output)
+			# worker died - restarted by next request (filter is recreated from config):
+			p = pool._workers[0][0]
+			p.kill(); p.wait()
+			fails, records, errors = pool.process(self.jail.name, self.filter._getWorkerConfig(), True,
+				['Aug 14 11:59:59 i60p295 sshd[12365]: Failed publickey for roehl from 192.0.2.1 port 51332 ssh2'])
+			self.assertEqual([(str(f[0]), f[1]) for f in fails], [('192.0.2.1', 1124013599.0)])
+			self.assertNotEqual(pool._workers[0][0], p)
+		finally:
+			pool.stop()
+
+	def testGetFailures02WorkerFailed(self):
+		output = ('141.3.81.106', 4, 1124013539.0)
+		# worker fails - the lines of batch are processed in filter thread:
+		class _FailedPool:
+			batchSize = 1000
+			def process(self, *args):
+				raise RuntimeError("Filter worker (pid 0) failed: EOFError()")
+		self.filter.procPool = _FailedPool()
+		self.filter.sleeptime = 0
+		self.filter.setMaxRetry(4)
+		self.filter.addLogPath(GetFailures.FILENAME_02, autoSeek=0)
+		self.filter.addFailRegex(r"Failed .* from <HOST>")
+		self.filter.getFailures(GetFailures.FILENAME_02)
+		self.assertLogged("Filter worker (pid 0) failed: EOFError(), processing")
+		_assert_correct_last_attempt(self, self.filter, output)
+
 	def testGetFailures03(self):
 		output = ('203.162.223.135', 6, 1124013600.0)
 
@@ -2056,6 +2239,101 @@ class GetFailures(LogCaptureTestCase):
 		self.filter.getFailures(GetFailures.FILENAME_02)
 		_assert_correct_last_attempt(self, self.filter, output)
 
+	def testGetFailuresMultiRegexSet(self):
+		self.filter.regexSet = True
+		self.testGetFailuresMultiRegex()
+		self.assertTrue(self.filter._getFailRegexSet())
+
+	def testGetFailuresRegexSetOrder(self):
+		self.filter.ignoreSelf = False
+		self.filter.regexSet = True
+		self.filter.addFailRegex(r"^user (?P<user>\S+) failed from <HOST>")
+		self.filter.addFailRegex(r"(?i)failed (?:from|by) <HOST>$")
+		self.filter.addFailRegex(r"^(?P<user>\S+) (?P=user) from <HOST>")
+		rs = self.filter._getFailRegexSet()
+		self.assertEqual(len(rs), 3)
+		for line, idx in (
+			('user test failed from 192.0.2.1', 0),
+			('some FAILED by 192.0.2.1', 1),
+			('xxx xxx from 192.0.2.1', 2),
+			('xxx yyy from 192.0.2.1', None),
+		):
+			self.assertEqual(rs.search(line + "\n"), idx is not None)
+			ret = self.filter.processLine(('', '', line), MyTime.time())
+			self.assertEqual([r[0] for r in ret], [idx] if idx is not None else [])
+			self.assertEqual([str(r[1]) for r in ret], ['192.0.2.1'] if idx is not None else [])
+		# numbered back-reference is not combinable - fallback to sequential search:
+		self.filter.addFailRegex(r"^(\S+) \1 by <HOST>")
+		self.assertFalse(self.filter._getFailRegexSet())
+		self.assertLogged("Cannot combine failregex to set")
+		ret = self.filter.processLine(('', '', 'xxx xxx by 192.0.2.1'), MyTime.time())
+		self.assertEqual([r[0] for r in ret], [3])
+		# delete and check rebuild:
+		self.filter.delFailRegex(3)
+		self.assertTrue(self.filter._getFailRegexSet())
+		self.filter.regexSet = False
+		self.assertFalse(self.filter._getFailRegexSet())
+
+	def testRegexRequiredLiteral(self):
+		for regex, lit in (
+			(r'^Failed password for <F-USER>\S+</F-USER> from <HOST>', 'Failed password for '),
+			(r'(?:foo|bar) authentication failure; <HOST>', ' authentication failure; '),
+			(r'^(?:a|b)+ x(?i:ABCDEF)(?: yy)+ <HOST>', ' yy'),
+			(r'^(?:conn|user) (?:closed|failed)? by <HOST>', ' by '),
+			(r'(?i)failed for <HOST>', None),
+			(r'^(?:failed|error) <HOST>', None),
+			(r'(?:failed from)? <HOST>', None),
+		):
+			self.assertEqual(FailRegex(regex)._literal, lit)
+		# pre-filter rejects buffer without literal, but matches the same as without:
+		regex = FailRegex(r'(?:failed|refused) for (?P<user>\S+) from <HOST>')
+		self.assertEqual(regex._literal, ' from ')
+		regex.search([('', '', 'failed for test at 192.0.2.1')])
+		self.assertFalse(regex.hasMatched())
+		regex.search([('', '', 'failed for test from 192.0.2.1')])
+		self.assertTrue(regex.hasMatched())
+		self.assertEqual(regex.getGroups()['user'], 'test')
+		# ignoreregex uses it too:
+		self.filter.ignoreSelf = False
+		self.filter.addIgnoreRegex(r'for \S+ from <HOST> port 22$')
+		self.filter.addFailRegex(r'failed for \S+ from <HOST>')
+		self.assertEqual(self.filter.processLine(('', '', 'failed for test from 192.0.2.1 port 22'), MyTime.time()), [])
+		self.assertEqual(len(self.filter.processLine(('', '', 'failed for test from 192.0.2.1 port 2222'), MyTime.time())), 1)
+
+	def testTupleLinesBuf(self):
+		lines = [('', 'date %d' % i, ' line %d' % i) for i in range(5)]
+		buf = TupleLinesBuf(3)
+		for i, v in enumerate(lines):
+			buf.append(v)
+			exp = lines[max(0, i-2):i+1]
+			self.assertEqual(buf.lines, exp)
+			self.assertEqual(buf.buf, Regex._tupleLinesBuf(exp))
+		# lines of match are found by line ends (same as by count of newlines):
+		regex = Regex(r'line 3\n[^\n]* line 4')
+		regex.search(buf)
+		self.assertTrue(regex.hasMatched())
+		self.assertEqual(regex.getMatchedTupleLines(), lines[3:5])
+		self.assertEqual(regex.getUnmatchedTupleLines(), lines[2:3])
+		orgLines = buf.lines
+		regex.search(Regex._tupleLinesBuf(orgLines), orgLines)
+		self.assertEqual(regex.getMatchedTupleLines(), lines[3:5])
+		# replace (e. g. by unmatched lines), list of lines is not changed in-place:
+		buf.set(regex.getUnmatchedTupleLines())
+		self.assertEqual(buf.buf, ' line 2\n')
+		buf.append(lines[0])
+		self.assertEqual(buf.lines, [lines[2], lines[0]])
+		self.assertEqual(orgLines, lines[2:5])
+		regex = Regex(r'line 0')
+		regex.search(buf)
+		self.assertEqual(regex.getMatchedTupleLines(), [lines[0]])
+		self.assertEqual(regex.getUnmatchedTupleLines(), [lines[2]])
+		# single line buffer:
+		buf = TupleLinesBuf()
+		for v in lines:
+			buf.append(v)
+			self.assertEqual(buf.lines, [v])
+			self.assertEqual(buf.buf, "".join(v[::2]) + "\n")
+
 	def testGetFailuresIgnoreRegex(self):
 		self.filter.addLogPath(GetFailures.FILENAME_02, autoSeek=False)
 		self.filter.addFailRegex(r"Failed .* from <HOST>")
@@ -2098,6 +2376,15 @@ class GetFailures(LogCaptureTestCase):
 
 		self.assertRaises(FailManagerEmpty, self.filter.failManager.toBan)
 
+	def testGetFailuresIgnoreRegexSet(self):
+		self.filter.regexSet = True
+		self.testGetFailuresIgnoreRegex()
+
+	def testGetFailuresMultiLineMultiRegexSet(self):
+		self.filter.regexSet = True
+		self.testGetFailuresMultiLineMultiRegex()
+		self.assertTrue(self.filter._getFailRegexSet())
+
 	def testGetFailuresMultiLineMultiRegex(self):
 		output = [
 			("192.0.43.10", 1, 1124013598.0),
@@ -2164,6 +2451,31 @@ class DNSUtilsTests(unittest.TestCase):
 		# here the whole cache should be empty:
 		self.assertEqual(len(c), 0)
 		
+	def testCacheLRU(self):
+		c = Utils.Cache(maxCount=3, maxTime=60)
+		for i in range(3):
+			c.set(i, i)
+		# get refreshes recency, so least recently used (1) is removed:
+		self.assertEqual(c.get(0), 0)
+		c.set(3, 3)
+		self.assertEqual([c.get(i, -1) for i in range(4)], [0, -1, 2, 3])
+		# set of existing key refreshes it too:
+		c.set(0, 10)
+		c.set(4, 4)
+		self.assertEqual([c.get(i, -1) for i in (0, 2, 3, 4)], [10, -1, 3, 4])
+		st = dict(c.stats)
+		self.assertEqual((st["Size"], st["Hits"], st["Misses"], st["Evictions"]), (3, 7, 2, 2))
+		# shrink by options:
+		c.setOptions(maxCount=1, maxTime=60)
+		self.assertEqual(len(c), 1)
+		self.assertEqual(c.get(4), 4)
+		# named caches are registered:
+		c = Utils.Cache(name='test-lru')
+		try:
+			self.assertIs(Utils.Cache.named['test-lru'], c)
+		finally:
+			del Utils.Cache.named['test-lru']
+
 	def testOverflowedIPCache(self):
 		# test overflow of IP-cache multi-threaded (2 "parasite" threads flooding cache):
 		from threading import Thread
@@ -2171,6 +2483,8 @@ class DNSUtilsTests(unittest.TestCase):
 		# save original cache and use smaller cache during the test here:
 		_org_cache = IPAddr.CACHE_OBJ
 		cache = IPAddr.CACHE_OBJ = Utils.Cache(maxCount=5, maxTime=60)
+		_org_intern_max = IPAddr.INTERN_MAX
+		IPAddr.INTERN_MAX = 5
 		result = list()
 		count = 1 if unittest.F2B.fast else 50
 		try:
@@ -2185,6 +2499,8 @@ class DNSUtilsTests(unittest.TestCase):
 						for i in s:
 							IPAddr('192.0.2.'+str(i), IPAddr.FAM_IPv4)
 							IPAddr('2001:db8::'+str(i), IPAddr.FAM_IPv6)
+							IPAddr('192.0.2.'+str(i))
+							IPAddr('2001:db8::'+str(i))
 					result.append(None)
 				except Exception as e:
 					DefLogSys.debug(e, exc_info=True)
@@ -2200,9 +2516,148 @@ class DNSUtilsTests(unittest.TestCase):
 			th1.join()
 			th2.join()
 			IPAddr.CACHE_OBJ = _org_cache
+			IPAddr.INTERN_MAX = _org_intern_max
 		self.assertEqual(result, [None]*3) # no errors
 		self.assertTrue(len(cache) <= cache.maxCount)
-
+		for tab in IPAddr._INTERN.values():
+			self.assertTrue(len(tab) <= 5)
+
+	def testIPAddrInterned(self):
+		# addresses of known family (ip4/ip6 groups of failregex) are interned:
+		ip = IPAddr('192.0.2.1', IPAddr.FAM_IPv4)
+		self.assertIs(IPAddr('192.0.2.1', IPAddr.FAM_IPv4), ip)
+		self.assertIs(IPAddr._INTERN[IPAddr.FAM_IPv4]['192.0.2.1'], ip)
+		self.assertEqual(ip, IPAddr('192.0.2.1'))
+		self.assertEqual(hash(ip), hash('192.0.2.1'))
+		self.assertEqual((ip.family, ip.addr, ip.plen), (socket.AF_INET, 0xC0000201, 32))
+		# IPv4-mapped IPv6 is IPv4:
+		ip = IPAddr('::ffff:192.0.2.1', IPAddr.FAM_IPv6)
+		self.assertTrue(ip.isIPv4)
+		self.assertEqual(ip.ntoa, '192.0.2.1')
+		ip = IPAddr('2001:DB8::1', IPAddr.FAM_IPv6)
+		self.assertEqual((ip.family, ip.addr), (socket.AF_INET6, 0x20010DB8 << 96 | 1))
+		self.assertEqual(str(ip), '2001:db8::1')
+		# invalid address is not valid IP:
+		self.assertFalse(IPAddr('192.0.2.256', IPAddr.FAM_IPv4).isValid)
+
+	def testDNSResolverPool(self):
+		from threading import Event
+		calls = []
+		release = Event()
+		def resolve(key): # stub resolver
+			calls.append(key)
+			if key.startswith('slow'): release.wait(5)
+			if key.startswith('err'): raise socket.error('stub resolver failed')
+			return set() if key.startswith('none') else set([key.split('.')[0]])
+		pool = DNSResolverPool(workers=2, timeout=0.1)
+		cache = Utils.Cache(maxCount=10, maxTime=60)
+		try:
+			# resolved in time and cached afterwards:
+			self.assertEqual(pool.lookup(resolve, cache, 'a.example'), set(['a']))
+			self.assertEqual(pool.lookup(resolve, cache, 'a.example'), set(['a']))
+			self.assertEqual(cache.get('a.example'), set(['a']))
+			# negative results (nothing resolved or failed) are cached in pool only:
+			self.assertEqual(pool.lookup(resolve, cache, 'none.example'), set())
+			self.assertEqual(pool.lookup(resolve, cache, 'none.example'), set())
+			self.assertEqual(pool.lookup(resolve, cache, 'err.example'), None)
+			self.assertEqual(pool.lookup(resolve, cache, 'err.example'), None)
+			self.assertEqual(cache.get('none.example'), None)
+			self.assertEqual(calls, ['a.example', 'none.example', 'err.example'])
+			# deferred lookups of the same key are deduplicated:
+			res = []
+			cb = lambda key, v: res.append((key, v))
+			self.assertEqual(pool.lookup(resolve, cache, 'slow.example', cb), None)
+			self.assertEqual(pool.lookup(resolve, cache, 'slow.example', cb), None)
+			# deadline exceeded - waiting caller and deferred callbacks are released:
+			self.assertEqual(pool.lookup(resolve, cache, 'slow.example'), None)
+			self.assertTrue(Utils.wait_for(lambda: len(res) == 2, 2))
+			self.assertEqual(res, [('slow.example', None)] * 2)
+			# resolved later - result is cached, resolver called once:
+			release.set()
+			self.assertTrue(Utils.wait_for(lambda: cache.get('slow.example'), 2))
+			self.assertEqual(pool.lookup(resolve, cache, 'slow.example'), set(['slow']))
+			self.assertEqual(calls.count('slow.example'), 1)
+		finally:
+			release.set()
+			pool.stop()
+
+	def testFilterDeferredDNS(self):
+		from threading import Event
+		release = Event()
+		def resolve(dns): # stub resolver
+			release.wait(5)
+			return set([IPAddr('192.0.2.10')]) if dns == 'good.example' else set()
+		orgResolve = DNSUtils._dnsToIp
+		DNSUtils._dnsToIp = staticmethod(resolve)
+		DNSUtils.setResolverOptions(workers=2)
+		try:
+			filter_ = Filter(DummyJail(), useDns='yes')
+			filter_.ignoreSelf = False
+			filter_.addFailRegex(r'^failure from <HOST>$')
+			# failures are deferred, filter continues with next lines:
+			for dns in ('good.example', 'bad.example', 'good.example'):
+				filter_.processLineAndAdd('failure from ' + dns)
+			self.assertEqual(filter_.failManager.size(), 0)
+			release.set()
+			self.assertTrue(Utils.wait_for(lambda: len(filter_._dnsDeferred) == 3, 2))
+			# added with next line (or service tasks) as soon as resolved:
+			filter_.processLineAndAdd('some other line')
+			self.assertEqual(filter_.failManager.size(), 1)
+			self.assertEqual(filter_.failManager.getFailTotal(), 2)
+			self.assertEqual(len(filter_._dnsDeferred), 0)
+		finally:
+			release.set()
+			DNSUtils._dnsToIp = orgResolve
+			DNSUtils.setResolverOptions(workers=0)
+			DNSUtils.CACHE_nameToIp.unset('good.example')
+
+
+	def testFilterIgnoreDNSDeadline(self):
+		def resolve(dns): # stub resolver (slower than deadline)
+			time.sleep(0.2)
+			return set([IPAddr('198.51.100.10')]) if dns == 'good.example' else set()
+		orgResolve = DNSUtils._dnsToIp
+		DNSUtils._dnsToIp = staticmethod(resolve)
+		DNSUtils.setResolverOptions(workers=2, timeout=0.05)
+		try:
+			filter_ = Filter(DummyJail())
+			filter_.ignoreSelf = False
+			filter_.ignoreCache = {"key": "<ip>"}
+			filter_.addIgnoreIP('good.example')
+			# deadline exceeded - ignore check is not affected (resolved synchronously):
+			self.assertTrue(filter_.inIgnoreIPList(IPAddr('198.51.100.10')))
+			self.assertFalse(filter_.inIgnoreIPList(IPAddr('198.51.100.11')))
+			self.assertTrue(filter_.inIgnoreIPList(IPAddr('198.51.100.10')))
+		finally:
+			DNSUtils._dnsToIp = orgResolve
+			DNSUtils.setResolverOptions(workers=0, timeout=5)
+			DNSUtils.CACHE_nameToIp.unset('good.example')
+
+	def testIpToNameDeadline(self):
+		# (not precached addresses, see utils.initTests)
+		calls = []
+		def resolve(ip): # stub resolver (slower than deadline)
+			calls.append(ip)
+			time.sleep(0.2)
+			return 'host.example' if ip == '233.252.0.10' else None
+		orgResolve = DNSUtils._ipToName
+		DNSUtils._ipToName = staticmethod(resolve)
+		DNSUtils.setResolverOptions(workers=2, timeout=0.05)
+		try:
+			# deadline exceeded - resolved synchronously and cached:
+			self.assertEqual(DNSUtils.ipToName('233.252.0.10'), 'host.example')
+			self.assertEqual(DNSUtils.CACHE_ipToName.get('233.252.0.10'), 'host.example')
+			self.assertEqual(DNSUtils.ipToName('233.252.0.10'), 'host.example')
+			# negative result is cached too (no further lookup):
+			self.assertEqual(DNSUtils.ipToName('233.252.0.11'), None)
+			cnt = len(calls)
+			self.assertEqual(DNSUtils.ipToName('233.252.0.11'), None)
+			self.assertEqual(len(calls), cnt)
+		finally:
+			DNSUtils._ipToName = orgResolve
+			DNSUtils.setResolverOptions(workers=0, timeout=5)
+			DNSUtils.CACHE_ipToName.unset('233.252.0.10')
+			DNSUtils.CACHE_ipToName.unset('233.252.0.11')
 
 class DNSUtilsNetworkTests(unittest.TestCase):
 
@@ -2540,6 +2995,53 @@ class DNSUtilsNetworkTests(unittest.TestCase):
 					DNSUtils.CACHE_nameToIp.unset(DNSUtils._getSelfIPs_key)
 					DNSUtils.CACHE_nameToIp.unset(DNSUtils._getNetIntrfIPs_key)
 
+	def test_IPAddrTrie(self):
+		nets = [IPAddr(n) for n in (
+			'192.0.2.0/24', '192.0.2.128/25', '198.51.100.7/32', '10.0.0.0/8', '10.1.0.0/16',
+			'2001:db8::/32', '2001:db8:1::/48', '::1/128'
+		)]
+		trie = IPAddrTrie(nets)
+		# networks covered by shorter network are not stored:
+		self.assertEqual(len(trie), 5)
+		for ip in ('192.0.2.0', '192.0.2.255', '192.0.3.0', '198.51.100.7', '198.51.100.8',
+			'10.255.0.1', '11.0.0.1', '2001:db8:ffff::1', '2001:db9::', '::1', '::2', '127.0.0.1'
+		):
+			ip = IPAddr(ip)
+			self.assertEqual(ip in trie, any(ip.isInNet(n) for n in nets), ip)
+		# shorter network added after longer one:
+		trie = IPAddrTrie([IPAddr('192.0.2.128/25'), IPAddr('192.0.2.0/24'), IPAddr('0.0.0.0/0')])
+		self.assertEqual(len(trie), 1)
+		self.assertTrue(IPAddr('203.0.113.1') in trie)
+		self.assertFalse(IPAddr('2001:db8::1') in trie)
+		self.assertFalse(IPAddr('192.0.2.1') in IPAddrTrie())
+		# index of set is rebuilt by modification:
+		ips = IPAddrSet([IPAddr('192.0.2.0/27')])
+		self.assertFalse(IPAddr('192.0.2.33') in ips)
+		ips.add('192.0.2.32/27')
+		self.assertTrue(IPAddr('192.0.2.33') in ips)
+		ips.remove(IPAddr('192.0.2.32/27'))
+		self.assertFalse(IPAddr('192.0.2.33') in ips)
+		ips |= IPAddrSet(['192.0.2.0/26'])
+		self.assertTrue(IPAddr('192.0.2.33') in ips)
+		ips -= IPAddrSet(['192.0.2.0/26'])
+		self.assertFalse(IPAddr('192.0.2.33') in ips)
+		self.assertTrue(IPAddr('192.0.2.5') in ips)
+		ips ^= IPAddrSet(['192.0.2.32/27'])
+		self.assertTrue(IPAddr('192.0.2.33') in ips)
+		ips &= IPAddrSet(['192.0.2.0/27'])
+		self.assertFalse(IPAddr('192.0.2.33') in ips)
+		self.assertTrue(IPAddr('192.0.2.5') in ips)
+		ips.symmetric_difference_update([IPAddr('192.0.2.32/27')])
+		self.assertTrue(IPAddr('192.0.2.33') in ips)
+		ips.intersection_update([IPAddr('192.0.2.32/27')])
+		self.assertFalse(IPAddr('192.0.2.5') in ips)
+		ips.difference_update([IPAddr('192.0.2.32/27')])
+		self.assertFalse(IPAddr('192.0.2.33') in ips)
+		ips.add('192.0.2.0/24')
+		self.assertTrue(IPAddr('192.0.2.5') in ips)
+		ips.pop()
+		self.assertFalse(IPAddr('192.0.2.5') in ips)
+
 	def test_FileIPAddrSet(self):
 		fname = os.path.join(TEST_FILES_DIR, "test-ign-ips-file")
 		ips = DNSUtils.getIPsFromFile(fname)
@@ -2616,6 +3118,135 @@ class DNSUtilsNetworkTests(unittest.TestCase):
 		self.assertIn(getfqdn('as112.arpa.'), ('as112.arpa.', 'as112.arpa'))
 
 
+class SyslogFilter(LogCaptureTestCase):
+
+	def setUp(self):
+		super(SyslogFilter, self).setUp()
+		self.filters = []
+
+	def tearDown(self):
+		for flt in self.filters:
+			flt.stop()
+			flt.join()
+		super(SyslogFilter, self).tearDown()
+
+	def _createFilter(self, flt=None, **kwargs):
+		if flt is None:
+			flt = FilterSyslog(DummyJail(), **kwargs)
+		flt.addFailRegex(r"Failed .* from <HOST>")
+		flt.setMaxRetry(100)
+		self.filters.append(flt)
+		return flt
+
+	def _waitFailures(self, flt, count):
+		return Utils.wait_for(lambda: flt.failManager.getFailTotal() >= count,
+			unittest.F2B.maxWaitTime(5))
+
+	@staticmethod
+	def _freePort(type_):
+		s = socket.socket(socket.AF_INET, type_)
+		try:
+			s.bind(('127.0.0.1', 0))
+			return s.getsockname()[1]
+		finally:
+			s.close()
+
+	def testParseSyslogMessage(self):
+		now = MyTime.time()
+		# local socket (glibc syslog, without hostname):
+		fac, sev, tm, host, tag, pid, msg = parseSyslogMessage(
+			'<38>Oct 17 05:50:54 sshd[123]: Failed password', now)
+		self.assertEqual((fac, sev, host, tag, pid, msg), (4, 6, None, 'sshd', '123', 'Failed password'))
+		self.assertEqual(time.localtime(tm)[1:6], (10, 17, 5, 50, 54))
+		self.assertTrue(tm <= now + 86400)
+		# RFC 3164 with hostname (day padded with space), without pid:
+		self.assertEqual(parseSyslogMessage('<86>Oct  7 05:50:54 srv su: msg', now)[3:],
+			('srv', 'su', None, 'msg'))
+		# RFC 5424 with structured data and BOM:
+		self.assertEqual(parseSyslogMessage(
+			'<165>1 2003-10-11T22:14:15.003Z host.example.com evntslog - ID47 '
+			'[exampleSDID@32473 iut="3" eventSource="App]"] \ufeffAn event', now),
+			(20, 5, 1065910455.003, 'host.example.com', 'evntslog', None, 'An event'))
+		self.assertEqual(parseSyslogMessage(
+			'<34>1 2003-10-11T22:14:15+02:00 - su 12 - - msg', now),
+			(4, 2, 1065903255, None, 'su', '12', 'msg'))
+		# without header (and invalid time) - receive time:
+		self.assertEqual(parseSyslogMessage('plain message', now), (1, 5, now, None, None, None, 'plain message'))
+		self.assertEqual(parseSyslogMessage('<34>1 - - - - - - msg', now), (4, 2, now, None, None, None, 'msg'))
+
+	@with_tmpdir
+	def testSyslogUnixRouting(self, tmp):
+		path = os.path.join(tmp, 'syslog.sock')
+		listen = 'unix:' + path
+		f1 = self._createFilter(listen=listen, program='sshd')
+		f2 = self._createFilter(listen=listen, facility='mail, 3')
+		# both filters share single listener:
+		self.assertIs(f1.listener, f2.listener)
+		self.assertEqual(SyslogListeners.getListeners(), [f1.listener])
+		f1.start()
+		f2.start()
+		s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+		try:
+			for msg in (
+				'<38>Oct 17 05:50:54 sshd[1]: Failed password from 198.51.100.1',   # auth, sshd -> f1
+				'<22>Oct 17 05:50:54 postfix[2]: Failed auth from 198.51.100.2',     # mail -> f2
+				'<30>Oct 17 05:50:54 other[3]: Failed auth from 198.51.100.3',       # daemon -> f2
+				'<38>Oct 17 05:50:54 other[4]: Failed auth from 198.51.100.4',       # auth, other -> none
+			):
+				s.sendto(msg.encode(), path)
+		finally:
+			s.close()
+		self.assertTrue(self._waitFailures(f1, 1))
+		self.assertTrue(self._waitFailures(f2, 2))
+		self.assertEqual(f1.failManager.getFailTotal(), 1)
+		self.assertEqual(sorted(t.getID() for t in f2.failManager._FailManager__failList.values()),
+			['198.51.100.2', '198.51.100.3'])
+		self.assertLogged("Found 198.51.100.1", "Found 198.51.100.3", all=True)
+		self.assertNotLogged("Found 198.51.100.4")
+		self.assertIn(("Syslog listen", [listen]), f1.status())
+		# listener stops (and removes its socket) if the last filter gets stopped:
+		listener = f1.listener
+		f1.stop(); f1.join()
+		self.assertTrue(listener.is_alive())
+		f2.stop(); f2.join()
+		self.assertFalse(listener.is_alive())
+		self.assertFalse(os.path.exists(path))
+		self.assertEqual(SyslogListeners.getListeners(), [])
+
+	def testSyslogUDP(self):
+		port = self._freePort(socket.SOCK_DGRAM)
+		jail = Jail('test-syslog', backend='syslog[listen="udp:127.0.0.1:%d", program=sshd]' % port)
+		flt = self._createFilter(jail.filter)
+		self.assertIsInstance(flt, FilterSyslog)
+		flt.start()
+		s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		try:
+			for i in range(1, 11):
+				s.sendto(('<38>1 2026-10-17T05:50:54Z host sshd %d - - Failed password from 198.51.100.%d' % (i, i)).encode(),
+					('127.0.0.1', port))
+		finally:
+			s.close()
+		self.assertTrue(self._waitFailures(flt, 10))
+		self.assertLogged("Found 198.51.100.10")
+
+	def testSyslogTCP(self):
+		port = self._freePort(socket.SOCK_STREAM)
+		flt = self._createFilter(listen='tcp:127.0.0.1:%d' % port)
+		flt.start()
+		s = socket.create_connection(('127.0.0.1', port))
+		try:
+			msg = b'<38>Oct 17 05:50:54 host sshd[1]: Failed password from 198.51.100.3'
+			# new line delimited (split over several sends) and octet counted frames:
+			s.sendall(b'<38>Oct 17 05:50:54 host sshd[1]: Failed pass')
+			time.sleep(0.05)
+			s.sendall(b'word from 198.51.100.1\n<38>Oct 17 05:50:54 host sshd[1]: Failed password from 198.51.100.2\r\n')
+			s.sendall(b'%d %s' % (len(msg), msg))
+		finally:
+			s.close()
+		self.assertTrue(self._waitFailures(flt, 3))
+		self.assertLogged("Found 198.51.100.1", "Found 198.51.100.2", "Found 198.51.100.3", all=True)
+
+
 class JailTests(unittest.TestCase):
 
 	def testSetBackend_gh83(self):
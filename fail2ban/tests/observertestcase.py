@@ -568,6 +568,44 @@ class BanTimeIncrDB(LogCaptureTestCase):
 		# stop observer
 		obs.stop()
 
+	def testObserverFailuresBatch(self):
+		if Fail2BanDb is None: # pragma: no cover
+			return
+		jail = self.jail = DummyJail(backend='polling')
+		jail.database = self.db
+		self.db.addJail(jail)
+		jail.setBanTimeExtra('increment', 'true')
+		obs = self.Observer
+		stime = int(MyTime.time())
+		# make 2 from 3 ips bad (banned before):
+		for ip, cnt in (('192.0.2.1', 1), ('192.0.2.2', 4)):
+			ticket = FailTicket(ip, stime-600, [])
+			ticket.setBanCount(cnt)
+			self.db.addBan(jail, ticket)
+		bans = self.db.getBanMany(['192.0.2.1', '192.0.2.2', '192.0.2.3'], jail)
+		self.assertEqual(sorted(bans.keys()), ['192.0.2.1', '192.0.2.2'])
+		self.assertEqual(bans['192.0.2.2'][0], 4)
+		# subsequent failures of same jail are coalesced (observer is not started, so pop it manually):
+		failManager = jail.filter.failManager = FailManager()
+		failManager.setMaxRetry(3)
+		tickets = [FailTicket(ip, stime, []) for ip in ('192.0.2.1', '192.0.2.2', '192.0.2.3')]
+		for ticket in tickets:
+			failManager.addFailure(ticket)
+			obs.add_wn('failureFound', jail, ticket)
+		obs.add_wn('nop')
+		self.assertEqual(len(obs), 4)
+		ev = obs._popEvent()
+		self.assertEqual(ev[0], 'failuresFound')
+		self.assertEqual(ev[2], tickets)
+		self.assertEqual(list(obs), [('nop',)])
+		# check all tickets with single database query:
+		obs.failuresFound(*ev[1:])
+		self.assertLogged(
+			"Found 192.0.2.1, bad", "Found 192.0.2.2, bad - ", ", Ban", all=True)
+		self.assertNotLogged("Found 192.0.2.3")
+		self.assertEqual(dict(obs.status)["Coalesced failures"], 3)
+
+
 class ObserverTest(LogCaptureTestCase):
 
 	def setUp(self):
@@ -609,6 +647,76 @@ class ObserverTest(LogCaptureTestCase):
 		obs.stop()
 		obs = None
 
+	def testObserverQueue(self):
+		obs = ObserverThread()
+		jail = DummyJail()
+		# observer is not started, so events remain in queue:
+		obs.add_wn('call', lambda: ())
+		obs.add_wn('failureFound', jail, FailTicket('192.0.2.1', 0))
+		obs.add_wn('db_purge')
+		obs.add_wn(obs.prolongBan, None, jail)
+		obs.add_wn('failureFound', DummyJail(), FailTicket('192.0.2.2', 0))
+		self.assertEqual(len(obs), 5)
+		st = dict(obs.status)
+		self.assertEqual(st["Queue depth"], 5)
+		self.assertEqual(st["Control events"], 2)
+		# control events first, bulk events in order of addition (failures of other jail are not coalesced):
+		self.assertEqual(obs[0], ('db_purge',))
+		self.assertEqual(obs[1][0], obs.prolongBan)
+		self.assertEqual([obs._popEvent()[0] for _ in range(5)],
+			['db_purge', obs.prolongBan, 'call', 'failureFound', 'failureFound'])
+		self.assertEqual(obs._popEvent(), None)
+		self.assertFalse(obs.is_full)
+		st = dict(obs.status)
+		self.assertEqual(st["Queue depth"], 0)
+		self.assertEqual(st["Processed events"], 5)
+		self.assertEqual(st["Coalesced failures"], 0)
+		self.assertTrue(st["Max latency"] >= st["Avg latency"] >= 0)
+		# delete by index:
+		obs.add_wn('nop')
+		obs.add_wn('db_purge')
+		del obs[0]
+		self.assertEqual(list(obs), [('nop',)])
+
+	def testObserverTimers(self):
+		obs = ObserverThread()
+		o = []
+		# observer is not started - timers wait in heap (no threads):
+		t1 = obs.add_timer(0.001, 'call', o.append, 1)
+		t2 = obs.add_timer(60, 'call', o.append, 2)
+		obs.add_named_timer('T', 60, 'call', o.append, 3)
+		# named timer replaces previous one with same name:
+		obs.add_named_timer('T', 0.001, 'call', o.append, 4)
+		self.assertEqual(dict(obs.status)["Timers"], 3)
+		# cancel by timer and by name:
+		self.assertTrue(obs.cancel_timer(t2))
+		self.assertFalse(obs.cancel_timer(t2))
+		self.assertFalse(obs.cancel_timer('unknown'))
+		self.assertEqual(dict(obs.status)["Timers"], 2)
+		# fire due timers into queue:
+		self.assertTrue(Utils.wait_for(lambda: obs._fireTimers() or len(obs) == 2, 1))
+		self.assertEqual(list(obs), [('call', o.append, 1), ('call', o.append, 4)])
+		self.assertFalse(obs.cancel_timer(t1))
+		self.assertFalse(obs.cancel_timer('T'))
+		st = dict(obs.status)
+		self.assertEqual(st["Timers"], 0)
+		self.assertEqual(st["Fired timers"], 2)
+		self.assertTrue(st["Max timer lateness"] >= st["Timer lateness"] >= 0)
+		# nothing to wait for (sleeps up to sleeptime):
+		self.assertEqual(obs._timerWait(), obs.sleeptime)
+		# started observer wakes up exactly for timers:
+		obs.sleeptime = 10
+		obs.start()
+		try:
+			obs.wait_empty(1)
+			self.assertEqual(o, [1, 4])
+			obs.add_named_timer('T', 0.05, 'call', o.append, 5)
+			obs.add_timer(0.01, 'call', o.append, 6)
+			self.assertTrue(Utils.wait_for(lambda: len(o) == 4, 2))
+			self.assertEqual(o, [1, 4, 6, 5])
+		finally:
+			obs.stop()
+
 	class _BadObserver(ObserverThread):
 		def run(self):
 			raise RuntimeError('run bad thread exception')
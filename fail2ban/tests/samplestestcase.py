@@ -138,7 +138,59 @@ class FilterSamplesRegex(unittest.TestCase):
 	@staticmethod
 	def _filterOptions(opts):
 				return dict((k, v) for k, v in opts.items() if not k.startswith('test.'))
-		
+
+	def testRegexSetBenchmark(self):
+		"""Compare (and benchmark) sequential and combined failregex search using sample logs"""
+		def _newFilter(name, regexSet):
+			flt = Filter(None)
+			flt.returnRawHost = True
+			flt.checkFindTime = False
+			flt.active = True
+			flt.regexSet = regexSet
+			filterConf = FilterReader(name, "jail", {},
+				basedir=CONFIG_DIR, share_config=unittest.F2B.share_config)
+			filterConf.read()
+			filterConf.getOptions({})
+			for opt in filterConf.convert():
+				for optval in (opt[3] if opt[0] == 'multi-set' else [opt[3]]):
+					if opt[2] == "prefregex":
+						flt.prefRegex = optval
+					elif opt[2] == "addfailregex":
+						flt.addFailRegex(optval)
+					elif opt[2] == "addignoreregex":
+						flt.addIgnoreRegex(optval)
+					elif opt[2] == "maxlines":
+						flt.setMaxLines(optval)
+					elif opt[2] == "datepattern":
+						flt.setDatePattern(optval)
+			return flt
+		# own samples (mostly matching) mixed with samples of other filter (mostly foreign lines),
+		# similar to real logs where the most lines match no failregex:
+		stats = [0, 0, 0.0, 0.0]
+		prevLines = []
+		for name in sorted(os.listdir(os.path.join(CONFIG_DIR, "filter.d"))):
+			if not name.endswith('.conf') or name.endswith('common.conf'):
+				continue
+			name = name.rpartition(".")[0]
+			fname = os.path.join(TEST_FILES_DIR, "logs", name)
+			if not os.path.isfile(fname): # pragma: no cover
+				continue
+			with open(fname, encoding='utf-8') as f:
+				lines = [l.rstrip('\r\n') for l in f if l.strip() and not l.startswith('#')]
+			lines, prevLines = lines + prevLines, lines
+			res = []
+			for i, regexSet in enumerate((False, True)):
+				flt = _newFilter(name, regexSet)
+				stime = time.perf_counter()
+				res.append([[(r[0], str(r[1]), r[2]) for r in flt.processLine(l)] for l in lines])
+				stats[2+i] += time.perf_counter() - stime
+			self.assertEqual(res[0], res[1], "%s: results of combined failregex differ" % name)
+			stats[0] += 1
+			stats[1] += len(lines)
+		self.assertTrue(stats[0] >= 10)
+		if unittest.F2B.verbosity > 1: # pragma: no cover
+			print("\n  regexset benchmark: %d filters, %d lines, sequential %.3fs, combined %.3fs" % tuple(stats))
+
 def testSampleRegexsFactory(name, basedir):
 	def testFilter(self):
 
@@ -33,11 +33,13 @@ import sys
 import platform
 
 from ..server.failregex import Regex, FailRegex, RegexException
+from ..server.filterproc import FilterProcPool
 from ..server import actions as _actions
 from ..server.server import Server
 from ..server.ipdns import DNSUtils, IPAddr
 from ..server.jail import Jail
 from ..server.jailthread import JailThread
+from ..server.observer import Observers, ObserverThread
 from ..server.ticket import BanTicket
 from ..server.utils import Utils
 from .dummyjail import DummyJail
@@ -174,6 +176,43 @@ class Transmitter(TransmitterBase):
 	def testVersion(self):
 		self.assertEqual(self.transm.proceed(["version"]), (0, version.version))
 
+	def testCache(self):
+		cache = Utils.Cache.named['datepattern']
+		org = cache.maxCount, cache.maxTime
+		try:
+			self.assertEqual(self.transm.proceed(["set", "cache", {"datepattern": "500 10m"}]), (0, None))
+			self.assertEqual(self.transm.proceed(["get", "cache"])[1]["datepattern"], "500 600")
+			self.assertEqual(self.transm.proceed(["set", "cache", {"datepattern": "400"}]), (0, None))
+			self.assertEqual((cache.maxCount, cache.maxTime), (400, 600))
+			self.assertEqual(self.transm.proceed(["set", "cache", {"unknown": "10"}])[0], 1)
+		finally:
+			cache.setOptions(*org)
+		stats = dict(self.transm.proceed(["get", "cache-stats"])[1])
+		self.assertIn("Hits", dict(stats["ip"]))
+		self.assertEqual(self.transm.proceed(["get", self.jailName, "cache-stats"]), (0, []))
+		self.server.setIgnoreCache(self.jailName, "key=\"<ip>\"")
+		stats = dict(self.transm.proceed(["get", self.jailName, "cache-stats"])[1])
+		self.assertEqual(dict(stats["ignore"])["Max count"], 100)
+
+	def testDNSResolverOptions(self):
+		try:
+			self.assertEqual(self.transm.proceed(["set", "thread", {"dnsthreads": 2, "dnstimeout": "3"}]), (0, None))
+			opts = self.transm.proceed(["get", "thread"])[1]
+			self.assertEqual((opts["dnsthreads"], opts["dnstimeout"]), (2, 3))
+			self.assertEqual(DNSUtils.Resolver.timeout, 3)
+		finally:
+			DNSUtils.setResolverOptions(0, 5)
+		self.assertEqual(DNSUtils.Resolver, None)
+
+	def testObserverStatus(self):
+		prev, Observers.Main = Observers.Main, None
+		try:
+			self.assertEqual(self.transm.proceed(["get", "observer"]), (0, None))
+			Observers.Main = ObserverThread()
+			self.assertEqual(dict(self.transm.proceed(["get", "observer"])[1])["Queue depth"], 0)
+		finally:
+			Observers.Main = prev
+
 	def testSetIPv6(self):
 		try:
 			self.assertEqual(self.transm.proceed(["set", "allowipv6", 'yes']), (0, 'yes'))
@@ -213,6 +252,10 @@ class Transmitter(TransmitterBase):
 		self.setGetTestNOK("dbmaxmatches", "LIZARD")
 		self.setGetTest("dbpurgeage", "600", 600)
 		self.setGetTestNOK("dbpurgeage", "LIZARD")
+		self.setGetTest("dbflushinterval", "0", 0)
+		self.setGetTest("dbflushinterval", "2", 2)
+		self.setGetTestNOK("dbflushinterval", "LIZARD")
+		self.assertEqual(dict(self.transm.proceed(["get", "dbqueue"])[1])["Queue depth"], 0)
 		# the same file name (again with jails / not changed):
 		self.server.addJail(self.jailName, FAST_BACKEND)
 		self.setGetTest("dbfile", tmpFilename)
@@ -237,6 +280,15 @@ class Transmitter(TransmitterBase):
 		self.assertEqual(self.transm.proceed(
 			["get", "dbpurgeage"]),
 			(0, None))
+		self.assertEqual(self.transm.proceed(
+			["set", "dbflushinterval", "1"]),
+			(0, None))
+		self.assertEqual(self.transm.proceed(
+			["get", "dbflushinterval"]),
+			(0, None))
+		self.assertEqual(self.transm.proceed(
+			["get", "dbqueue"]),
+			(0, None))
 		# the same (again with jails / not changed):
 		self.server.addJail(self.jailName, FAST_BACKEND)
 		self.assertEqual(self.transm.proceed(
@@ -463,6 +515,28 @@ class Transmitter(TransmitterBase):
 		self.setGetTestNOK("maxlines", "-2", jail=self.jailName)
 		self.setGetTestNOK("maxlines", "Duck", jail=self.jailName)
 
+	def testJailRegexSet(self):
+		self.assertEqual(
+			self.transm.proceed(["get", self.jailName, "regexset"]), (0, False))
+		self.setGetTest("regexset", "true", True, jail=self.jailName)
+		self.setGetTest("regexset", "false", False, jail=self.jailName)
+
+	def testJailFilterProcess(self):
+		try:
+			self.setGetTest("filterprocess", "true", True, jail=self.jailName)
+			self.setGetTest("filterprocess", "false", False, jail=self.jailName)
+		finally:
+			if FilterProcPool.Main is not None:
+				FilterProcPool.Main.stop()
+				FilterProcPool.Main = None
+
+	def testJailActionThreads(self):
+		self.assertEqual(
+			self.transm.proceed(["get", self.jailName, "actionthreads"]), (0, 1))
+		self.setGetTest("actionthreads", "4", 4, jail=self.jailName)
+		self.setGetTest("actionthreads", "1", 1, jail=self.jailName)
+		self.setGetTestNOK("actionthreads", "0", jail=self.jailName)
+
 	def testJailLogEncoding(self):
 		self.setGetTest("logencoding", "UTF-8", jail=self.jailName)
 		self.setGetTest("logencoding", "ascii", jail=self.jailName)
@@ -785,7 +859,7 @@ class Transmitter(TransmitterBase):
 		self.assertSortedEqual(
 			self.transm.proceed(["get", self.jailName, "actionmethods",
 				action])[1],
-			['ban', 'reban', 'start', 'stop', 'testmethod', 'unban'])
+			['ban', 'ban_many', 'reban', 'start', 'stop', 'testmethod', 'unban', 'unban_many'])
 		self.assertEqual(
 			self.transm.proceed(["set", self.jailName, "action", action,
 				"testmethod", '{"text": "world!"}']),
@@ -467,6 +467,7 @@ def gatherTests(regexps=None, opts=None):
 	tests.addTest(loadTests(filtertestcase.DNSUtilsTests))
 	tests.addTest(loadTests(filtertestcase.DNSUtilsNetworkTests))
 	tests.addTest(loadTests(filtertestcase.JailTests))
+	tests.addTest(loadTests(filtertestcase.SyslogFilter))
 
 	# DateDetector
 	tests.addTest(loadTests(datedetectortestcase.DateDetectorTest))
@@ -506,6 +507,11 @@ def gatherTests(regexps=None, opts=None):
 		filters.append(FilterPyinotify)
 	except ImportError as e: # pragma: no cover
 		logSys.warning("I: Skipping pyinotify backend testing. Got exception '%s'" % e)
+	try:
+		from ..server.filterinotify import FilterInotify
+		filters.append(FilterInotify)
+	except ImportError as e: # pragma: no cover
+		logSys.warning("I: Skipping inotify backend testing. Got exception '%s'" % e)
 
 	for Filter_ in filters:
 		tests.addTest(loadTests(